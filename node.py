@@ -1,38 +1,195 @@
+"""Singly linked lists.
+
+`LinkedList` keeps a pointer to its last node and its length, so `append` and
+`len` take constant time instead of walking the whole chain.
+
+`UnrolledLinkedList` stores up to `chunk_size` elements in each node, in a
+fixed-size array. That needs far fewer node objects and keeps neighboring
+elements next to each other in memory, which makes it smaller and faster to
+iterate.
+
+References:
+- https://en.wikipedia.org/wiki/Unrolled_linked_list
+"""
+
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional
+
+DEFAULT_CHUNK_SIZE = 64
+
+
 class Node:
+    __slots__ = ('data', 'next')
+
     def __init__(self, data):
         self.data = data
-        self.next = None
+        self.next: Optional['Node'] = None
+
 
 class LinkedList:
-    def __init__(self):
+    def __init__(self, iterable: Iterable = ()):
+        # `head` is a sentinel without data, the elements start at `head.next`
         self.head = Node(None)
+        self.tail = self.head
+        self._length = 0
+        self.extend(iterable)
 
     def append(self, data):
         new_node = Node(data)
-        cur = self.head
-        while cur.next != None:
-            cur = cur.next
-        cur.next = new_node
-    
-    def length(self):
-        cur = self.head
-        total = 0
-        while cur.next != None:
+        self.tail.next = new_node
+        self.tail = new_node
+        self._length += 1
+
+    def extend(self, iterable: Iterable):
+        tail = self.tail
+        added = 0
+        for data in iterable:
+            new_node = Node(data)
+            tail.next = new_node
+            tail = new_node
+            added += 1
+        self.tail = tail
+        self._length += added
+
+    def __iter__(self) -> Iterator:
+        cur = self.head.next
+        while cur is not None:
+            yield cur.data
             cur = cur.next
-            total += 1
-        return total
-    
+
+    def __len__(self) -> int:
+        return self._length
+
+    def length(self) -> int:
+        return self._length
+
     def display(self):
-        elements = []
-        cur_node = self.head
-        while cur_node.next != None:
-            cur_node = cur_node.next
-            elements.append(cur_node.data)
-        print(elements)
+        print(list(self))
+
+
+class Chunk:
+    __slots__ = ('items', 'count', 'next')
+
+    def __init__(self, chunk_size: int):
+        # Preallocated, the first `count` slots hold elements
+        self.items: List[Any] = [None] * chunk_size
+        self.count = 0
+        self.next: Optional['Chunk'] = None
+
+
+class UnrolledLinkedList:
+    """A linked list of chunks holding up to `chunk_size` elements each. Every
+    chunk but the last is full."""
+
+    def __init__(self,
+                 iterable: Iterable = (),
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+        self.chunk_size = chunk_size
+        self.head = Chunk(chunk_size)
+        self.tail = self.head
+        self._length = 0
+        self.extend(iterable)
+
+    def append(self, data):
+        tail = self.tail
+        if tail.count == self.chunk_size:
+            tail.next = Chunk(self.chunk_size)
+            tail = self.tail = tail.next
+        tail.items[tail.count] = data
+        tail.count += 1
+        self._length += 1
+
+    def extend(self, iterable: Iterable):
+        iterator = iter(iterable)
+        tail = self.tail
+        while True:
+            # Fill the free slots of the last chunk in one slice assignment
+            free = self.chunk_size - tail.count
+            values = list(islice(iterator, free))
+            tail.items[tail.count:tail.count + len(values)] = values
+            tail.count += len(values)
+            self._length += len(values)
+            if len(values) < free:
+                break
+            tail.next = Chunk(self.chunk_size)
+            tail = self.tail = tail.next
+
+    def __iter__(self) -> Iterator:
+        chunk = self.head
+        while chunk is not None:
+            if chunk.count == self.chunk_size:
+                yield from chunk.items
+            else:
+                yield from islice(chunk.items, chunk.count)
+            chunk = chunk.next
+
+    def __len__(self) -> int:
+        return self._length
+
+    def length(self) -> int:
+        return self._length
+
+    def display(self):
+        print(list(self))
+
+
+def _benchmark(n: int):
+    """Compares building and iterating over `n` elements, and the memory
+    used, for both linked lists, `list` and `collections.deque`."""
+    from collections import deque
+    import time
+    import tracemalloc
+
+    def build_by_append(factory):
+        container = factory()
+        for i in range(n):
+            container.append(i)
+        return container
+
+    containers = {
+        'LinkedList': LinkedList,
+        'UnrolledLinkedList': UnrolledLinkedList,
+        'list': list,
+        'deque': deque,
+    }
+    print(f'{n} elements:')
+    for name, factory in containers.items():
+        start_time = time.perf_counter()
+        build_by_append(factory)
+        append_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        container = factory(range(n))
+        extend_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        for _ in container:
+            pass
+        iterate_time = time.perf_counter() - start_time
+
+        tracemalloc.start()
+        container = factory(range(n))
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del container
+
+        print(f'{name:>20}: append {append_time * 1000:8.2f}ms  '
+              f'extend {extend_time * 1000:8.2f}ms  '
+              f'iterate {iterate_time * 1000:8.2f}ms  '
+              f'memory {memory / 2**20:7.2f}MiB')
+
+
+if __name__ == '__main__':
+    my_list = LinkedList()
 
-my_list = LinkedList()
+    array = [1, 2, 3, 4, 5]
 
-array = [1, 2, 3, 4, 5]
+    my_list.append(array)
+    my_list.extend(array)
+    my_list.display()
+    print(len(my_list))
 
-my_list.append(array)
-my_list.display()
\ No newline at end of file
+    for n in [10_000, 1_000_000]:
+        _benchmark(n)
@@ -0,0 +1,207 @@
+"""Recording episodes compactly, and rendering them only when asked to.
+
+`get_score` in `Frozen_Lake.ipynb` and `qlearn` in `Taxi_Driver.ipynb` call
+`env.render(mode='ansi')` after every step of every episode and keep all of
+those strings, although only the best episode is ever shown.
+
+`EpisodeRecorder` wraps an environment and records, for every episode, the
+seed it was started with, the actions taken and the integer states visited:
+a few bytes per step. `EpisodeTrace.frames` renders an episode afterwards, by
+putting the environment back into each recorded state. `evaluate` is
+`get_score` built on top of this.
+
+```
+report = evaluate(env, policy)
+print(report)
+for frame in report.best.frames(env):
+    print(frame)
+```
+"""
+
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class EpisodeTrace:
+    """`states[0]` is the state the episode started in, and `actions[i]`
+    took the environment from `states[i]` to `states[i + 1]`."""
+    seed: Optional[int]
+    actions: array = field(default_factory=lambda: array('B'))
+    states: array = field(default_factory=lambda: array('i'))
+    total_reward: float = 0.0
+    # Reward of the last step, and whether the environment ended the episode
+    final_reward: float = 0.0
+    done: bool = False
+    # Whether it ended because of a time limit, like gym's `TimeLimit`, which
+    # also sets `done`, rather than in a terminal state
+    truncated: bool = False
+
+    @property
+    def steps(self) -> int:
+        return len(self.actions)
+
+    @property
+    def final_state(self) -> int:
+        return self.states[-1]
+
+    def frames(self, env) -> Iterator[str]:
+        """Renders the state after every step, like calling
+        `env.render(mode='ansi')` after each `env.step` would have. `env`
+        must be an environment of the same kind as the recorded one; its
+        current state is restored afterwards."""
+        # Wrappers like gym's `TimeLimit` don't pass attributes through
+        env = getattr(env, 'unwrapped', env)
+        saved = env.s, getattr(env, 'lastaction', None)
+        try:
+            for action, state in zip(self.actions, self.states[1:]):
+                env.s = state
+                env.lastaction = action
+                yield env.render(mode='ansi')
+        finally:
+            env.s, env.lastaction = saved
+
+    def replay_states(self, env) -> List[int]:
+        """Steps a fresh copy of the episode through `env` with the recorded
+        seed and actions, and returns the states it visits. These match
+        `states` as long as the environment behaves the same."""
+        if self.seed is not None:
+            env.seed(self.seed)
+        states = [int(env.reset())]
+        for action in self.actions:
+            state, _, done, _ = env.step(action)
+            states.append(int(state))
+            if done:
+                break
+        return states
+
+
+class EpisodeRecorder:
+    """Wraps `env`, recording every episode it runs into `trace`.
+
+    Use `reset` and `step` like the methods of the environment. With a
+    `seed`, `reset` seeds the environment first, so the episode can be
+    replayed exactly.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.trace: Optional[EpisodeTrace] = None
+
+    def reset(self, seed: Optional[int] = None) -> int:
+        if seed is not None:
+            self.env.seed(seed)
+        state = self.env.reset()
+        self.trace = EpisodeTrace(seed)
+        self.trace.states.append(state)
+        return state
+
+    def step(self, action: int) -> Tuple[int, float, bool, dict]:
+        state, reward, done, info = self.env.step(action)
+        trace = self.trace
+        trace.actions.append(action)
+        trace.states.append(state)
+        trace.total_reward += reward
+        trace.final_reward = reward
+        trace.done = done
+        trace.truncated = bool(info.get('TimeLimit.truncated', False))
+        return state, reward, done, info
+
+
+@dataclass
+class EvaluationReport:
+    episodes: int
+    # Episodes that reached the goal, those that ended in another terminal
+    # state, and those cut short by a time limit or `max_steps`
+    successes: int
+    misses: int
+    truncated: int
+    # Steps of each successful episode
+    success_steps: List[int]
+    # The successful episode with the fewest steps
+    best: Optional[EpisodeTrace]
+
+    @property
+    def mean_steps(self) -> float:
+        return float(np.mean(self.success_steps)) if self.success_steps \
+            else float('nan')
+
+    @property
+    def miss_rate(self) -> float:
+        return self.misses / self.episodes if self.episodes else 0.0
+
+    @property
+    def truncated_rate(self) -> float:
+        return self.truncated / self.episodes if self.episodes else 0.0
+
+    def __str__(self) -> str:
+        return ('----------------------------------------------\n'
+                f'You took an average of {self.mean_steps:.0f} steps to get '
+                'the frisbee\n'
+                f'And you fell in the hole {self.miss_rate * 100:.2f}% of the '
+                'time\n'
+                '----------------------------------------------')
+
+
+def evaluate(env,
+             policy,
+             episodes: int = 1000,
+             seed: Optional[int] = 0,
+             goal_reward: float = 1,
+             max_steps: Optional[int] = None) -> EvaluationReport:
+    """Runs `policy` for `episodes` episodes, like `get_score` in
+    `Frozen_Lake.ipynb`, but only keeps compact traces.
+
+    Episode i is seeded with `seed + i`, so any episode can be replayed. An
+    episode succeeds when it ends with `goal_reward`. `max_steps` optionally
+    cuts episodes short. Those, and episodes that the environment's own time
+    limit ended (gym's `TimeLimit` for environments made with `gym.make`),
+    count as truncated, not as successes or misses.
+    """
+    recorder = EpisodeRecorder(env)
+    successes = 0
+    misses = 0
+    truncated = 0
+    success_steps = []
+    best = None
+    for i in range(episodes):
+        state = recorder.reset(None if seed is None else seed + i)
+        done = False
+        while not done and (max_steps is None or
+                            recorder.trace.steps < max_steps):
+            state, _, done, _ = recorder.step(int(policy[state]))
+
+        trace = recorder.trace
+        if not done or trace.truncated:
+            truncated += 1
+        elif trace.final_reward == goal_reward:
+            successes += 1
+            success_steps.append(trace.steps)
+            if best is None or trace.steps < best.steps:
+                best = trace
+        else:
+            misses += 1
+
+    return EvaluationReport(episodes, successes, misses, truncated,
+                            success_steps, best)
+
+
+if __name__ == '__main__':
+    import gym
+    import time
+
+    from value_iteration import value_iteration
+
+    env = gym.make('FrozenLake8x8-v0')
+    state_func, policy = value_iteration(env)
+
+    start_time = time.perf_counter()
+    report = evaluate(env, policy)
+    print(report)
+    print(f'evaluated in {time.perf_counter() - start_time:.2f}s')
+
+    for frame in report.best.frames(env):
+        print(frame)
@@ -0,0 +1,276 @@
+"""Exact success rates and episode lengths of a fixed policy.
+
+`get_score` in `Frozen_Lake.ipynb` estimates how often a policy reaches the
+goal, and in how many steps, by playing 1000 random episodes. For a fixed
+policy these numbers follow exactly from `env.P`: following the policy turns
+the environment into an absorbing Markov chain, where every step either ends
+the episode (at the goal, or anywhere else, like a hole) or moves to another
+state. Writing `Q` for the probabilities of moving between states without
+ending the episode, and `b` for the probabilities of ending it at the goal:
+
+- the probability of reaching the goal from each state is `x = b + Q x`
+- the expected number of steps is `t = 1 + Q t`
+- the expected number of steps of the episodes that reach the goal is `u / x`
+  with `u = x + Q u`
+
+`exact_score` solves these linear systems. Small models are solved directly;
+models with more than `DIRECT_SOLVE_MAX_STATES` states are solved iteratively
+with sparse products, so grids far bigger than 8x8 stay cheap. States from
+which the policy can go on forever without ending the episode get an infinite
+expected length.
+
+With `max_steps`, the numbers are instead exact for episodes cut short after
+`max_steps` steps, like gym's `TimeLimit` does (200 steps for
+`FrozenLake8x8-v0`). They are computed by pushing the distribution of states
+forward one step at a time.
+
+`monte_carlo_check` plays episodes through a real environment to cross-check
+the exact numbers.
+
+References:
+- https://en.wikipedia.org/wiki/Absorbing_Markov_chain
+"""
+
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from mdp import TransitionModel, compile_model
+
+# Larger chains are solved iteratively instead of with `np.linalg.solve`
+DIRECT_SOLVE_MAX_STATES = 2048
+TOLERANCE = 1e-12
+MAX_ITERATIONS = 10**6
+# Probabilities this close to 1 count as certain
+CERTAIN = 1 - 1e-9
+
+
+class _Chain(NamedTuple):
+    """The policy's transitions that don't end the episode, as a sparse
+    matrix of (row, column, probability) entries."""
+    num_states: int
+    rows: np.ndarray
+    columns: np.ndarray
+    probs: np.ndarray
+
+    def forward(self, distribution: np.ndarray) -> np.ndarray:
+        """The distribution of states one step later."""
+        return np.bincount(self.columns, distribution[self.rows] * self.probs,
+                           minlength=self.num_states)
+
+    def backward(self, values: np.ndarray) -> np.ndarray:
+        """`Q values`: the expected value of the next state."""
+        return np.bincount(self.rows, self.probs * values[self.columns],
+                           minlength=self.num_states)
+
+    def restrict(self, keep: np.ndarray) -> '_Chain':
+        """The chain between the states in the mask `keep` only, renumbered.
+        Transitions to other states are dropped."""
+        index = np.cumsum(keep) - 1
+        inside = keep[self.rows] & keep[self.columns]
+        return _Chain(int(keep.sum()), index[self.rows[inside]],
+                      index[self.columns[inside]], self.probs[inside])
+
+    def solve(self, rhs: np.ndarray, tol: float = TOLERANCE,
+              max_iterations: int = MAX_ITERATIONS) -> np.ndarray:
+        """Solves `x = rhs + Q x`. The chain must end every episode with
+        probability 1, or the solution doesn't exist."""
+        n = self.num_states
+        if n <= DIRECT_SOLVE_MAX_STATES:
+            matrix = np.eye(n)
+            np.add.at(matrix, (self.rows, self.columns), -self.probs)
+            return np.linalg.solve(matrix, rhs)
+
+        if rhs.ndim == 2:
+            return np.stack([self.solve(column, tol, max_iterations)
+                             for column in rhs.T], axis=1)
+        x = rhs.copy()
+        for _ in range(max_iterations):
+            new_x = rhs + self.backward(x)
+            if np.abs(new_x - x).max(initial=0) <= tol * max(
+                    1.0, np.abs(new_x).max(initial=0)):
+                return new_x
+            x = new_x
+        raise RuntimeError(f'no convergence after {max_iterations} iterations')
+
+    def can_reach(self, targets: np.ndarray) -> np.ndarray:
+        """Mask of the states with a path to one of the states in the mask
+        `targets`."""
+        reached = targets.copy()
+        while True:
+            new = reached | (np.bincount(
+                self.rows, reached[self.columns], minlength=self.num_states)
+                             > 0)
+            if np.array_equal(new, reached):
+                return reached
+            reached = new
+
+
+@dataclass
+class ExactScore:
+    """The outcome of following a policy from the initial state
+    distribution. `success_probability + failure_probability +
+    unfinished_probability` is 1, where unfinished episodes go on forever (or
+    are cut short by `max_steps`)."""
+    success_probability: float
+    failure_probability: float
+    unfinished_probability: float
+    # Expected number of steps of an episode, infinite if it can go on forever
+    expected_steps: float
+    # Expected number of steps of the episodes that reach the goal
+    expected_steps_to_goal: float
+    # Probability of reaching the goal from every state
+    success_from: np.ndarray
+
+    def __str__(self) -> str:
+        return ('----------------------------------------------\n'
+                f'You took an average of {self.expected_steps_to_goal:.1f} '
+                'steps to get the frisbee\n'
+                f'And you fell in the hole '
+                f'{self.failure_probability * 100:.2f}% of the time\n'
+                '----------------------------------------------')
+
+
+def _initial_distribution(env, model: TransitionModel,
+                          initial: Optional[np.ndarray]) -> np.ndarray:
+    if initial is None:
+        initial = getattr(getattr(env, 'unwrapped', env), 'isd', None)
+    if initial is None:
+        raise ValueError('pass the initial state distribution as `initial`')
+    initial = np.asarray(initial, dtype=np.float64)
+    if initial.shape != (model.num_states,):
+        raise ValueError('`initial` needs one probability per state')
+    return initial
+
+
+def exact_score(env,
+                policy,
+                goal_reward: float = 1,
+                max_steps: Optional[int] = None,
+                initial: Optional[np.ndarray] = None) -> ExactScore:
+    """Computes exactly how `policy` does on `env`.
+
+    `env` is a gym environment, or a `TransitionModel` together with the
+    `initial` state distribution. An episode succeeds when it ends with
+    `goal_reward`, and fails when it ends with any other reward (in a hole
+    for FrozenLake).
+    """
+    model = compile_model(env)
+    initial = _initial_distribution(env, model, initial)
+    policy = np.asarray(policy, dtype=np.int64)
+
+    chosen = model.policy_outcomes(policy)
+    going_on = chosen & ~model.dones
+    chain = _Chain(model.num_states, model.state_of[going_on],
+                   model.next_states[going_on], model.probs[going_on])
+    ending = chosen & model.dones
+    at_goal = ending & (model.rewards == goal_reward)
+    succeed = np.bincount(model.state_of[at_goal], model.probs[at_goal],
+                          minlength=model.num_states)
+    fail = np.bincount(model.state_of[ending & ~at_goal],
+                       model.probs[ending & ~at_goal],
+                       minlength=model.num_states)
+
+    if max_steps is not None:
+        return _finite_horizon_score(chain, initial, succeed, fail,
+                                     max_steps)
+
+    # States that can't end the episode at all would make the systems
+    # singular. Their probabilities of success or failure are 0.
+    can_end = chain.can_reach((succeed + fail) > 0)
+    ends = chain.restrict(can_end)
+    probabilities = np.stack([succeed[can_end], fail[can_end]], axis=1)
+    solved = ends.solve(probabilities)
+    success_from = np.zeros(model.num_states)
+    fail_from = np.zeros(model.num_states)
+    success_from[can_end] = solved[:, 0]
+    fail_from[can_end] = solved[:, 1]
+
+    # Episode lengths are only finite from states where the episode ends for
+    # certain, and from those the policy never leaves them
+    certain = success_from + fail_from >= CERTAIN
+    steps_from = np.full(model.num_states, np.inf)
+    steps_from[certain] = chain.restrict(certain).solve(
+        np.ones(int(certain.sum())))
+
+    # Total steps of the successful episodes, u = x + Q u
+    weighted_steps = np.zeros(model.num_states)
+    weighted_steps[can_end] = ends.solve(success_from[can_end])
+
+    success = float(initial @ success_from)
+    failure = float(initial @ fail_from)
+    started = initial > 0
+    expected_steps = float(initial[started] @ steps_from[started])
+    return ExactScore(
+        success, failure, max(0.0, 1 - success - failure), expected_steps,
+        float(initial @ weighted_steps) / success if success else np.inf,
+        success_from)
+
+
+def _finite_horizon_score(chain: _Chain, initial: np.ndarray,
+                          succeed: np.ndarray, fail: np.ndarray,
+                          max_steps: int) -> ExactScore:
+    """`exact_score` for episodes cut short after `max_steps` steps."""
+    distribution = initial.copy()
+    success = failure = expected_steps = steps_to_goal = 0.0
+    for step in range(1, max_steps + 1):
+        # Every episode still going on takes this step
+        expected_steps += distribution.sum()
+        succeeded = float(distribution @ succeed)
+        success += succeeded
+        failure += float(distribution @ fail)
+        steps_to_goal += step * succeeded
+        distribution = chain.forward(distribution)
+
+    # Probability of reaching the goal from each state within the limit
+    success_from = np.zeros(chain.num_states)
+    for _ in range(max_steps):
+        success_from = succeed + chain.backward(success_from)
+
+    return ExactScore(success, failure, float(distribution.sum()),
+                      expected_steps,
+                      steps_to_goal / success if success else np.inf,
+                      success_from)
+
+
+def monte_carlo_check(env, policy, episodes: int = 1000, seed: int = 0,
+                      goal_reward: float = 1,
+                      max_steps: Optional[int] = None) -> ExactScore:
+    """Estimates the same numbers as `exact_score` by playing `episodes`
+    episodes through `env`, with `episodes.evaluate`. Only for
+    cross-checking: the estimates are noisy and much slower to get.
+
+    Episodes cut short, by `max_steps` or by the time limit of `env`, count
+    as unfinished, like in `exact_score`. Compare with `exact_score` for the
+    same limit, e.g. `max_steps=env.spec.max_episode_steps`.
+    """
+    from episodes import evaluate
+
+    report = evaluate(env, policy, episodes, seed, goal_reward, max_steps)
+    # evaluate doesn't keep the lengths of failed episodes
+    return ExactScore(report.successes / episodes, report.misses / episodes,
+                      report.truncated / episodes, np.nan, report.mean_steps,
+                      np.full(len(policy), np.nan))
+
+
+if __name__ == '__main__':
+    import gym
+    import time
+
+    from value_iteration import value_iteration
+
+    env = gym.make('FrozenLake8x8-v0')
+    state_func, policy = value_iteration(env)
+
+    start_time = time.perf_counter()
+    score = exact_score(env, policy, max_steps=env.spec.max_episode_steps)
+    print(score)
+    print(f'exact in {time.perf_counter() - start_time:.3f}s')
+
+    start_time = time.perf_counter()
+    print(monte_carlo_check(env, policy))
+    print(f'Monte Carlo in {time.perf_counter() - start_time:.3f}s')
@@ -0,0 +1,212 @@
+"""A compiled form of the transition table of a gym toy text environment.
+
+In gym's `FrozenLake` and `Taxi`, `env.P[state][action]` is a list of
+`(probability, next_state, reward, done)` tuples, one per possible outcome of
+taking `action` in `state`. Looping over these lists in Python for every
+backup is what makes the notebook's `value_iteration` slow.
+
+`TransitionModel.from_env(env)` flattens `env.P` once into NumPy arrays with
+one entry per outcome. Bellman backups for every state and action then take a
+few array operations (`q_values`). `to_dense` gives the same model as dense
+arrays `P[s, a, s']` and `R[s, a, s']`.
+
+Outcomes that end the episode (`done`) don't add the value of the next state:
+in Taxi, the state after a successful dropoff isn't terminal in `env.P`, so
+counting its value would pretend the episode goes on.
+
+References:
+- https://en.wikipedia.org/wiki/Markov_decision_process
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# `q_values` never uses a dense transition matrix with more entries than this
+DENSE_MAX_ENTRIES = 1 << 22
+
+Outcome = Tuple[float, int, float, bool]
+TransitionTable = Dict[int, Dict[int, List[Outcome]]]
+
+
+@dataclass
+class TransitionModel:
+    """Outcome e is reached by taking `action_of[e]` in `state_of[e]`, and
+    leads to `next_states[e]` with probability `probs[e]`, giving
+    `rewards[e]` and ending the episode if `dones[e]`. Outcomes are sorted by
+    state, then action."""
+    num_states: int
+    num_actions: int
+    state_of: np.ndarray
+    action_of: np.ndarray
+    next_states: np.ndarray
+    probs: np.ndarray
+    rewards: np.ndarray
+    dones: np.ndarray
+    # expected_rewards[s, a] is the expected reward of taking a in s
+    expected_rewards: np.ndarray = field(init=False, repr=False)
+    # Probability of each outcome times 1 if the episode goes on, else 0
+    continuation: np.ndarray = field(init=False, repr=False)
+    _dense: Optional[np.ndarray] = field(default=None, init=False,
+                                         repr=False)
+    _state_offsets: Optional[np.ndarray] = field(default=None, init=False,
+                                                 repr=False)
+
+    def __post_init__(self):
+        pairs = self.state_of * self.num_actions + self.action_of
+        self._pairs = pairs
+        self.expected_rewards = np.bincount(
+            pairs, self.probs * self.rewards,
+            minlength=self.num_states * self.num_actions).reshape(
+                self.num_states, self.num_actions)
+        self.continuation = np.where(self.dones, 0.0, self.probs)
+
+    @classmethod
+    def from_table(cls, P: TransitionTable, num_states: int,
+                   num_actions: int) -> 'TransitionModel':
+        """Compiles a table shaped like gym's `env.P`."""
+        columns = [(state, action, prob, next_state, reward, done)
+                   for state in range(num_states)
+                   for action in range(num_actions)
+                   for prob, next_state, reward, done in P[state][action]]
+        state_of, action_of, probs, next_states, rewards, dones = (
+            zip(*columns) if columns else ([],) * 6)
+        return cls(num_states, num_actions,
+                   np.array(state_of, dtype=np.int64),
+                   np.array(action_of, dtype=np.int64),
+                   np.array(next_states, dtype=np.int64),
+                   np.array(probs, dtype=np.float64),
+                   np.array(rewards, dtype=np.float64),
+                   np.array(dones, dtype=bool))
+
+    @classmethod
+    def from_env(cls, env) -> 'TransitionModel':
+        """Compiles `env.P` of a gym toy text environment (or anything with
+        `P`, `nS` and `nA` attributes)."""
+        return cls.from_table(env.P, env.nS, env.nA)
+
+    @property
+    def num_outcomes(self) -> int:
+        return len(self.probs)
+
+    def to_dense(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns `(P, R)` where `P[s, a, s']` is the probability of moving
+        from s to s' with action a and `R[s, a, s']` the expected reward of
+        doing so."""
+        shape = (self.num_states, self.num_actions, self.num_states)
+        P = np.zeros(shape)
+        weighted_rewards = np.zeros(shape)
+        index = (self.state_of, self.action_of, self.next_states)
+        # Several outcomes can lead to the same next state
+        np.add.at(P, index, self.probs)
+        np.add.at(weighted_rewards, index, self.probs * self.rewards)
+        R = np.divide(weighted_rewards, P, out=np.zeros(shape), where=P > 0)
+        return P, R
+
+    def dense_continuation(self) -> np.ndarray:
+        """An (S * A, S) matrix with the probability of each (state, action)
+        leading to each next state without ending the episode."""
+        if self._dense is None:
+            dense = np.zeros((self.num_states * self.num_actions,
+                              self.num_states))
+            np.add.at(dense, (self._pairs, self.next_states),
+                      self.continuation)
+            self._dense = dense
+        return self._dense
+
+    def use_dense(self) -> bool:
+        return (self.num_states**2 * self.num_actions <= DENSE_MAX_ENTRIES
+                and self.num_outcomes * 8 > self.num_states**2 *
+                self.num_actions)
+
+    def q_values(self, values: np.ndarray, gamma: float,
+                 dense: Optional[bool] = None) -> np.ndarray:
+        """One Bellman backup of every state and action: `Q[s, a]` is the
+        expected reward of taking a in s plus `gamma` times the value of the
+        next state.
+
+        `dense` chooses between a dense matrix product and a sum over the
+        outcomes. By default the dense form is only used when at least an
+        eighth of the entries of the dense matrix would be nonzero."""
+        if dense is None:
+            dense = self.use_dense()
+        if dense:
+            future = self.dense_continuation() @ values
+        else:
+            future = np.bincount(
+                self._pairs, self.continuation * values[self.next_states],
+                minlength=self.num_states * self.num_actions)
+        return self.expected_rewards + gamma * future.reshape(
+            self.num_states, self.num_actions)
+
+    def state_q_values(self, state: int, values: np.ndarray,
+                       gamma: float) -> np.ndarray:
+        """`q_values(values, gamma)[state]`, computed for `state` only."""
+        offsets = self.state_offsets()
+        outcomes = slice(offsets[state], offsets[state + 1])
+        future = np.bincount(
+            self.action_of[outcomes],
+            self.continuation[outcomes] * values[self.next_states[outcomes]],
+            minlength=self.num_actions)
+        return self.expected_rewards[state] + gamma * future
+
+    def state_offsets(self) -> np.ndarray:
+        """The outcomes of state s are those from `offsets[s]` up to
+        `offsets[s + 1]`."""
+        if self._state_offsets is None:
+            offsets = np.zeros(self.num_states + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.state_of, minlength=self.num_states),
+                      out=offsets[1:])
+            self._state_offsets = offsets
+        return self._state_offsets
+
+    def policy_outcomes(self, policy: np.ndarray) -> np.ndarray:
+        """Whether each outcome comes from the action `policy` picks in its
+        state."""
+        return self.action_of == np.asarray(policy)[self.state_of]
+
+    def policy_matrix(self, policy: np.ndarray,
+                      episodes_end: bool = True) -> np.ndarray:
+        """The (S, S) matrix of the probabilities of moving between states
+        when following `policy`. With `episodes_end`, outcomes that end the
+        episode are left out, so rows can sum to less than 1."""
+        chosen = self.policy_outcomes(policy)
+        matrix = np.zeros((self.num_states, self.num_states))
+        weights = self.continuation if episodes_end else self.probs
+        np.add.at(matrix, (self.state_of[chosen], self.next_states[chosen]),
+                  weights[chosen])
+        return matrix
+
+    def policy_backup(self, policy: np.ndarray, values: np.ndarray,
+                      gamma: float) -> np.ndarray:
+        """One Bellman backup of every state for the action `policy` picks,
+        i.e. `q_values(values, gamma)[s, policy[s]]` for every s."""
+        chosen = self.policy_outcomes(policy)
+        future = np.bincount(
+            self.state_of[chosen],
+            self.continuation[chosen] * values[self.next_states[chosen]],
+            minlength=self.num_states)
+        rewards = self.expected_rewards[np.arange(self.num_states), policy]
+        return rewards + gamma * future
+
+    def predecessors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The states with some action that can lead to each state, in CSR
+        layout: the predecessors of s are `states[offsets[s]:offsets[s + 1]]`,
+        without duplicates. Outcomes that end the episode are left out, since
+        they don't depend on the value of the next state."""
+        keep = ~self.dones
+        pairs = np.unique(self.next_states[keep] * self.num_states +
+                          self.state_of[keep])
+        targets, states = np.divmod(pairs, self.num_states)
+        offsets = np.zeros(self.num_states + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=self.num_states),
+                  out=offsets[1:])
+        return offsets, states
+
+
+def compile_model(env) -> TransitionModel:
+    """Returns `env` if it already is a `TransitionModel`, or compiles it."""
+    if isinstance(env, TransitionModel):
+        return env
+    return TransitionModel.from_env(env)
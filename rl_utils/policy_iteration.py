@@ -0,0 +1,172 @@
+"""Policy iteration and modified policy iteration.
+
+With a discount factor close to 1, value iteration needs thousands of sweeps,
+because each sweep only moves information one step further. Policy iteration
+alternates two steps instead:
+
+1. evaluation: find the exact values of the current policy, by solving the
+   linear system `V = r + gamma * P V`, where `P` and `r` are the transition
+   matrix and expected rewards of the policy
+2. improvement: pick the best action in every state according to those values
+
+and stops when the policy doesn't change, usually after a handful of steps.
+
+Solving the linear system costs O(S^3), which gets expensive for large state
+spaces. `modified_policy_iteration` evaluates the policy only approximately,
+with `k` Bellman backups of the policy, which are cheap vectorized operations.
+`k = 0` is value iteration, and large `k` approaches policy iteration.
+
+Both take the same `env` as `value_iteration` and return a `Solution`, which
+unpacks as `state_func, policy = policy_iteration(env)`.
+
+References:
+- Puterman, "Markov Decision Processes" (1994), chapter 6.4 and 6.5
+"""
+
+from dataclasses import dataclass
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from mdp import TransitionModel, compile_model
+from value_iteration import TOLERANCE, Solution, value_iteration
+
+# Number of policy backups per evaluation in `modified_policy_iteration`
+EVALUATION_BACKUPS = 20
+
+
+def evaluate_policy(model: TransitionModel, policy: np.ndarray,
+                    gamma: float) -> np.ndarray:
+    """The exact values of following `policy`.
+
+    With `gamma = 1` this only has a solution if the policy ends every
+    episode eventually (with probability 1).
+    """
+    matrix = np.eye(model.num_states) - gamma * model.policy_matrix(policy)
+    rewards = model.expected_rewards[np.arange(model.num_states), policy]
+    return np.linalg.solve(matrix, rewards)
+
+
+def improve_policy(q: np.ndarray, policy: np.ndarray) -> np.ndarray:
+    """The greedy policy for `q`. States keep their current action when it is
+    as good as the best one, so ties can't make the policy go back and forth
+    forever."""
+    best = q.argmax(axis=1)
+    states = np.arange(len(policy))
+    keep = q[states, policy] >= q[states, best] - 1e-12 * np.abs(
+        q[states, best])
+    return np.where(keep, policy, best)
+
+
+def policy_iteration(env,
+                     max_iterations: int = 1000,
+                     gamma: float = 0.9,
+                     policy: Optional[np.ndarray] = None) -> Solution:
+    """Policy iteration with exact evaluation, starting from `policy` (action 0
+    everywhere by default). `iterations` of the result counts the
+    improvement steps."""
+    model = compile_model(env)
+    if policy is None:
+        policy = np.zeros(model.num_states, dtype=np.int64)
+
+    iterations = 0
+    while True:
+        values = evaluate_policy(model, policy, gamma)
+        iterations += 1
+        new_policy = improve_policy(model.q_values(values, gamma), policy)
+        if np.array_equal(new_policy, policy) or iterations >= max_iterations:
+            break
+        policy = new_policy
+
+    return Solution(values, policy, iterations,
+                    iterations * model.num_states)
+
+
+def modified_policy_iteration(env,
+                              max_iterations: int = 100000,
+                              gamma: float = 0.9,
+                              k: int = EVALUATION_BACKUPS,
+                              tol: float = TOLERANCE) -> Solution:
+    """Policy iteration where each evaluation is `k` backups of the current
+    policy, starting from the previous values. Stops, like `value_iteration`,
+    once an improvement step changes no value by more than `tol`."""
+    model = compile_model(env)
+    values = np.zeros(model.num_states)
+    policy = np.zeros(model.num_states, dtype=np.int64)
+
+    iterations = 0
+    backups = 0
+    while iterations < max_iterations:
+        q = model.q_values(values, gamma)
+        policy = improve_policy(q, policy)
+        new_values = q[np.arange(model.num_states), policy]
+        iterations += 1
+        backups += model.num_states
+        if np.abs(new_values - values).max(initial=0) < tol:
+            values = new_values
+            break
+
+        values = new_values
+        for _ in range(k):
+            values = model.policy_backup(policy, values, gamma)
+        backups += k * model.num_states
+
+    return Solution(values, policy, iterations, backups)
+
+
+SOLVERS: Dict[str, Callable[..., Solution]] = {
+    'value_iteration': value_iteration,
+    'policy_iteration': policy_iteration,
+    'modified_policy_iteration': modified_policy_iteration,
+}
+
+
+@dataclass
+class SolverTiming:
+    solver: str
+    iterations: int
+    backups: int
+    seconds: float
+    # Largest difference to the values found by policy iteration
+    max_value_difference: float
+
+
+def compare_solvers(env, gamma: float = 0.9,
+                    repeat: int = 3) -> List[SolverTiming]:
+    """Times every solver on `env`, best of `repeat` runs."""
+    model = compile_model(env)
+    reference = policy_iteration(model, gamma=gamma).values
+    timings = []
+    for name, solver in SOLVERS.items():
+        seconds = float('inf')
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            solution = solver(model, gamma=gamma)
+            seconds = min(seconds, time.perf_counter() - start_time)
+        timings.append(
+            SolverTiming(name, solution.iterations, solution.backups, seconds,
+                         float(np.abs(solution.values - reference).max())))
+    return timings
+
+
+def format_timings(timings: List[SolverTiming]) -> str:
+    lines = [f'{"solver":>26} {"iterations":>10} {"backups":>9} '
+             f'{"seconds":>9} {"max diff":>9}']
+    for t in timings:
+        lines.append(f'{t.solver:>26} {t.iterations:>10} {t.backups:>9} '
+                     f'{t.seconds:>9.4f} {t.max_value_difference:>9.2e}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import gym
+
+    for env_name in ['FrozenLake8x8-v0', 'Taxi-v3']:
+        model = TransitionModel.from_env(gym.make(env_name))
+        for gamma in [0.9, 0.99, 0.999]:
+            print(f'{env_name}, gamma={gamma}')
+            print(format_timings(compare_solvers(model, gamma)))
@@ -0,0 +1,254 @@
+"""Q-learning on many copies of an environment at once.
+
+`qlearn` in `Taxi_Driver.ipynb` plays one episode at a time and, on every
+step, draws fresh noise with `np.random.randn`, picks the action and updates
+one entry of the Q-table in Python, and renders a frame. `scalar_qlearn` is
+that loop without the rendering, kept as the baseline.
+
+`vectorized_qlearn` learns the same way on a `BatchedEnv` of `num_envs`
+lanes. Every step picks the actions of all lanes, steps them and updates the
+Q-table with a few array operations:
+
+- Exploration noise is drawn `NOISE_BLOCK_STEPS` steps at a time, and scaled
+  per lane by `noise_scale / (episode + 1) ** noise_decay`, where `episode`
+  is the index of the episode the lane is playing. The defaults are the
+  notebook's `1 / (i + 1)`.
+- All lanes compute their targets from the Q-table as it was before the step.
+  When several lanes update the same (state, action) pair in one step,
+  `collisions='mean'` moves it towards the mean of their targets, and
+  `collisions='last'` uses the target of the lane with the highest index.
+- Episode rewards go into `RollingStats`, which keeps the mean and standard
+  deviation of all episodes, the last `window` rewards and the mean of every
+  block of `window` episodes, instead of a list of every reward.
+
+With the notebook's learning rate of 1 (`alpha`), an update overwrites the
+entry with the target. Terminal states are not bootstrapped from; in Taxi and
+FrozenLake nothing is learned in them, so this doesn't change the result.
+
+References:
+- Sutton & Barto, "Reinforcement Learning: An Introduction", section 6.5
+"""
+
+from dataclasses import dataclass, field
+import time
+from typing import List, Optional, Union
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from simulator import BatchedEnv, make
+
+# Steps of exploration noise drawn at once
+NOISE_BLOCK_STEPS = 256
+COLLISIONS = ('mean', 'last')
+
+
+class RollingStats:
+    """Streaming statistics of episode rewards."""
+
+    def __init__(self, window: int = 100):
+        self.window = window
+        self.count = 0
+        self.mean = 0.0
+        # Sum of squared differences from the mean (Welford's algorithm)
+        self._m2 = 0.0
+        self.best = float('-inf')
+        self._recent = np.zeros(window)
+        self._block_sum = 0.0
+        # Mean reward of every block of `window` consecutive episodes
+        self.block_means: List[float] = []
+
+    def add(self, rewards) -> None:
+        for reward in np.asarray(rewards, dtype=np.float64).ravel().tolist():
+            self._recent[self.count % self.window] = reward
+            self.count += 1
+            delta = reward - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (reward - self.mean)
+            self.best = max(self.best, reward)
+            self._block_sum += reward
+            if self.count % self.window == 0:
+                self.block_means.append(self._block_sum / self.window)
+                self._block_sum = 0.0
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation, like `np.std`."""
+        return (self._m2 / self.count) ** 0.5 if self.count else float('nan')
+
+    @property
+    def recent_mean(self) -> float:
+        """Mean reward of the last `window` episodes."""
+        if not self.count:
+            return float('nan')
+        return float(self._recent[:min(self.count, self.window)].mean())
+
+
+@dataclass
+class QLearningResult:
+    q: np.ndarray
+    stats: RollingStats
+    # Environment steps taken, over all lanes
+    steps: int
+    seconds: float
+    num_envs: int = 1
+    log: List[str] = field(default_factory=list)
+
+    @property
+    def policy(self) -> np.ndarray:
+        return self.q.argmax(axis=1)
+
+    @property
+    def steps_per_second(self) -> float:
+        return self.steps / self.seconds if self.seconds else float('inf')
+
+
+def scalar_qlearn(env,
+                  gamma: float = 0.95,
+                  num_episodes: int = 1000,
+                  seed: Optional[int] = None) -> QLearningResult:
+    """`qlearn` from `Taxi_Driver.ipynb`, one step at a time, without
+    rendering."""
+    if seed is not None:
+        env.seed(seed)
+        np.random.seed(seed)
+    Q = np.zeros((env.nS, env.nA))
+    stats = RollingStats()
+    steps = 0
+    start_time = time.perf_counter()
+    for i in range(num_episodes):
+        done = False
+        episode_reward = 0
+        state = env.reset()
+        while not done:
+            value_noise = np.random.randn(1, env.nA) * (1. / (i + 1))
+            action = np.argmax(Q[state] + value_noise)
+            next_state, reward, done, _ = env.step(action)
+            Q[state, action] = reward + gamma * np.max(Q[next_state])
+            episode_reward += reward
+            state = next_state
+            steps += 1
+        stats.add([episode_reward])
+    return QLearningResult(Q, stats, steps, time.perf_counter() - start_time)
+
+
+def vectorized_qlearn(env,
+                      gamma: float = 0.95,
+                      num_episodes: int = 1000,
+                      num_envs: int = 64,
+                      alpha: float = 1.0,
+                      noise_scale: float = 1.0,
+                      noise_decay: float = 1.0,
+                      collisions: str = 'mean',
+                      seed: Union[None, int, np.random.SeedSequence] = None,
+                      window: int = 100,
+                      log_every: Optional[int] = None) -> QLearningResult:
+    """Q-learning on `num_envs` lanes until `num_episodes` episodes have
+    finished.
+
+    `env` is an environment name for `simulator.make`, a `ToyTextEnv`, a gym
+    environment or a `BatchedEnv` (then `num_envs` is ignored). With
+    `log_every`, the reward of every `log_every`-th episode is logged like the
+    notebook prints it.
+    """
+    if collisions not in COLLISIONS:
+        raise ValueError(f'collisions must be one of {COLLISIONS}')
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    env_seed, noise_seed = seed.spawn(2)
+    if isinstance(env, str):
+        env = make(env)
+    if not isinstance(env, BatchedEnv):
+        env = BatchedEnv.from_env(env, num_envs, env_seed)
+    num_envs = env.num_envs
+    num_actions = env.model.num_actions
+    rng = np.random.default_rng(noise_seed)
+
+    Q = np.zeros((env.model.num_states, num_actions))
+    flat_q = Q.reshape(-1)
+    stats = RollingStats(window)
+    log = []
+    lanes = np.arange(num_envs)
+    episode_of_lane = lanes.copy()
+    next_episode = num_envs
+    episode_rewards = np.zeros(num_envs)
+    steps = 0
+
+    start_time = time.perf_counter()
+    states = env.reset()
+    while stats.count < num_episodes:
+        if steps % NOISE_BLOCK_STEPS == 0:
+            noise = rng.standard_normal(
+                (NOISE_BLOCK_STEPS, num_envs, num_actions))
+        scale = noise_scale / (episode_of_lane + 1.0) ** noise_decay
+        actions = (Q[states] +
+                   noise[steps % NOISE_BLOCK_STEPS] * scale[:, None]).argmax(
+                       axis=1)
+        result = env.step(actions)
+        steps += 1
+
+        bootstrap = np.where(result.terminated, 0.0,
+                             Q[result.next_states].max(axis=1))
+        targets = result.rewards + gamma * bootstrap
+        pairs = states * num_actions + actions
+        if collisions == 'mean':
+            updated, inverse = np.unique(pairs, return_inverse=True)
+            targets = (np.bincount(inverse, targets) /
+                       np.bincount(inverse))
+        else:
+            # np.unique returns the first occurrence, so look from the end
+            updated, last = np.unique(pairs[::-1], return_index=True)
+            targets = targets[::-1][last]
+        flat_q[updated] += alpha * (targets - flat_q[updated])
+
+        episode_rewards += result.rewards
+        finished = result.terminated | result.truncated
+        if finished.any():
+            done_lanes = lanes[finished]
+            # Lanes that finish in the same step count in lane order
+            rewards = episode_rewards[done_lanes][:num_episodes - stats.count]
+            if log_every:
+                for i, reward in enumerate(rewards.tolist(), stats.count + 1):
+                    if i % log_every == 0:
+                        log.append(f'Episode {i} Reward: {reward:g}')
+            stats.add(rewards)
+            episode_rewards[done_lanes] = 0.0
+            episode_of_lane[done_lanes] = next_episode + np.arange(
+                len(done_lanes))
+            next_episode += len(done_lanes)
+        states = result.states
+
+    return QLearningResult(Q, stats, steps * num_envs,
+                           time.perf_counter() - start_time, num_envs, log)
+
+
+def benchmark(env_name: str = 'Taxi-v3',
+              num_episodes: int = 1000,
+              num_envs: int = 64,
+              gamma: float = 0.95,
+              seed: int = 0) -> str:
+    """Environment steps per second of `scalar_qlearn` and
+    `vectorized_qlearn`, on the local simulator."""
+    lines = [f'{"trainer":>12} {"envs":>6} {"steps":>9} {"seconds":>8} '
+             f'{"steps/s":>11} {"last 100":>9}']
+    results = [('scalar', scalar_qlearn(make(env_name), gamma, num_episodes,
+                                        seed))]
+    results.append(('vectorized',
+                    vectorized_qlearn(env_name, gamma, num_episodes,
+                                      num_envs, seed=seed)))
+    for name, r in results:
+        lines.append(f'{name:>12} {r.num_envs:>6} {r.steps:>9} '
+                     f'{r.seconds:>8.3f} {r.steps_per_second:>11,.0f} '
+                     f'{r.stats.recent_mean:>9.2f}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    result = vectorized_qlearn('Taxi-v3', log_every=50)
+    print('\n'.join(result.log))
+    print('Average reward for first 100 episodes:', result.stats.block_means[0])
+    print('Average reward for last 100 episodes:', result.stats.recent_mean)
+    print()
+    print(benchmark('Taxi-v3', num_episodes=2000))
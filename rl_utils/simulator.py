@@ -0,0 +1,479 @@
+"""A local, NumPy only replacement for gym's FrozenLake and Taxi.
+
+The notebooks install `gym==0.17.3` only for two small environments, and step
+them one at a time. This module rebuilds their transition tables exactly as
+gym does (`frozen_lake_table`, `taxi_table`) and offers two ways to run them:
+
+- `make(name)` returns a `ToyTextEnv`, a drop-in for `gym.make(name)` with the
+  same `P`, `nS`, `nA`, `reset`, `step`, `seed` and `render`, including the
+  time limit gym adds.
+- `BatchedEnv` steps N copies of an environment in lockstep: one call to
+  `step` with N actions samples all N outcomes with a few array operations,
+  and lanes whose episode ended start a new one automatically.
+
+`check_transitions` compares two transition tables outcome by outcome, e.g.
+`check_transitions(make('Taxi-v3').P, gym.make('Taxi-v3').P)`.
+
+References:
+- https://github.com/openai/gym/blob/0.17.3/gym/envs/toy_text/frozen_lake.py
+- https://github.com/openai/gym/blob/0.17.3/gym/envs/toy_text/taxi.py
+"""
+
+from collections import defaultdict
+from io import StringIO
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from mdp import TransitionModel, TransitionTable
+
+MAPS = {
+    '4x4': ['SFFF', 'FHFH', 'FFFH', 'HFFG'],
+    '8x8': [
+        'SFFFFFFF',
+        'FFFFFFFF',
+        'FFFHFFFF',
+        'FFFFFHFF',
+        'FFFHFFFF',
+        'FHHFFFHF',
+        'FHFFHFHF',
+        'FFFHFFFG',
+    ],
+}
+
+# FrozenLake actions
+LEFT, DOWN, RIGHT, UP = range(4)
+
+TAXI_MAP = [
+    '+---------+',
+    '|R: | : :G|',
+    '| : | : : |',
+    '| : : : : |',
+    '| | : | : |',
+    '|Y| : |B: |',
+    '+---------+',
+]
+TAXI_LOCATIONS = [(0, 0), (0, 4), (4, 0), (4, 3)]
+
+
+def frozen_lake_table(desc: Sequence[str] = MAPS['8x8'],
+                      is_slippery: bool = True
+                      ) -> Tuple[TransitionTable, np.ndarray]:
+    """The transition table and initial state distribution of FrozenLake
+    with the map `desc`. On slippery ice, the agent moves in the intended
+    direction or one of the two perpendicular ones, each with probability
+    1/3."""
+    desc = np.asarray(desc, dtype='c')
+    num_rows, num_columns = desc.shape
+    num_actions = 4
+
+    def move(row: int, column: int, action: int) -> Tuple[int, int]:
+        if action == LEFT:
+            column = max(column - 1, 0)
+        elif action == DOWN:
+            row = min(row + 1, num_rows - 1)
+        elif action == RIGHT:
+            column = min(column + 1, num_columns - 1)
+        elif action == UP:
+            row = max(row - 1, 0)
+        return row, column
+
+    P: TransitionTable = {}
+    for row in range(num_rows):
+        for column in range(num_columns):
+            state = row * num_columns + column
+            P[state] = {action: [] for action in range(num_actions)}
+            for action in range(num_actions):
+                outcomes = P[state][action]
+                if desc[row, column] in b'GH':
+                    outcomes.append((1.0, state, 0, True))
+                    continue
+                directions = ([(action - 1) % 4, action, (action + 1) % 4]
+                              if is_slippery else [action])
+                for direction in directions:
+                    new_row, new_column = move(row, column, direction)
+                    letter = desc[new_row, new_column]
+                    outcomes.append(
+                        (1.0 / 3.0 if is_slippery else 1.0,
+                         new_row * num_columns + new_column,
+                         float(letter == b'G'), bytes(letter) in b'GH'))
+
+    initial = np.array(desc == b'S').astype('float64').ravel()
+    initial /= initial.sum()
+    return P, initial
+
+
+def taxi_encode(row: int, column: int, passenger: int,
+                destination: int) -> int:
+    return ((row * 5 + column) * 5 + passenger) * 4 + destination
+
+
+def taxi_decode(state: int) -> Tuple[int, int, int, int]:
+    state, destination = divmod(state, 4)
+    state, passenger = divmod(state, 5)
+    row, column = divmod(state, 5)
+    return row, column, passenger, destination
+
+
+def taxi_table() -> Tuple[TransitionTable, np.ndarray]:
+    """The transition table and initial state distribution of Taxi-v3.
+    Passenger index 4 means the passenger is in the taxi."""
+    desc = np.asarray(TAXI_MAP, dtype='c')
+    num_states, num_actions = 500, 6
+    P: TransitionTable = {state: {action: [] for action in range(num_actions)}
+                          for state in range(num_states)}
+    initial = np.zeros(num_states)
+    for row in range(5):
+        for column in range(5):
+            for passenger in range(5):
+                for destination in range(4):
+                    state = taxi_encode(row, column, passenger, destination)
+                    if passenger < 4 and passenger != destination:
+                        initial[state] += 1
+                    for action in range(num_actions):
+                        new_row, new_column = row, column
+                        new_passenger = passenger
+                        reward = -1
+                        done = False
+                        location = (row, column)
+
+                        if action == 0:
+                            new_row = min(row + 1, 4)
+                        elif action == 1:
+                            new_row = max(row - 1, 0)
+                        if action == 2 and desc[1 + row,
+                                                2 * column + 2] == b':':
+                            new_column = min(column + 1, 4)
+                        elif action == 3 and desc[1 + row,
+                                                  2 * column] == b':':
+                            new_column = max(column - 1, 0)
+                        elif action == 4:  # pickup
+                            if (passenger < 4 and
+                                    location == TAXI_LOCATIONS[passenger]):
+                                new_passenger = 4
+                            else:
+                                reward = -10
+                        elif action == 5:  # dropoff
+                            if (location == TAXI_LOCATIONS[destination] and
+                                    passenger == 4):
+                                new_passenger = destination
+                                done = True
+                                reward = 20
+                            elif location in TAXI_LOCATIONS and passenger == 4:
+                                new_passenger = TAXI_LOCATIONS.index(location)
+                            else:
+                                reward = -10
+                        new_state = taxi_encode(new_row, new_column,
+                                                new_passenger, destination)
+                        P[state][action].append(
+                            (1.0, new_state, reward, done))
+
+    initial /= initial.sum()
+    return P, initial
+
+
+def _colorize(text: str, color: str, bold: bool = False,
+              highlight: bool = False) -> str:
+    """`gym.utils.colorize`."""
+    number = {'red': 31, 'green': 32, 'yellow': 33, 'blue': 34,
+              'magenta': 35}[color]
+    attributes = [str(number + 10 if highlight else number)]
+    if bold:
+        attributes.append('1')
+    return f'\x1b[{";".join(attributes)}m{text}\x1b[0m'
+
+
+def _render_frozen_lake(env: 'ToyTextEnv') -> str:
+    num_columns = env.desc.shape[1]
+    row, column = divmod(env.s, num_columns)
+    desc = [[c.decode('utf-8') for c in line] for line in env.desc.tolist()]
+    desc[row][column] = _colorize(desc[row][column], 'red', highlight=True)
+    out = StringIO()
+    if env.lastaction is not None:
+        out.write(f'  ({["Left", "Down", "Right", "Up"][env.lastaction]})\n')
+    else:
+        out.write('\n')
+    out.write('\n'.join(''.join(line) for line in desc) + '\n')
+    return out.getvalue()
+
+
+def _render_taxi(env: 'ToyTextEnv') -> str:
+    out = [[c.decode('utf-8') for c in line] for line in env.desc.tolist()]
+    row, column, passenger, destination = taxi_decode(env.s)
+    taxi = (1 + row, 2 * column + 1)
+    if passenger < 4:
+        out[taxi[0]][taxi[1]] = _colorize(out[taxi[0]][taxi[1]], 'yellow',
+                                          highlight=True)
+        pi, pj = TAXI_LOCATIONS[passenger]
+        out[1 + pi][2 * pj + 1] = _colorize(out[1 + pi][2 * pj + 1], 'blue',
+                                            bold=True)
+    else:
+        cell = out[taxi[0]][taxi[1]]
+        out[taxi[0]][taxi[1]] = _colorize('_' if cell == ' ' else cell,
+                                          'green', highlight=True)
+    di, dj = TAXI_LOCATIONS[destination]
+    out[1 + di][2 * dj + 1] = _colorize(out[1 + di][2 * dj + 1], 'magenta')
+    text = '\n'.join(''.join(line) for line in out) + '\n'
+    if env.lastaction is not None:
+        actions = ['South', 'North', 'East', 'West', 'Pickup', 'Dropoff']
+        text += f'  ({actions[env.lastaction]})\n'
+    else:
+        text += '\n'
+    return text
+
+
+class EnvSpec(NamedTuple):
+    id: str
+    max_episode_steps: Optional[int]
+
+
+class ToyTextEnv:
+    """A single environment, used like the result of `gym.make`.
+
+    `step` reports `done` once `max_episode_steps` steps have been taken,
+    with `info['TimeLimit.truncated']` set, like gym's `TimeLimit` wrapper.
+    """
+
+    def __init__(self, spec: EnvSpec, P: TransitionTable,
+                 initial: np.ndarray, desc: np.ndarray, renderer):
+        self.spec = spec
+        self.P = P
+        self.isd = initial
+        self.nS = len(initial)
+        self.nA = len(P[0])
+        self.desc = desc
+        self._renderer = renderer
+        self.np_random = np.random.RandomState()
+        self.s = self._sample(initial)
+        self.lastaction: Optional[int] = None
+        self._elapsed_steps = 0
+
+    @property
+    def unwrapped(self) -> 'ToyTextEnv':
+        return self
+
+    def _sample(self, probabilities) -> int:
+        # Same as gym's `categorical_sample`
+        cumulative = np.cumsum(np.asarray(probabilities))
+        return int((cumulative > self.np_random.rand()).argmax())
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        self.np_random = np.random.RandomState(seed)
+        return [seed]
+
+    def reset(self) -> int:
+        self.s = self._sample(self.isd)
+        self.lastaction = None
+        self._elapsed_steps = 0
+        return self.s
+
+    def step(self, action: int) -> Tuple[int, float, bool, dict]:
+        outcomes = self.P[self.s][action]
+        prob, state, reward, done = outcomes[self._sample(
+            [outcome[0] for outcome in outcomes])]
+        self.s = state
+        self.lastaction = action
+        info = {'prob': prob}
+        self._elapsed_steps += 1
+        limit = self.spec.max_episode_steps
+        if limit is not None and self._elapsed_steps >= limit:
+            info['TimeLimit.truncated'] = not done
+            done = True
+        return state, reward, done, info
+
+    def render(self, mode: str = 'human') -> Optional[str]:
+        text = self._renderer(self)
+        if mode == 'ansi':
+            return text
+        sys.stdout.write(text)
+        return None
+
+
+def make(name: str) -> ToyTextEnv:
+    """`gym.make` for 'FrozenLake-v0', 'FrozenLake8x8-v0' and 'Taxi-v3'."""
+    if name == 'FrozenLake-v0':
+        P, initial = frozen_lake_table(MAPS['4x4'])
+        return ToyTextEnv(EnvSpec(name, 100), P, initial,
+                          np.asarray(MAPS['4x4'], dtype='c'),
+                          _render_frozen_lake)
+    if name == 'FrozenLake8x8-v0':
+        P, initial = frozen_lake_table(MAPS['8x8'])
+        return ToyTextEnv(EnvSpec(name, 200), P, initial,
+                          np.asarray(MAPS['8x8'], dtype='c'),
+                          _render_frozen_lake)
+    if name == 'Taxi-v3':
+        P, initial = taxi_table()
+        return ToyTextEnv(EnvSpec(name, 200), P, initial,
+                          np.asarray(TAXI_MAP, dtype='c'), _render_taxi)
+    raise ValueError(f'unknown environment {name!r}')
+
+
+def check_transitions(P: TransitionTable, expected: TransitionTable,
+                      tol: float = 1e-12) -> List[str]:
+    """Compares two transition tables, e.g. ours against gym's `env.P`, and
+    returns the differences. Outcomes are compared as distributions: the
+    order of outcomes doesn't matter, and repeated outcomes are added up."""
+
+    def distribution(outcomes) -> Dict[Tuple[int, float, bool], float]:
+        probabilities: Dict[Tuple[int, float, bool], float] = defaultdict(
+            float)
+        for prob, next_state, reward, done in outcomes:
+            probabilities[int(next_state), float(reward), bool(done)] += prob
+        return probabilities
+
+    differences = []
+    if sorted(P) != sorted(expected):
+        differences.append('the tables have different states')
+    for state in sorted(set(P) & set(expected)):
+        if sorted(P[state]) != sorted(expected[state]):
+            differences.append(f'state {state} has different actions')
+            continue
+        for action in P[state]:
+            ours = distribution(P[state][action])
+            theirs = distribution(expected[state][action])
+            keys = set(ours) | set(theirs)
+            if any(abs(ours.get(k, 0) - theirs.get(k, 0)) > tol
+                   for k in keys):
+                differences.append(
+                    f'P[{state}][{action}]: {dict(ours)} != {dict(theirs)}')
+    return differences
+
+
+class BatchStep(NamedTuple):
+    """The result of `BatchedEnv.step` for every lane. `next_states` are the
+    states the actions led to, and `states` the states to act in next, which
+    differ for lanes that were reset."""
+    next_states: np.ndarray
+    rewards: np.ndarray
+    # The episode ended by itself, or was cut short by the time limit
+    terminated: np.ndarray
+    truncated: np.ndarray
+    states: np.ndarray
+
+
+class BatchedEnv:
+    """`num_envs` copies of an environment stepped in lockstep.
+
+    The outcomes of every (state, action) pair are padded to the same length,
+    so sampling the outcomes of all lanes is a single comparison of an
+    (N, K) array of cumulative probabilities with N random numbers.
+    """
+
+    def __init__(self,
+                 model: TransitionModel,
+                 initial: np.ndarray,
+                 num_envs: int,
+                 seed: Optional[int] = None,
+                 max_episode_steps: Optional[int] = None):
+        self.model = model
+        self.num_envs = num_envs
+        self.max_episode_steps = max_episode_steps
+        self.rng = np.random.default_rng(seed)
+        self._initial_cumulative = np.cumsum(initial)
+
+        num_pairs = model.num_states * model.num_actions
+        pairs = model.state_of * model.num_actions + model.action_of
+        counts = np.bincount(pairs, minlength=num_pairs)
+        width = max(1, int(counts.max(initial=0)))
+        starts = np.cumsum(counts) - counts
+        slot = np.arange(model.num_outcomes) - starts[pairs]
+
+        # cumulative[p, k] is the probability of one of the first k + 1
+        # outcomes of pair p. Padding never gets picked.
+        probs = np.zeros((num_pairs, width))
+        probs[pairs, slot] = model.probs
+        self._cumulative = np.cumsum(probs, axis=1)
+        self._cumulative[:, -1] = np.inf
+        self._last_slot = np.maximum(counts - 1, 0)
+        self._next_states = np.zeros((num_pairs, width), dtype=np.int64)
+        self._next_states[pairs, slot] = model.next_states
+        self._rewards = np.zeros((num_pairs, width))
+        self._rewards[pairs, slot] = model.rewards
+        self._dones = np.zeros((num_pairs, width), dtype=bool)
+        self._dones[pairs, slot] = model.dones
+
+        self.states = np.zeros(num_envs, dtype=np.int64)
+        self.elapsed_steps = np.zeros(num_envs, dtype=np.int64)
+
+    @classmethod
+    def from_env(cls, env, num_envs: int,
+                 seed: Optional[int] = None) -> 'BatchedEnv':
+        """`num_envs` copies of `env`, a `ToyTextEnv` or a gym environment,
+        with its time limit."""
+        spec = getattr(env, 'spec', None)
+        return cls(TransitionModel.from_env(env),
+                   getattr(env, 'unwrapped', env).isd, num_envs, seed,
+                   getattr(spec, 'max_episode_steps', None))
+
+    @classmethod
+    def from_name(cls, name: str, num_envs: int,
+                  seed: Optional[int] = None) -> 'BatchedEnv':
+        return cls.from_env(make(name), num_envs, seed)
+
+    def _sample_initial(self, count: int) -> np.ndarray:
+        return np.searchsorted(self._initial_cumulative,
+                               self.rng.random(count), side='right')
+
+    def reset(self) -> np.ndarray:
+        self.states = self._sample_initial(self.num_envs)
+        self.elapsed_steps[:] = 0
+        return self.states.copy()
+
+    def step(self, actions: np.ndarray) -> BatchStep:
+        """Takes `actions[i]` in lane i. Lanes whose episode ends start a new
+        one, so `states` of the result are always ready to act in."""
+        pairs = self.states * self.model.num_actions + actions
+        cumulative = self._cumulative[pairs]
+        # The first outcome whose cumulative probability exceeds the random
+        # number, like gym's `categorical_sample`
+        picked = (cumulative <= self.rng.random(self.num_envs)[:, None]).sum(
+            axis=1)
+        picked = np.minimum(picked, self._last_slot[pairs])
+
+        next_states = self._next_states[pairs, picked]
+        rewards = self._rewards[pairs, picked]
+        terminated = self._dones[pairs, picked]
+        self.elapsed_steps += 1
+        if self.max_episode_steps is None:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        else:
+            truncated = ~terminated & (self.elapsed_steps >=
+                                       self.max_episode_steps)
+
+        states = next_states.copy()
+        finished = terminated | truncated
+        num_finished = int(finished.sum())
+        if num_finished:
+            states[finished] = self._sample_initial(num_finished)
+            self.elapsed_steps[finished] = 0
+        self.states = states
+        return BatchStep(next_states, rewards, terminated, truncated,
+                         states.copy())
+
+
+if __name__ == '__main__':
+    import time
+
+    try:
+        import gym
+    except ImportError:
+        gym = None
+
+    for name in ['FrozenLake-v0', 'FrozenLake8x8-v0', 'Taxi-v3']:
+        if gym is not None:
+            differences = check_transitions(make(name).P,
+                                            gym.make(name).unwrapped.P)
+            print(name, 'matches gym' if not differences else differences[:5])
+
+        env = BatchedEnv.from_name(name, num_envs=10_000, seed=0)
+        env.reset()
+        num_steps = 200
+        start_time = time.perf_counter()
+        for _ in range(num_steps):
+            env.step(env.rng.integers(0, env.model.num_actions,
+                                      env.num_envs))
+        seconds = time.perf_counter() - start_time
+        print(f'{name}: {num_steps * env.num_envs / seconds:,.0f} steps/s')
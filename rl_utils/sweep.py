@@ -0,0 +1,380 @@
+"""Hyperparameter sweeps over `qlearn` and `value_iteration`.
+
+`Taxi_Driver.ipynb` compares `qlearn(gamma=1)` and `qlearn(gamma=0.4)` by
+running them one after the other. `run_sweep` runs every combination of a
+grid of parameters, for several seeds, on a process pool:
+
+```
+run_sweep('taxi.csv', 'qlearn', ['Taxi-v3'],
+          grid(gamma=[0.4, 0.95, 1.0], noise_decay=[0.5, 1.0]), seeds=5)
+print(format_summary(summarize('taxi.csv')))
+```
+
+- Every trial gets its own random stream, derived from the sweep's
+  `root_seed` and the trial's key (solver, environment, parameters and seed),
+  so a trial gives the same result whatever worker runs it and in whatever
+  order.
+- Results are appended to a CSV file, one column per parameter and metric,
+  as soon as each trial finishes. Running the same sweep again skips the
+  trials already in the file, so an interrupted sweep picks up where it left
+  off. A trial that raises is recorded with its error, doesn't stop the
+  others, and is run again next time, and so is a trial whose row was cut
+  short by the interruption. The file is a CSV rather than a columnar
+  format, since it grows one trial at a time and needs no extra packages.
+- `summarize` groups the trials that only differ in their seed, and reports
+  the mean and standard deviation of every metric.
+
+Policies are scored with `exact_score` under the environment's time limit,
+which is exact instead of another noisy estimate. Trials run on the local
+simulator, so the workers don't need gym.
+
+Run `python sweep.py --help` for the command line.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+from dataclasses import dataclass
+from itertools import product
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+import zlib
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from exact_evaluation import exact_score
+from mdp import TransitionModel
+from qlearn import vectorized_qlearn
+from simulator import make
+from value_iteration import TOLERANCE, value_iteration
+
+# Default parameters of every solver. Their types are used to read the
+# parameters back from the results file.
+PARAMETERS: Dict[str, Dict[str, Any]] = {
+    'qlearn': {
+        'gamma': 0.95,
+        'num_episodes': 1000,
+        'num_envs': 64,
+        'alpha': 1.0,
+        'noise_scale': 1.0,
+        'noise_decay': 1.0,
+        'collisions': 'mean',
+    },
+    'value_iteration': {
+        'gamma': 0.9,
+        'tol': TOLERANCE,
+    },
+}
+SCORE_METRICS = ['success_probability', 'expected_steps_to_goal']
+METRICS: Dict[str, List[str]] = {
+    'qlearn': ['mean_reward', 'std_reward', 'last_mean_reward', 'steps'] +
+    SCORE_METRICS + ['seconds'],
+    'value_iteration': ['iterations', 'backups'] + SCORE_METRICS +
+    ['seconds'],
+}
+# Reward of the step that reaches the goal
+GOAL_REWARDS = {'FrozenLake-v0': 1, 'FrozenLake8x8-v0': 1, 'Taxi-v3': 20}
+KEY_COLUMNS = ['key', 'solver', 'env', 'seed']
+# Why a trial failed, empty for trials that succeeded
+ERROR_COLUMN = 'error'
+
+
+def grid(**values: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Every combination of the given parameter values:
+    `grid(gamma=[0.9, 1], alpha=[0.5])` is
+    `[{'gamma': 0.9, 'alpha': 0.5}, {'gamma': 1, 'alpha': 0.5}]`."""
+    names = list(values)
+    return [dict(zip(names, combination))
+            for combination in product(*(values[name] for name in names))]
+
+
+def _parse(value: Any, default: Any) -> Any:
+    """`value`, e.g. read from the results file or the command line, as the
+    type of `default`."""
+    if isinstance(default, bool):
+        return value == 'True' if isinstance(value, str) else bool(value)
+    return type(default)(value)
+
+
+def solver_params(solver: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Every parameter of `solver`, with the values in `params` converted to
+    the types of the defaults, so that `gamma=1` and `gamma=1.0` are the same
+    trial."""
+    defaults = PARAMETERS[solver]
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise ValueError(f'unknown parameters {sorted(unknown)}')
+    return {name: _parse(params[name], default) if name in params else default
+            for name, default in defaults.items()}
+
+
+def trial_key(solver: str, env_name: str, params: Dict[str, Any],
+              seed: int) -> str:
+    """A string naming a trial. Parameters missing from `params` get their
+    defaults, so defaults show up in the key too."""
+    params = solver_params(solver, params)
+    described = ','.join(f'{name}={params[name]!r}'
+                         for name in sorted(params))
+    return f'{solver}|{env_name}|{described}|seed={seed}'
+
+
+def trial_seed(key: str, root_seed: int) -> np.random.SeedSequence:
+    # crc32 rather than hash(), which changes between processes
+    return np.random.SeedSequence([root_seed, zlib.crc32(key.encode())])
+
+
+def _score(model: TransitionModel, env, policy: np.ndarray,
+           env_name: str) -> Dict[str, float]:
+    score = exact_score(model, policy, GOAL_REWARDS.get(env_name, 1),
+                        env.spec.max_episode_steps, env.isd)
+    return {'success_probability': score.success_probability,
+            'expected_steps_to_goal': score.expected_steps_to_goal}
+
+
+def run_trial(solver: str, env_name: str, params: Dict[str, Any],
+              seed: np.random.SeedSequence) -> Dict[str, Any]:
+    """Runs one trial and returns its metrics."""
+    env = make(env_name)
+    model = TransitionModel.from_env(env)
+    start_time = time.perf_counter()
+    if solver == 'qlearn':
+        result = vectorized_qlearn(env, seed=seed, **params)
+        seconds = time.perf_counter() - start_time
+        metrics = {'mean_reward': result.stats.mean,
+                   'std_reward': result.stats.std,
+                   'last_mean_reward': result.stats.recent_mean,
+                   'steps': result.steps}
+        policy = result.policy
+    elif solver == 'value_iteration':
+        solution = value_iteration(model, **params)
+        seconds = time.perf_counter() - start_time
+        metrics = {'iterations': solution.iterations,
+                   'backups': solution.backups}
+        policy = solution.policy
+    else:
+        raise ValueError(f'unknown solver {solver!r}')
+    metrics.update(_score(model, env, policy, env_name))
+    metrics['seconds'] = seconds
+    return metrics
+
+
+def _trial_row(solver: str, env_name: str, params: Dict[str, Any],
+               seed: int) -> Dict[str, Any]:
+    return {'key': trial_key(solver, env_name, params, seed),
+            'solver': solver, 'env': env_name, 'seed': seed, **params}
+
+
+def _run_row(solver: str, env_name: str, params: Dict[str, Any], seed: int,
+             root_seed: int) -> Dict[str, Any]:
+    row = _trial_row(solver, env_name, params, seed)
+    row.update(run_trial(solver, env_name, params,
+                         trial_seed(row['key'], root_seed)))
+    return row
+
+
+def _failed_row(trial: tuple, error: BaseException) -> Dict[str, Any]:
+    solver, env_name, params, seed, _ = trial
+    row = _trial_row(solver, env_name, params, seed)
+    row[ERROR_COLUMN] = f'{type(error).__name__}: {error}'
+    print(f'trial {row["key"]} failed: {row[ERROR_COLUMN]}', file=sys.stderr)
+    return row
+
+
+def _columns(solver: str) -> List[str]:
+    return (KEY_COLUMNS + sorted(PARAMETERS[solver]) + METRICS[solver] +
+            [ERROR_COLUMN])
+
+
+def _succeeded(row: Dict[str, Optional[str]]) -> bool:
+    """Whether `row` of a results file holds every metric of a trial that
+    succeeded. A row cut short, e.g. because the sweep was killed while
+    writing it, has missing or empty fields and doesn't count."""
+    metrics = METRICS.get(row.get('solver') or '')
+    # csv.DictReader puts the fields of a row that is too long under None
+    return (metrics is not None and None not in row and
+            not row.get(ERROR_COLUMN) and all(row.get(m) for m in metrics))
+
+
+def completed_keys(path: str) -> set:
+    """Keys of the trials that already succeeded in the results file at
+    `path`. Failed and incomplete trials are run again."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='') as f:
+        return {row['key'] for row in csv.DictReader(f) if _succeeded(row)}
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def run_sweep(path: str,
+              solver: str,
+              env_names: Iterable[str],
+              params_grid: Iterable[Dict[str, Any]] = ({},),
+              seeds: Union[int, Sequence[int]] = 1,
+              workers: Optional[int] = None,
+              root_seed: int = 0) -> int:
+    """Runs every combination of environment, parameters and seed that isn't
+    in the results file at `path` yet, and appends the results to it.
+
+    `seeds` is a number of seeds or a list of them. `workers` is the number
+    of processes (the number of CPUs by default); with 1 the trials run in
+    this process. Returns the number of trials run.
+
+    A trial that raises is written with its error in the `error` column and
+    without metrics, and the other trials carry on.
+    """
+    if solver not in PARAMETERS:
+        raise ValueError(f'unknown solver {solver!r}')
+    if isinstance(seeds, int):
+        seeds = range(seeds)
+
+    columns = _columns(solver)
+    # The last row of an interrupted sweep can be missing its end of line
+    cut_short = False
+    if os.path.exists(path) and os.path.getsize(path):
+        with open(path, newline='') as f:
+            header = next(csv.reader(f))
+        if header != columns:
+            raise ValueError(f'{path} holds results of a different sweep')
+        cut_short = not _ends_with_newline(path)
+    done = completed_keys(path)
+
+    pending = []
+    for env_name in env_names:
+        for params in params_grid:
+            params = solver_params(solver, params)
+            for seed in seeds:
+                key = trial_key(solver, env_name, params, seed)
+                if key not in done:
+                    done.add(key)
+                    pending.append((solver, env_name, params, seed,
+                                    root_seed))
+
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, columns)
+        if not f.tell():
+            writer.writeheader()
+        elif cut_short:
+            f.write(writer.writer.dialect.lineterminator)
+
+        def write(row: Dict[str, Any]) -> None:
+            writer.writerow(row)
+            f.flush()
+
+        if workers == 1:
+            for trial in pending:
+                try:
+                    write(_run_row(*trial))
+                except Exception as e:
+                    write(_failed_row(trial, e))
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                futures = {executor.submit(_run_row, *trial): trial
+                           for trial in pending}
+                for future in as_completed(futures):
+                    try:
+                        row = future.result()
+                    except Exception as e:
+                        row = _failed_row(futures[future], e)
+                    write(row)
+    return len(pending)
+
+
+@dataclass
+class Summary:
+    solver: str
+    env: str
+    params: Dict[str, Any]
+    num_seeds: int
+    # Mean and standard deviation (over the seeds) of every metric
+    means: Dict[str, float]
+    stds: Dict[str, float]
+
+
+def summarize(path: str) -> List[Summary]:
+    """Groups the trials in the results file at `path` by everything but
+    their seed. Failed and incomplete trials are left out."""
+    with open(path, newline='') as f:
+        rows = [row for row in csv.DictReader(f) if _succeeded(row)]
+
+    groups: Dict[tuple, List[Dict[str, str]]] = {}
+    for row in rows:
+        defaults = PARAMETERS[row['solver']]
+        params = tuple((name, _parse(row[name], defaults[name]))
+                       for name in sorted(defaults))
+        groups.setdefault((row['solver'], row['env'], params), []).append(row)
+
+    summaries = []
+    for (solver, env_name, params), group in groups.items():
+        means = {}
+        stds = {}
+        for metric in METRICS[solver]:
+            values = np.array([float(row[metric]) for row in group])
+            means[metric] = float(values.mean())
+            stds[metric] = float(values.std(ddof=1)) if len(values) > 1 \
+                else 0.0
+        summaries.append(
+            Summary(solver, env_name, dict(params), len(group), means, stds))
+    return summaries
+
+
+def format_summary(summaries: List[Summary],
+                   metrics: Optional[Sequence[str]] = None) -> str:
+    """A table with one line per group, showing only the parameters that
+    vary between the groups."""
+    if not summaries:
+        return ''
+    varying = [name for name in summaries[0].params
+               if len({repr(s.params.get(name)) for s in summaries}) > 1]
+    if metrics is None:
+        metrics = METRICS[summaries[0].solver]
+    lines = [' '.join([f'{"env":>16}'] + [f'{n:>12}' for n in varying] +
+                      [f'{"seeds":>5}'] + [f'{m:>24}' for m in metrics])]
+    for s in summaries:
+        cells = [f'{s.env:>16}'] + [f'{s.params[n]!s:>12}' for n in varying]
+        cells.append(f'{s.num_seeds:>5}')
+        cells += [f'{s.means[m]:>12.4g} ± {s.stds[m]:<9.3g}' for m in metrics]
+        lines.append(' '.join(cells))
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('path', help='CSV file to append the results to')
+    parser.add_argument('--solver', choices=sorted(PARAMETERS),
+                        default='qlearn')
+    parser.add_argument('--env', nargs='+', default=['Taxi-v3'])
+    parser.add_argument('--param', action='append', default=[],
+                        metavar='NAME=V1,V2,...',
+                        help='values of a parameter to sweep, can repeat')
+    parser.add_argument('--seeds', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--root-seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    defaults = PARAMETERS[args.solver]
+    values = {}
+    for param in args.param:
+        name, _, listed = param.partition('=')
+        if name not in defaults:
+            parser.error(f'unknown parameter {name!r} for {args.solver}')
+        values[name] = [_parse(v, defaults[name]) for v in listed.split(',')]
+
+    start_time = time.perf_counter()
+    ran = run_sweep(args.path, args.solver, args.env, grid(**values),
+                    args.seeds, args.workers, args.root_seed)
+    print(f'ran {ran} trials in {time.perf_counter() - start_time:.1f}s')
+    print(format_summary([s for s in summarize(args.path)
+                          if s.solver == args.solver]))
+
+
+if __name__ == '__main__':
+    main()
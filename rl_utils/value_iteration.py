@@ -0,0 +1,121 @@
+"""Value iteration over a compiled transition model.
+
+This is the algorithm of `value_iteration` in `Frozen_Lake.ipynb`, but each
+sweep backs up every state and action at once (`TransitionModel.q_values`)
+instead of looping over states, actions and outcomes in Python. It stops as
+soon as no value changed by more than `tol` in the last sweep (the max-norm of
+the change), instead of comparing the sums of the values after at least 1000
+sweeps.
+
+Usage from a notebook:
+
+```
+import sys
+sys.path.append('../rl_utils')
+from value_iteration import value_iteration
+
+state_func, policy = value_iteration(env, gamma=0.9)
+```
+
+The result also holds the number of sweeps and backups it took, see
+`Solution`. `async_value_iteration.py` has engines that update states in
+place, which needs fewer backups.
+
+References:
+- https://en.wikipedia.org/wiki/Markov_decision_process#Value_iteration
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from mdp import TransitionModel, compile_model
+
+# Stop once no value changes by more than this in a sweep
+TOLERANCE = 1e-8
+
+
+class _Result(NamedTuple):
+    values: np.ndarray
+    policy: np.ndarray
+
+
+class Solution(_Result):
+    """`values[s]` is how good state s is and `policy[s]` the best action in
+    s. A pair like the result of the notebook's `value_iteration`, so
+    `state_func, policy = solution` works.
+
+    How long it took is only available as attributes: `iterations` counts the
+    sweeps (or improvement steps), `None` for engines that don't sweep, and
+    `backups` the single state Bellman backups.
+    """
+
+    def __new__(cls, values: np.ndarray, policy: np.ndarray,
+                iterations: Optional[int] = None,
+                backups: Optional[int] = None) -> 'Solution':
+        solution = super().__new__(cls, values, policy)
+        solution.iterations = iterations
+        solution.backups = backups
+        return solution
+
+    def __repr__(self) -> str:
+        return (f'Solution(values={self.values!r}, policy={self.policy!r}, '
+                f'iterations={self.iterations}, backups={self.backups})')
+
+
+def greedy_policy(model: TransitionModel, values: np.ndarray,
+                  gamma: float) -> np.ndarray:
+    """The action with the highest value in every state, the first one on
+    ties."""
+    return model.q_values(values, gamma).argmax(axis=1)
+
+
+def value_iteration(env,
+                    max_iterations: int = 100000,
+                    gamma: float = 0.9,
+                    tol: float = TOLERANCE,
+                    values: Optional[np.ndarray] = None,
+                    dense: Optional[bool] = None) -> Solution:
+    """Finds how good every state is and the best action in every state.
+
+    `env` is a gym environment (anything with `P`, `nS` and `nA`) or an
+    already compiled `TransitionModel`. `values` optionally gives the starting
+    values, all zeros by default. `dense` is passed on to
+    `TransitionModel.q_values`.
+    """
+    model = compile_model(env)
+    if values is None:
+        values = np.zeros(model.num_states)
+    else:
+        values = np.asarray(values, dtype=np.float64)
+
+    iterations = 0
+    q = model.q_values(values, gamma, dense)
+    while iterations < max_iterations:
+        new_values = q.max(axis=1)
+        iterations += 1
+        change = np.abs(new_values - values).max(initial=0)
+        values = new_values
+        q = model.q_values(values, gamma, dense)
+        if change < tol:
+            break
+
+    return Solution(values, q.argmax(axis=1), iterations,
+                    iterations * model.num_states)
+
+
+if __name__ == '__main__':
+    import gym
+    import time
+
+    env = gym.make('FrozenLake8x8-v0')
+    start_time = time.perf_counter()
+    solution = value_iteration(env)
+    print(f'{solution.iterations} iterations in '
+          f'{time.perf_counter() - start_time:.3f}s')
+    state_func, policy = solution
+    print(state_func.reshape(8, 8).round(3))
+    print(policy.reshape(8, 8))
@@ -8,15 +8,17 @@ References:
 - https://en.wikipedia.org/wiki/A*_search_algorithm
 """
 
-from collections import defaultdict
-from queue import PriorityQueue
-import turtle
-from typing import Callable, List, Optional, Tuple, TypeVar
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from itertools import count
+import time
+from typing import Callable, Dict, Generic, List, Optional, Set, Tuple, TypeVar
 
 import sys
 sys.path.append('.')
 
 from graph_utils import Node, Graph
+from instrumentation import Instrumentation
 
 # Generic type restricted to any subclass of `Node`
 GeneralNode = TypeVar('GeneralNode', bound=Node)
@@ -24,10 +26,13 @@ GeneralNode = TypeVar('GeneralNode', bound=Node)
 
 def reconstruct_path(came_from: dict,
                      current: GeneralNode) -> List[GeneralNode]:
+    # We walk backwards from the goal and reverse once at the end. Building the
+    # path with `[current] + total_path` would copy it on every step.
     total_path = [current]
-    while current in came_from.keys():
+    while current in came_from:
         current = came_from[current]
-        total_path = [current] + total_path
+        total_path.append(current)
+    total_path.reverse()
     return total_path
 
 
@@ -35,54 +40,150 @@ NodeType = TypeVar('NodeType')
 Heuristic = Callable[[NodeType, NodeType], float]
 
 
-def a_star(start: GeneralNode, goal: GeneralNode,
-           h: Heuristic[GeneralNode]) -> Optional[List[GeneralNode]]:
-    """A* finds a path from `start` to `goal`.
-    
+@dataclass
+class SearchStats:
+    """Counters describing how much work a search did."""
+    # Nodes taken off the open set and expanded
+    expanded: int = 0
+    # Entries added to the open set
+    pushes: int = 0
+    # Entries taken off the open set that were out of date and skipped
+    stale_pops: int = 0
+
+
+@dataclass
+class SearchResult(Generic[GeneralNode]):
+    """The outcome of a search. `path` is `None` if the goal is unreachable,
+    in which case `cost` is infinite."""
+    path: Optional[List[GeneralNode]]
+    cost: float = float('inf')
+    stats: SearchStats = field(default_factory=SearchStats)
+
+    @property
+    def found(self) -> bool:
+        return self.path is not None
+
+
+def a_star_search(start: GeneralNode,
+                  goal: GeneralNode,
+                  h: Heuristic[GeneralNode],
+                  instrument: Optional[Instrumentation] = None
+                  ) -> SearchResult[GeneralNode]:
+    """A* finds a path from `start` to `goal`, and returns it together with its
+    cost and some statistics about the search.
+
     `h` is the heuristic function. `h(n, goal)` estimates the cost to reach
-    `goal` from node `n`.
+    `goal` from node `n`. The path is the shortest one as long as `h` never
+    overestimates and is consistent, i.e. `h(n, goal) <= weight(n, m) + h(m,
+    goal)` for every edge from `n` to `m`. The straight line distance
+    `Graph.calc_distance` satisfies both.
+
+    `instrument` optionally collects more detailed counters and timings, see
+    `instrumentation.py`.
     """
-    open_set: PriorityQueue[Tuple[float, GeneralNode]] = PriorityQueue()
+    stats = SearchStats()
+    if instrument is not None:
+        instrument.searches += 1
+        h = instrument.counting(h)
+        search_start = time.perf_counter()
+
+    # The open set is a binary heap of (f_score, tie_breaker, g_score, node).
+    # `heapq` is much faster than `queue.PriorityQueue`, which takes a lock on
+    # every operation. The tie breaker is a counter that increases with every
+    # push, so entries with the same f_score never fall through to comparing
+    # the nodes themselves.
+    tie_breaker = count()
+    open_set: List[Tuple[float, int, float, GeneralNode]] = []
 
     # For node n, came_from[n] is the node immediately preceding it on the
     # cheapest path from start to n currently known.
-    came_from = dict()
+    came_from: Dict[GeneralNode, GeneralNode] = {}
 
     # For node n, g_score[n] is the cost of the cheapest path from start to n
     # currently known.
-    g_score = defaultdict(lambda: float('inf'))
-    g_score[start] = 0
+    g_score: Dict[GeneralNode, float] = {start: 0}
 
-    h_initial = h(start, goal)
+    # Nodes that have already been expanded. With a consistent heuristic the
+    # first time we expand a node we have found the cheapest path to it.
+    closed: Set[GeneralNode] = set()
 
-    # For node n, f_score[n] = g_score[n] + h(n, goal). f_score[n] represents
-    # our current best guess as to how short a path from start to finish can be
-    # if it goes through n.
-    f_score = defaultdict(lambda: float('inf'))
-    f_score[start] = h_initial
+    # For node n, f_score = g_score[n] + h(n, goal) represents our current best
+    # guess as to how short a path from start to finish can be if it goes
+    # through n.
+    heappush(open_set, (h(start, goal), next(tie_breaker), 0, start))
+    stats.pushes += 1
 
-    open_set.put((h_initial, start))
+    found = False
+    while open_set:
+        _, _, g, current = heappop(open_set)
 
-    while not open_set.empty():
-        _, current = open_set.get()
+        # Instead of removing entries from the heap when we find a cheaper path
+        # to a node, we push a new entry and skip the old one when it comes up.
+        if current in closed:
+            stats.stale_pops += 1
+            continue
 
         if current == goal:
-            return reconstruct_path(came_from, current)
+            found = True
+            break
+
+        closed.add(current)
+        stats.expanded += 1
+        if instrument is not None:
+            instrument.expand(current, len(current.weighted_neighbors))
 
         for neighbor, weight in current.get_weighted_neighbors():
+            if neighbor in closed:
+                continue
             # tentative_g_score is the distance from start to the neighbor
             # through current
-            tentative_g_score = g_score[current] + weight
-            if tentative_g_score < g_score[neighbor]:
+            tentative_g_score = g + weight
+            if tentative_g_score < g_score.get(neighbor, float('inf')):
                 # This path to neighbor is better than any previous one. Record it!
                 came_from[neighbor] = current
                 g_score[neighbor] = tentative_g_score
-                f_score[neighbor] = g_score[neighbor] + h(neighbor, goal)
-                if neighbor not in open_set.queue:
-                    open_set.put((f_score[neighbor], neighbor))
+                heappush(open_set,
+                         (tentative_g_score + h(neighbor, goal),
+                          next(tie_breaker), tentative_g_score, neighbor))
+                stats.pushes += 1
+
+    if instrument is not None:
+        instrument.pushes += stats.pushes
+        instrument.pops += stats.expanded + stats.stale_pops + found
+        instrument.stale_pops += stats.stale_pops
+        instrument.phase_seconds['search'] += (time.perf_counter() -
+                                               search_start)
+
+    if not found:
+        return SearchResult(None, float('inf'), stats)
+
+    if instrument is None:
+        path = reconstruct_path(came_from, current)
+    else:
+        with instrument.phase('reconstruct'):
+            path = reconstruct_path(came_from, current)
+    return SearchResult(path, g, stats)
+
+
+def a_star(start: GeneralNode,
+           goal: GeneralNode,
+           h: Heuristic[GeneralNode],
+           instrument: Optional[Instrumentation] = None
+           ) -> Optional[List[GeneralNode]]:
+    """A* finds a path from `start` to `goal`.
+    
+    `h` is the heuristic function. `h(n, goal)` estimates the cost to reach
+    `goal` from node `n`.
+
+    Returns `None` if there is no path. See `a_star_search` for the cost of the
+    path and statistics about the search.
+    """
+    return a_star_search(start, goal, h, instrument).path
 
 
 if __name__ == '__main__':
+    import turtle
+
     graph = Graph('week-2/graph2.txt', undirected=True)
     nodes = graph.nodes
 
@@ -97,7 +198,9 @@ if __name__ == '__main__':
     a GPS.
     """
     h = graph.calc_distance  # lambda _, __: 0
-    path = a_star(nodes['1'], nodes['10'], h)
+    result = a_star_search(nodes['1'], nodes['10'], h)
+    path = result.path
+    print(f'cost: {result.cost:.1f}, {result.stats}')
 
     graph.draw_graph()
     if path:
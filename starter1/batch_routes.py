@@ -0,0 +1,247 @@
+"""Many-to-many route queries on a pool of worker processes.
+
+Running `a_star` for one (source, target) pair after another uses a single CPU
+core. `route_many` fans a batch of pairs out over a process pool instead.
+
+Pickling a graph of `LocationNode` objects into every worker would be slow and
+would copy the whole graph once per process. Instead the arrays of a
+`CSRGraph` are copied once into shared memory, and every worker maps that same
+copy and runs `csr_search.a_star_indices` on it.
+"""
+
+from dataclasses import dataclass
+from itertools import islice
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import (Dict, Iterable, Iterator, List, Mapping, Optional,
+                    Sequence, Tuple, Union)
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from csr_graph import CSRGraph
+from csr_search import a_star_indices
+from graph_utils import NodeId
+
+# Name, dtype and shape of each array of the shared graph
+ArraySpec = Tuple[str, str, Tuple[int, ...]]
+
+STATUS_OK = 'ok'
+STATUS_UNREACHABLE = 'unreachable'
+STATUS_ERROR = 'error'
+
+# Stands in for node ids the graph doesn't have
+UNKNOWN_NODE = -1
+
+
+@dataclass
+class RouteResult:
+    """The result of one query of a batch. `query` is the position of the
+    pair in the batch. `path` holds node indices and is only filled in when
+    paths were requested."""
+    query: int
+    source: int
+    target: int
+    status: str
+    cost: float = float('inf')
+    expanded: int = 0
+    path: Optional[List[int]] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == STATUS_OK
+
+
+class SharedCSRGraph:
+    """Copies the arrays of a `CSRGraph` into shared memory blocks.
+
+    Use it as a context manager: the blocks are released when the `with` block
+    ends. `spec` is a small picklable description that workers pass to
+    `attach` to map the same memory.
+    """
+    FIELDS = ('positions', 'offsets', 'targets', 'weights')
+
+    def __init__(self, csr: CSRGraph):
+        self.undirected = csr.undirected
+        self.blocks: List[SharedMemory] = []
+        self.spec: Dict[str, ArraySpec] = {}
+        try:
+            for name in self.FIELDS:
+                array = np.ascontiguousarray(getattr(csr, name))
+                block = SharedMemory(create=True, size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = \
+                    array
+                self.spec[name] = (block.name, array.dtype.str, array.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self) -> 'SharedCSRGraph':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def attach(spec: Dict[str, ArraySpec],
+               undirected: bool) -> Tuple[CSRGraph, List[SharedMemory]]:
+        """Maps the shared arrays described by `spec` into a `CSRGraph`. The
+        returned blocks must be kept alive as long as the graph is used."""
+        blocks = []
+        arrays = {}
+        for name, (block_name, dtype, shape) in spec.items():
+            block = SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        num_nodes = len(arrays['offsets']) - 1
+        # Workers only deal in node indices, so they don't need the real ids
+        csr = CSRGraph(node_ids=range(num_nodes), undirected=undirected,
+                       index=_IdentityIndex(num_nodes), **arrays)
+        return csr, blocks
+
+
+class _IdentityIndex(Mapping[int, int]):
+    """The id to index mapping of a graph whose node ids are its indices."""
+
+    def __init__(self, num_nodes: int):
+        self.num_nodes = num_nodes
+
+    def __len__(self) -> int:
+        return self.num_nodes
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.num_nodes))
+
+    def __getitem__(self, node_id: int) -> int:
+        if not 0 <= node_id < self.num_nodes:
+            raise KeyError(node_id)
+        return node_id
+
+
+# The graph each worker process attached to in `_init_worker`
+_worker_graph: Optional[CSRGraph] = None
+_worker_blocks: List[SharedMemory] = []
+
+
+def _init_worker(spec: Dict[str, ArraySpec], undirected: bool):
+    global _worker_graph, _worker_blocks
+    _worker_graph, _worker_blocks = SharedCSRGraph.attach(spec, undirected)
+
+
+def _route_chunk(
+    args: Tuple[List[Tuple[int, int, int]], bool, bool]
+) -> List[RouteResult]:
+    queries, use_heuristic, include_paths = args
+    return [
+        _route_one(_worker_graph, query, source, target, use_heuristic,
+                   include_paths) for query, source, target in queries
+    ]
+
+
+def _route_one(csr: CSRGraph, query: int, source: int, target: int,
+               use_heuristic: bool, include_paths: bool) -> RouteResult:
+    try:
+        for node in (source, target):
+            if node == UNKNOWN_NODE:
+                raise KeyError('unknown node id')
+            if not 0 <= node < csr.num_nodes:
+                raise IndexError(f'node index {node} out of range')
+        result = a_star_indices(csr, source, target, use_heuristic)
+    except Exception as e:
+        return RouteResult(query, source, target, STATUS_ERROR,
+                           error=f'{type(e).__name__}: {e}')
+    if not result.found:
+        return RouteResult(query, source, target, STATUS_UNREACHABLE,
+                           expanded=result.stats.expanded)
+    return RouteResult(query, source, target, STATUS_OK, result.cost,
+                       result.stats.expanded,
+                       result.path if include_paths else None)
+
+
+Pair = Tuple[Union[int, NodeId], Union[int, NodeId]]
+
+
+def _to_indices(csr: CSRGraph,
+                pairs: Union[np.ndarray, Iterable[Pair]]) -> np.ndarray:
+    """Accepts an (n, 2) array of node indices or a sequence of pairs of node
+    ids (or indices) and returns an (n, 2) array of node indices. Ids the
+    graph doesn't have become `UNKNOWN_NODE`, so only their queries fail."""
+    if isinstance(pairs, np.ndarray) and pairs.dtype.kind in 'iu':
+        return pairs.reshape(-1, 2)
+
+    def to_index(node) -> int:
+        return node if isinstance(node, (int, np.integer)) else \
+            csr.index.get(node, UNKNOWN_NODE)
+
+    return np.array([(to_index(s), to_index(t)) for s, t in pairs],
+                    dtype=np.int64).reshape(-1, 2)
+
+
+def _chunks(indices: np.ndarray,
+            chunk_size: int) -> Iterator[List[Tuple[int, int, int]]]:
+    queries = ((q, s, t) for q, (s, t) in enumerate(indices.tolist()))
+    while True:
+        chunk = list(islice(queries, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def route_many(csr: CSRGraph,
+               pairs: Union[np.ndarray, Sequence[Pair]],
+               processes: Optional[int] = None,
+               ordered: bool = True,
+               chunk_size: int = 16,
+               use_heuristic: bool = True,
+               include_paths: bool = False) -> Iterator[RouteResult]:
+    """Runs A* for every (source, target) pair in `pairs` on a pool of
+    `processes` workers (default: one per CPU) and yields a `RouteResult` per
+    pair.
+
+    With `ordered` the results come back in the order of `pairs`, otherwise
+    they are yielded as soon as they are done. Pairs are sent to the workers
+    `chunk_size` at a time to keep the communication overhead low.
+
+    A query that can't reach its target has status `'unreachable'`. A query
+    that fails, e.g. because of a bad node index or an unknown node id, has
+    status `'error'` and doesn't stop the rest of the batch.
+    """
+    indices = _to_indices(csr, pairs)
+    tasks = ((chunk, use_heuristic, include_paths)
+             for chunk in _chunks(indices, chunk_size))
+
+    with SharedCSRGraph(csr) as shared:
+        with Pool(processes, initializer=_init_worker,
+                  initargs=(shared.spec, shared.undirected)) as pool:
+            imap = pool.imap if ordered else pool.imap_unordered
+            for chunk_results in imap(_route_chunk, tasks):
+                yield from chunk_results
+
+
+if __name__ == '__main__':
+    import time
+
+    graph_file = sys.argv[1] if len(sys.argv) > 1 else 'graph2.txt'
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    csr = CSRGraph.from_file(graph_file)
+    rng = np.random.default_rng(0)
+    pairs = rng.integers(csr.num_nodes, size=(num_queries, 2))
+
+    start_time = time.perf_counter()
+    results = list(route_many(csr, pairs))
+    elapsed = time.perf_counter() - start_time
+
+    found = sum(result.ok for result in results)
+    print(f'{num_queries} queries in {elapsed:.2f}s '
+          f'({num_queries / elapsed:.0f} queries/s), {found} found')
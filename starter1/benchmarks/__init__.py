@@ -0,0 +1,11 @@
+"""Benchmarks for the starter algorithms on synthetic graphs.
+
+`generators` makes seeded graphs of any size in the `graph_utils` file format,
+`runner` times the algorithms on them and compares the results with a
+baseline, and `heuristics` times A* heuristics with and without precomputed
+goal distances. See `runner.py` for how to run them.
+"""
+
+from .generators import (GENERATORS, SyntheticGraph, chain, dag,
+                         generate_graph_file, grid, random_geometric,
+                         scale_free, write_graph_file)
@@ -0,0 +1,216 @@
+"""Seeded generators of synthetic graphs.
+
+Every generator takes the number of nodes and a seed, and returns the same
+`SyntheticGraph` for the same arguments. Node ids are `0` to `num_nodes - 1`,
+positions are integers, and `write_graph_file` writes the format read by
+`graph_utils.Graph`:
+
+```
+node_id:node_x,node_y neighbor_id1 neighbor_id2 ...
+```
+
+- `grid`: a square lattice, each node linked to the node on its right and the
+  node below it
+- `random_geometric`: random points, each linked to the points within a fixed
+  radius, chosen so that the average degree stays the same at every size
+- `scale_free`: preferential attachment (Barabási–Albert), so a few hubs have
+  most of the edges
+- `chain`: a single path through all nodes, the worst case for recursion
+- `dag`: random edges that all point forward in a hidden order, shuffled so
+  that node ids don't give the order away
+
+References:
+- https://en.wikipedia.org/wiki/Random_geometric_graph
+- https://en.wikipedia.org/wiki/Barab%C3%A1si%E2%80%93Albert_model
+"""
+
+from dataclasses import dataclass
+import random
+from typing import Callable, Dict
+
+import numpy as np
+
+# Distance between neighboring nodes of the layouts, in graph coordinates
+SPACING = 10
+
+
+@dataclass
+class SyntheticGraph:
+    """`positions[i]` is the position of node i, and there is an edge from
+    `sources[e]` to `targets[e]` for every e."""
+    positions: np.ndarray
+    sources: np.ndarray
+    targets: np.ndarray
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.positions)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.sources)
+
+
+Generator = Callable[[int, int], SyntheticGraph]
+
+
+def _edges(sources, targets) -> Dict[str, np.ndarray]:
+    return dict(sources=np.asarray(sources, dtype=np.int64),
+                targets=np.asarray(targets, dtype=np.int64))
+
+
+def grid(num_nodes: int, seed: int = 0) -> SyntheticGraph:
+    """A square grid, filled row by row. The seed is unused, since the grid is
+    the same every time."""
+    side = max(1, int(np.ceil(np.sqrt(num_nodes))))
+    nodes = np.arange(num_nodes)
+    row, column = np.divmod(nodes, side)
+    positions = np.stack([column, row], axis=1) * SPACING
+
+    right = nodes[(column + 1 < side) & (nodes + 1 < num_nodes)]
+    down = nodes[nodes + side < num_nodes]
+    return SyntheticGraph(
+        positions,
+        **_edges(np.concatenate([right, down]),
+                 np.concatenate([right + 1, down + side])))
+
+
+def random_geometric(num_nodes: int,
+                     seed: int = 0,
+                     degree: float = 6) -> SyntheticGraph:
+    """Random points in a square, with an edge from each point to every
+    point after it within a radius. Loaded as an undirected graph, nodes have
+    `degree` neighbors on average."""
+    rng = np.random.default_rng(seed)
+    # One node per SPACING x SPACING square on average
+    side = SPACING * np.sqrt(num_nodes)
+    positions = np.rint(rng.random((num_nodes, 2)) * side).astype(np.int64)
+    radius = SPACING * np.sqrt(degree / np.pi)
+
+    # Bucket the points into cells as wide as the radius, so that only points
+    # in the same or adjacent cells can be linked
+    cells = (positions // radius).astype(np.int64)
+    num_columns = int(cells[:, 0].max(initial=0)) + 2
+    cell_ids = cells[:, 0] + cells[:, 1] * num_columns
+    order = np.argsort(cell_ids, kind='stable')
+    sorted_cells = cell_ids[order]
+
+    sources, targets = [], []
+    for dx, dy in [(0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]:
+        neighbor_cells = cell_ids + dx + dy * num_columns
+        starts = np.searchsorted(sorted_cells, neighbor_cells, side='left')
+        counts = np.searchsorted(sorted_cells, neighbor_cells,
+                                 side='right') - starts
+        # Every node paired with every point in the neighboring cell
+        run_starts = np.cumsum(counts) - counts
+        candidates = order[np.repeat(starts - run_starts, counts) +
+                           np.arange(int(counts.sum()))]
+        nodes = np.repeat(np.arange(num_nodes), counts)
+
+        keep = np.hypot(*(positions[nodes] - positions[candidates]).T) <= \
+            radius
+        if (dx, dy) == (0, 0):
+            # Within a cell, only link each pair once
+            keep &= nodes < candidates
+        sources.append(nodes[keep])
+        targets.append(candidates[keep])
+
+    return SyntheticGraph(positions,
+                          **_edges(np.concatenate(sources),
+                                   np.concatenate(targets)))
+
+
+def scale_free(num_nodes: int,
+               seed: int = 0,
+               edges_per_node: int = 2) -> SyntheticGraph:
+    """Barabási–Albert graph: every new node links to `edges_per_node`
+    existing nodes, picked with probability proportional to their degree."""
+    rng = random.Random(seed)
+    # Every node appears here once per edge it has, so picking a random entry
+    # picks a node with probability proportional to its degree
+    endpoints = list(range(min(num_nodes, edges_per_node)))
+    sources, targets = [], []
+    for node in range(edges_per_node, num_nodes):
+        picked = set()
+        while len(picked) < edges_per_node:
+            picked.add(rng.choice(endpoints))
+        for target in picked:
+            sources.append(node)
+            targets.append(target)
+            endpoints.append(target)
+            endpoints.append(node)
+
+    positions = np.random.default_rng(seed).integers(
+        0, int(SPACING * np.sqrt(max(num_nodes, 1))) + 1, (num_nodes, 2))
+    return SyntheticGraph(positions, **_edges(sources, targets))
+
+
+def chain(num_nodes: int, seed: int = 0) -> SyntheticGraph:
+    """A path 0 -> 1 -> ... -> num_nodes - 1, laid out as a snake so that the
+    picture stays square. The seed is unused."""
+    side = max(1, int(np.ceil(np.sqrt(num_nodes))))
+    nodes = np.arange(num_nodes)
+    row, column = np.divmod(nodes, side)
+    column = np.where(row % 2 == 0, column, side - 1 - column)
+    positions = np.stack([column, row], axis=1) * SPACING
+    return SyntheticGraph(positions, **_edges(nodes[:-1], nodes[1:]))
+
+
+def dag(num_nodes: int,
+        seed: int = 0,
+        degree: int = 3,
+        window: int = 100) -> SyntheticGraph:
+    """A directed acyclic graph where every node has up to `degree` edges to
+    nodes at most `window` places after it in a hidden topological order."""
+    rng = np.random.default_rng(seed)
+    hidden = np.repeat(np.arange(num_nodes), degree)
+    later = hidden + rng.integers(1, window + 1, len(hidden))
+    keep = later < num_nodes
+    hidden, later = hidden[keep], later[keep]
+    # Drop repeated edges
+    pairs = np.unique(hidden * num_nodes + later)
+    hidden, later = np.divmod(pairs, num_nodes)
+
+    # Node ids are a random permutation of the hidden order
+    node_at = rng.permutation(num_nodes)
+    positions = rng.integers(0, int(SPACING * np.sqrt(max(num_nodes, 1))) + 1,
+                             (num_nodes, 2))
+    return SyntheticGraph(positions, **_edges(node_at[hidden],
+                                              node_at[later]))
+
+
+GENERATORS: Dict[str, Generator] = {
+    'grid': grid,
+    'random_geometric': random_geometric,
+    'scale_free': scale_free,
+    'chain': chain,
+    'dag': dag,
+}
+
+
+def write_graph_file(graph: SyntheticGraph, graph_file: str):
+    """Writes `graph` in the format read by `graph_utils.Graph`."""
+    order = np.argsort(graph.sources, kind='stable')
+    targets = graph.targets[order].tolist()
+    offsets = np.zeros(graph.num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(graph.sources, minlength=graph.num_nodes),
+              out=offsets[1:])
+    offsets = offsets.tolist()
+
+    with open(graph_file, 'w') as f:
+        for node, (x, y) in enumerate(graph.positions.tolist()):
+            neighbors = targets[offsets[node]:offsets[node + 1]]
+            f.write(f'{node}:{x},{y}')
+            if neighbors:
+                f.write(' ')
+                f.write(' '.join(map(str, neighbors)))
+            f.write('\n')
+
+
+def generate_graph_file(generator: str, num_nodes: int, graph_file: str,
+                        seed: int = 0) -> SyntheticGraph:
+    """Generates a graph with the generator called `generator` and writes it
+    to `graph_file`."""
+    graph = GENERATORS[generator](num_nodes, seed)
+    write_graph_file(graph, graph_file)
+    return graph
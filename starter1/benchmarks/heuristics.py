@@ -0,0 +1,108 @@
+"""Times the straight line heuristic computed per node against precomputed
+per-goal distance vectors.
+
+On a grid graph, the rows are:
+
+- `a_star`: `a_star.a_star_search` with `Graph.calc_distance`
+- `indices`: `csr_search.a_star_indices`, computing the distance from the
+  node positions on every call
+- `vector`: `a_star_indices` with `csr_search.goal_distances(csr, goal)`
+  computed for every query
+- `cached vector`: `a_star_indices` with `Graph.goal_distances(goal)`, which
+  keeps the vectors of recent goals
+
+each for 200 short searches to different goals and for 5 long searches to the
+same goal. Every time is the best of several runs, started without cached
+vectors.
+
+Run from the `starter1` folder:
+
+```
+python -m benchmarks.heuristics --nodes 250000
+```
+"""
+
+import argparse
+import os
+import tempfile
+import timeit
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from a_star import a_star_search
+from csr_graph import CSRGraph
+from csr_search import a_star_indices, goal_distances
+from graph_utils import Graph
+
+from .generators import generate_graph_file
+
+REPEAT = 3
+
+
+def run(num_nodes: int = 250_000, seed: int = 0,
+        repeat: int = REPEAT) -> List[Tuple[str, str, float]]:
+    """Returns (queries, heuristic, seconds) rows, see the module
+    docstring."""
+    with tempfile.TemporaryDirectory() as tmp:
+        graph_file = os.path.join(tmp, 'grid.txt')
+        generate_graph_file('grid', num_nodes, graph_file, seed)
+        graph = Graph(graph_file)
+    csr = CSRGraph.from_graph(graph)
+    nodes = list(graph.nodes.values())
+    side = int(np.ceil(np.sqrt(num_nodes)))
+    rng = np.random.default_rng(seed)
+
+    # A few steps apart, to different goals every time
+    goals = rng.integers(side, num_nodes - side, 200).tolist()
+    short = [(g - 2 - side, g) for g in goals]
+    # Across the grid, all to the same goal
+    far = [(s, num_nodes - 1) for s in rng.integers(side, size=5).tolist()]
+
+    def best(function: Callable[[], object]) -> float:
+        def run_once():
+            graph._goal_distances.clear()
+            graph._goal_cache_bytes = 0
+            function()
+        return min(timeit.repeat(run_once, number=1, repeat=repeat))
+
+    def searches(queries, heuristic) -> Callable[[], None]:
+        def run_searches():
+            for start, goal in queries:
+                if heuristic == 'a_star':
+                    a_star_search(nodes[start], nodes[goal],
+                                  graph.calc_distance)
+                elif heuristic == 'indices':
+                    a_star_indices(csr, start, goal)
+                elif heuristic == 'vector':
+                    a_star_indices(csr, start, goal,
+                                   heuristic=goal_distances(csr, goal))
+                else:
+                    a_star_indices(
+                        csr, start, goal,
+                        heuristic=graph.goal_distances(nodes[goal]))
+        return run_searches
+
+    rows = []
+    for name, queries in [('200 short, new goals', short),
+                          ('5 long, same goal', far)]:
+        for heuristic in ('a_star', 'indices', 'vector', 'cached vector'):
+            rows.append((name, heuristic, best(searches(queries, heuristic))))
+    return rows
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--nodes', type=int, default=250_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    args = parser.parse_args(argv)
+    for name, heuristic, seconds in run(args.nodes, args.seed, args.repeat):
+        print(f'{name:>22}: {heuristic:>14} {seconds:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
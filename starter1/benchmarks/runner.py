@@ -0,0 +1,280 @@
+"""Times the starter algorithms on synthetic graphs.
+
+For every generator and size, the runner writes a graph file, loads it with
+`graph_utils.Graph`, and then measures each algorithm from node `0`:
+
+- `load`: reading the graph file
+- `a_star`: from node `0` to the last node
+- `bfs`: `breadth_first_search`
+- `dfs`: `dfs_non_recursive`
+- `detect_cycle`: the recursive cycle check
+
+Each measurement records the best time over several repeats, the throughput
+in graph nodes per second, and the peak memory allocated during one run
+(measured separately with `tracemalloc`, which slows code down). Algorithms
+that raise, like `detect_cycle` hitting the recursion limit on long chains, are
+recorded with their error instead of stopping the run.
+
+Run from the `starter1` folder:
+
+```
+python -m benchmarks.runner --sizes 100 1000 10000 --output results.json
+python -m benchmarks.runner --baseline results.json --tolerance 0.25
+```
+
+With `--baseline`, the results are compared with an earlier results file, and
+the exit status is 1 if any measurement got slower or used more memory than
+the tolerance allows.
+"""
+
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import os
+import platform
+import tempfile
+import time
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from a_star import a_star
+from bfs import breadth_first_search
+from dfs import dfs_non_recursive
+from dfs_cycle_detect import detect_cycle
+from graph_utils import Graph
+
+from .generators import GENERATORS, generate_graph_file
+
+SIZES = (10**2, 10**3, 10**4, 10**5, 10**6)
+ALGORITHMS = ('load', 'a_star', 'bfs', 'dfs', 'detect_cycle')
+# Generators whose graphs are loaded as directed graphs
+DIRECTED = {'chain', 'dag'}
+
+REPEAT = 3
+# Relative slowdown (or memory increase) tolerated by `compare`
+TOLERANCE = 0.2
+# Timings this short are too noisy to compare
+MIN_SECONDS = 1e-3
+
+
+@dataclass
+class Measurement:
+    generator: str
+    num_nodes: int
+    num_edges: int
+    algorithm: str
+    # 'ok' or 'error'
+    status: str
+    seconds: Optional[float] = None
+    nodes_per_second: Optional[float] = None
+    peak_bytes: Optional[int] = None
+    # Size of what the algorithm returned (path length, nodes visited...)
+    output_size: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[str, int, str]:
+        return self.generator, self.num_nodes, self.algorithm
+
+
+@dataclass
+class Regression:
+    measurement: Measurement
+    baseline: Measurement
+    # 'seconds', 'peak_bytes', or 'status' for a measurement that failed
+    # where the baseline succeeded (then `ratio` is infinite)
+    metric: str
+    ratio: float
+
+    def __str__(self) -> str:
+        generator, num_nodes, algorithm = self.measurement.key
+        return (f'{algorithm} on {generator} ({num_nodes} nodes): '
+                f'{self.metric} x{self.ratio:.2f}')
+
+
+def _output_size(output) -> Optional[int]:
+    if output is None:
+        return None
+    if isinstance(output, bool):
+        return int(output)
+    return len(output)
+
+
+def measure(function: Callable[[], object],
+            repeat: int = REPEAT) -> Tuple[float, int, object]:
+    """Returns the best time of `function` over `repeat` rounds, its peak
+    memory use in bytes and what it returned. Fast functions are run several
+    times per round."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(repeat, number)) / number
+
+    tracemalloc.start()
+    try:
+        output = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak, output
+
+
+def _algorithms(graph_file: str, directed: bool,
+                num_nodes: int) -> Dict[str, Callable[[], object]]:
+    graph = Graph(graph_file, undirected=not directed)
+    source = graph.nodes['0']
+    goal = graph.nodes[str(num_nodes - 1)]
+    return {
+        'a_star': lambda: a_star(source, goal, graph.calc_distance),
+        'bfs': lambda: breadth_first_search(source),
+        'dfs': lambda: dfs_non_recursive(source),
+        'detect_cycle': lambda: detect_cycle(source),
+    }
+
+
+def run(generators: Sequence[str] = tuple(GENERATORS),
+        sizes: Sequence[int] = SIZES,
+        algorithms: Sequence[str] = ALGORITHMS,
+        seed: int = 0,
+        repeat: int = REPEAT,
+        graph_dir: Optional[str] = None,
+        log: Callable[[str], None] = print) -> List[Measurement]:
+    """Measures every algorithm on every generator and size. Graph files are
+    written to `graph_dir` (a temporary folder by default) and reused if they
+    already exist there."""
+    measurements: List[Measurement] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        graph_dir = graph_dir or temp_dir
+        os.makedirs(graph_dir, exist_ok=True)
+        for generator in generators:
+            for num_nodes in sizes:
+                graph_file = os.path.join(
+                    graph_dir, f'{generator}-{num_nodes}-{seed}.txt')
+                graph = None
+                if not os.path.exists(graph_file):
+                    graph = generate_graph_file(generator, num_nodes,
+                                                graph_file, seed)
+                if graph is not None:
+                    num_edges = graph.num_edges
+                else:
+                    with open(graph_file) as f:
+                        num_edges = sum(len(line.split()) - 1 for line in f)
+                directed = generator in DIRECTED
+
+                functions: Dict[str, Callable[[], object]] = {
+                    'load': lambda: Graph(graph_file, undirected=not directed)
+                }
+                functions.update(_algorithms(graph_file, directed, num_nodes))
+
+                for algorithm in algorithms:
+                    measurement = Measurement(generator, num_nodes, num_edges,
+                                              algorithm, 'ok')
+                    try:
+                        seconds, peak, output = measure(functions[algorithm],
+                                                        repeat)
+                    except (RecursionError, MemoryError) as e:
+                        measurement.status = 'error'
+                        measurement.error = f'{type(e).__name__}: {e}'
+                    else:
+                        measurement.seconds = seconds
+                        measurement.nodes_per_second = num_nodes / seconds
+                        measurement.peak_bytes = peak
+                        if algorithm != 'load':
+                            measurement.output_size = _output_size(output)
+                    measurements.append(measurement)
+                    log(format_measurement(measurement))
+    return measurements
+
+
+def format_measurement(m: Measurement) -> str:
+    prefix = f'{m.generator:>16} {m.num_nodes:>8} {m.algorithm:>12}'
+    if m.status != 'ok':
+        return f'{prefix}  {m.error}'
+    return (f'{prefix} {m.seconds * 1000:>10.3f}ms '
+            f'{m.nodes_per_second:>12.0f} nodes/s '
+            f'{m.peak_bytes / 2**20:>9.2f}MiB')
+
+
+def save_results(filename: str, measurements: List[Measurement]):
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'measurements': [asdict(m) for m in measurements],
+    }
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(filename: str) -> List[Measurement]:
+    with open(filename) as f:
+        return [Measurement(**m) for m in json.load(f)['measurements']]
+
+
+def compare(measurements: List[Measurement],
+            baseline: List[Measurement],
+            tolerance: float = TOLERANCE,
+            min_seconds: float = MIN_SECONDS) -> List[Regression]:
+    """Returns the measurements that are more than `tolerance` (relative)
+    slower, or use more memory, than the matching baseline measurement.
+    Measurements without a successful baseline are ignored, and so are time
+    differences when both times are under `min_seconds`. A measurement that
+    fails where the baseline succeeded counts as a regression."""
+    by_key = {m.key: m for m in baseline if m.status == 'ok'}
+    regressions = []
+    for m in measurements:
+        base = by_key.get(m.key)
+        if base is None:
+            continue
+        if m.status != 'ok':
+            regressions.append(Regression(m, base, 'status', float('inf')))
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            new, old = getattr(m, metric), getattr(base, metric)
+            if metric == 'seconds' and max(new, old) < min_seconds:
+                continue
+            if old and new > old * (1 + tolerance):
+                regressions.append(Regression(m, base, metric, new / old))
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--generators', nargs='+', choices=list(GENERATORS),
+                        default=list(GENERATORS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES))
+    parser.add_argument('--algorithms', nargs='+', choices=ALGORITHMS,
+                        default=list(ALGORITHMS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--graph-dir',
+                        help='folder to keep generated graph files in')
+    parser.add_argument('--output', help='JSON file to write results to')
+    parser.add_argument('--baseline', help='JSON results file to compare to')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    measurements = run(args.generators, args.sizes, args.algorithms,
+                       args.seed, args.repeat, args.graph_dir)
+    if args.output:
+        save_results(args.output, measurements)
+
+    if args.baseline:
+        regressions = compare(measurements, load_results(args.baseline),
+                              args.tolerance)
+        for regression in regressions:
+            print('regression:', regression)
+        if regressions:
+            return 1
+        print('no regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -18,15 +18,26 @@ Challenge problems:
 
 from collections import defaultdict
 from queue import SimpleQueue
-from typing import List
+import time
+from typing import List, Optional
 
 import sys
 sys.path.append('.')
 
 from graph_utils import Node, Graph
+from instrumentation import Instrumentation
+
+def breadth_first_search(src: Node,
+                         instrument: Optional[Instrumentation] = None
+                         ) -> List[Node]:
+    """Visits the vertices of `graph` in a breadth first order.
+
+    `instrument` optionally counts the work done, see `instrumentation.py`.
+    """
+    if instrument is not None:
+        instrument.searches += 1
+        start_time = time.perf_counter()
 
-def breadth_first_search(src: Node) -> List[Node]:
-    "Visits the vertices of `graph` in a breadth first order."
     # We keep track of which nodes we have already visited
     visited = defaultdict(bool)
 
@@ -51,6 +62,8 @@ def breadth_first_search(src: Node) -> List[Node]:
     # We add the starting node to the front of the line, and remember that we
     # have visited it
     q.put(src)
+    if instrument is not None:
+        instrument.pushes += 1
     visited[src] = True
     path.append(src)
 
@@ -58,6 +71,9 @@ def breadth_first_search(src: Node) -> List[Node]:
     while not q.empty():
         # We remove the node that was at the front of the line
         node = q.get()
+        if instrument is not None:
+            instrument.pops += 1
+            instrument.expand(node, len(node.neighbors))
 
         if len(node.neighbors) > 0:
             # We visit all of this node's adjacent nodes, as long as they have
@@ -67,17 +83,23 @@ def breadth_first_search(src: Node) -> List[Node]:
                     # We add this adjacent node to the back of the line so that
                     # we can remember to visit it on another iteration
                     q.put(adj_node)
+                    if instrument is not None:
+                        instrument.pushes += 1
                     visited[adj_node] = True
                     path.append(adj_node)
 
+    if instrument is not None:
+        instrument.phase_seconds['search'] += time.perf_counter() - start_time
     return path
 
-graph = Graph('week-1/bfs-graph.txt', undirected=False)
-nodes = graph.nodes
 
-path = breadth_first_search(nodes['0'])
-# For this one try swapping the graph between directed and undirected
-# path = breadth_first_search(nodes['3'])
+if __name__ == '__main__':
+    graph = Graph('week-1/bfs-graph.txt', undirected=False)
+    nodes = graph.nodes
+
+    path = breadth_first_search(nodes['0'])
+    # For this one try swapping the graph between directed and undirected
+    # path = breadth_first_search(nodes['3'])
 
-graph.draw_graph()
-graph.draw_path(path, draw_lines=False)
+    graph.draw_graph()
+    graph.draw_path(path, draw_lines=False)
@@ -1,4 +1,3 @@
-import turtle
 from collections import defaultdict
 from queue import SimpleQueue
 from graph_utils import Graph, Node
@@ -39,15 +38,16 @@ def bfs_target(source: Node, target: Node):
     return False
 
 
+if __name__ == "__main__":
+    import turtle
 
-graph = Graph('graph2.txt', undirected = False)
-nodes = graph.nodes
+    graph = Graph('graph2.txt', undirected = False)
+    nodes = graph.nodes
 
-path = bfs(nodes['1'])
-# target = bfs_target(nodes['0'], nodes['6'])
+    path = bfs(nodes['1'])
+    # target = bfs_target(nodes['0'], nodes['6'])
 
-
-# print(target)
-graph.draw_graph()
-graph.draw_path(path, draw_lines=False)
-turtle.done()
\ No newline at end of file
+    # print(target)
+    graph.draw_graph()
+    graph.draw_path(path, draw_lines=False)
+    turtle.done()
@@ -0,0 +1,190 @@
+"""Bidirectional search for point to point route queries.
+
+Unidirectional A* grows a ball of expanded nodes around `start` until it
+reaches `goal`. Bidirectional search grows two smaller balls, one forward from
+`start` and one backward from `goal`, and stops once they meet and no shorter
+path through the unexplored part of the graph is possible.
+
+Without a heuristic this is bidirectional Dijkstra. With a heuristic we use
+the "average" potentials of Ikeda et al.:
+
+```
+p_f(v) = (h(v, goal) - h(start, v)) / 2      p_r(v) = -p_f(v)
+```
+
+Both searches then run on the same graph of non-negative reduced edge weights,
+as long as `h` is consistent, which the straight line distance
+`Graph.calc_distance` is for our graphs. That lets us use the standard stopping
+rule: stop once the smallest keys of the two open sets add up to at least the
+best path found so far.
+
+For directed graphs the backward search needs the incoming edges of every
+node, see `build_predecessors`.
+
+References:
+- https://en.wikipedia.org/wiki/Bidirectional_search
+- Goldberg & Harrelson, "Computing the Shortest Path: A* Search Meets Graph
+  Theory" (2005), section 5
+"""
+
+from collections import defaultdict
+from heapq import heappop, heappush
+from itertools import count
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import sys
+sys.path.append('.')
+
+from a_star import (GeneralNode, Heuristic, SearchResult, SearchStats,
+                    reconstruct_path)
+from graph_utils import Graph
+
+WeightedEdges = Iterable[Tuple[GeneralNode, float]]
+Predecessors = Dict[GeneralNode, List[Tuple[GeneralNode, float]]]
+
+
+def build_predecessors(graph: Graph) -> Predecessors:
+    """Returns the reverse adjacency of `graph`: for node v, the list of
+    `(u, weight)` for every edge from u to v."""
+    predecessors: Predecessors = defaultdict(list)
+    for node in graph.nodes.values():
+        for neighbor, weight in node.get_weighted_neighbors():
+            predecessors[neighbor].append((node, weight))
+    return predecessors
+
+
+def bidirectional_search(
+        start: GeneralNode,
+        goal: GeneralNode,
+        h: Optional[Heuristic[GeneralNode]] = None,
+        predecessors: Optional[Predecessors] = None
+) -> SearchResult[GeneralNode]:
+    """Finds a shortest path from `start` to `goal` by searching from both
+    ends at once.
+
+    `h(n, m)` estimates the cost of the cheapest path between `n` and `m` and
+    must be symmetric and consistent. When it is `None` this is bidirectional
+    Dijkstra.
+
+    `predecessors` is the reverse adjacency of the graph, see
+    `build_predecessors`. Leave it as `None` for undirected graphs, where the
+    incoming edges of a node are its outgoing edges.
+    """
+    stats = SearchStats()
+    if start == goal:
+        return SearchResult([start], 0, stats)
+
+    if h is None:
+        def potential(_: GeneralNode) -> float:
+            return 0
+    else:
+        def potential(node: GeneralNode) -> float:
+            return (h(node, goal) - h(start, node)) / 2
+
+    if predecessors is None:
+        def incoming(node: GeneralNode) -> WeightedEdges:
+            return node.get_weighted_neighbors()
+    else:
+        def incoming(node: GeneralNode) -> WeightedEdges:
+            return predecessors.get(node, ())
+
+    def outgoing(node: GeneralNode) -> WeightedEdges:
+        return node.get_weighted_neighbors()
+
+    tie_breaker = count()
+
+    # Everything is kept per direction: index 0 searches forward from `start`
+    # with key g + p_f, index 1 searches backward from `goal` with key g - p_f.
+    sign = (1, -1)
+    edges: Tuple[Callable[[GeneralNode], WeightedEdges], ...] = (outgoing,
+                                                                  incoming)
+    g_score: Tuple[Dict[GeneralNode, float], ...] = ({start: 0}, {goal: 0})
+    came_from: Tuple[Dict[GeneralNode, GeneralNode], ...] = ({}, {})
+    closed: Tuple[Set[GeneralNode], ...] = (set(), set())
+    open_sets: Tuple[List[Tuple[float, int, float, GeneralNode]], ...] = (
+        [(potential(start), next(tie_breaker), 0, start)],
+        [(-potential(goal), next(tie_breaker), 0, goal)],
+    )
+    stats.pushes += 2
+
+    # The cheapest path found so far costs `best_cost` and goes from `start`
+    # to u in the forward search, over the edge `meeting_edge = (u, v)`, and
+    # from v to `goal` in the backward search
+    best_cost = float('inf')
+    meeting_edge: Optional[Tuple[GeneralNode, GeneralNode]] = None
+
+    while open_sets[0] and open_sets[1]:
+        if open_sets[0][0][0] + open_sets[1][0][0] >= best_cost:
+            break
+
+        # Expand the direction whose smallest key is smaller, which keeps the
+        # two searches roughly balanced
+        side = 0 if open_sets[0][0][0] <= open_sets[1][0][0] else 1
+        _, _, g, current = heappop(open_sets[side])
+        if current in closed[side]:
+            stats.stale_pops += 1
+            continue
+        closed[side].add(current)
+        stats.expanded += 1
+
+        scores, other_scores = g_score[side], g_score[1 - side]
+        for neighbor, weight in edges[side](current):
+            tentative_g_score = g + weight
+
+            # If the other search has reached this node too, we have found a
+            # path from start to goal over this edge
+            other_g_score = other_scores.get(neighbor)
+            if other_g_score is not None and \
+                    tentative_g_score + other_g_score < best_cost:
+                best_cost = tentative_g_score + other_g_score
+                meeting_edge = ((current, neighbor) if side == 0 else
+                                (neighbor, current))
+
+            if neighbor in closed[side]:
+                continue
+            if tentative_g_score < scores.get(neighbor, float('inf')):
+                scores[neighbor] = tentative_g_score
+                came_from[side][neighbor] = current
+                key = tentative_g_score + sign[side] * potential(neighbor)
+                heappush(open_sets[side],
+                         (key, next(tie_breaker), tentative_g_score, neighbor))
+                stats.pushes += 1
+
+    if meeting_edge is None:
+        return SearchResult(None, float('inf'), stats)
+
+    forward_end, current = meeting_edge
+    path = reconstruct_path(came_from[0], forward_end)
+    path.append(current)
+    while current in came_from[1]:
+        current = came_from[1][current]
+        path.append(current)
+    return SearchResult(path, best_cost, stats)
+
+
+def bidirectional_route(graph: Graph,
+                        start: GeneralNode,
+                        goal: GeneralNode,
+                        use_heuristic: bool = True
+                        ) -> SearchResult[GeneralNode]:
+    """Convenience wrapper that picks the right options for `graph`: the
+    straight line distance as heuristic, and the reverse adjacency if the
+    graph is directed."""
+    h = graph.calc_distance if use_heuristic else None
+    predecessors = None if graph.undirected else build_predecessors(graph)
+    return bidirectional_search(start, goal, h, predecessors)
+
+
+if __name__ == '__main__':
+    from a_star import a_star_search
+
+    graph = Graph('graph2.txt', undirected=True)
+    nodes = graph.nodes
+
+    unidirectional = a_star_search(nodes['1'], nodes['10'],
+                                   graph.calc_distance)
+    bidirectional = bidirectional_route(graph, nodes['1'], nodes['10'])
+    for name, result in [('a_star', unidirectional),
+                         ('bidirectional', bidirectional)]:
+        print(f'{name}: {[n.node_id for n in result.path]} '
+              f'cost {result.cost:.1f}, {result.stats}')
@@ -0,0 +1,287 @@
+"""A compact, array-backed representation of the graphs in `graph_utils`.
+
+`graph_utils.Graph` stores every edge twice as Python tuples inside the sets of
+a `LocationNode`. That is convenient for small examples but very expensive for
+graphs with millions of edges. `CSRGraph` stores the same graph in compressed
+sparse row (CSR) layout:
+
+- node `i` has id `node_ids[i]` and position `positions[i]`
+- the outgoing edges of node `i` are `targets[offsets[i]:offsets[i + 1]]`, with
+  the matching weights in `weights[offsets[i]:offsets[i + 1]]`
+
+`CSRGraphAdapter` wraps a `CSRGraph` so that the existing `Node` based
+algorithms (`a_star`, `bfs`, `dfs_non_recursive`, ...) can run on it unchanged.
+
+References:
+- https://en.wikipedia.org/wiki/Sparse_matrix#Compressed_sparse_row_(CSR,_CRS_or_Yale_format)
+"""
+
+from dataclasses import dataclass, field
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.append('.')
+
+from graph_io import read_graph_arrays
+from graph_utils import Graph, NodeId
+
+
+@dataclass(frozen=True)
+class CSRGraph:
+    """A directed graph in CSR layout. Undirected graphs store both directions
+    of every edge, exactly like `Graph` does."""
+    node_ids: List[NodeId]
+    positions: np.ndarray
+    offsets: np.ndarray
+    targets: np.ndarray
+    weights: np.ndarray
+    undirected: bool = True
+    index: Dict[NodeId, int] = field(default_factory=dict, repr=False,
+                                     compare=False)
+
+    def __post_init__(self):
+        # An empty index is only filled in for graphs with nodes: the index
+        # of an empty graph is empty too, and may be read-only, like
+        # `graph_snapshot.SnapshotNodeIndex`
+        if not self.index and len(self.node_ids):
+            self.index.update(
+                (node_id, i) for i, node_id in enumerate(self.node_ids))
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    def neighbors(self, i: int) -> np.ndarray:
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def weighted_neighbors(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.targets[start:end], self.weights[start:end]
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def reversed(self) -> 'CSRGraph':
+        """Returns the graph with every edge reversed, i.e. the incoming edges
+        of each node in CSR layout. Undirected graphs are their own reverse."""
+        if self.undirected:
+            return self
+        sources = np.repeat(np.arange(self.num_nodes), self.out_degree())
+        order = np.argsort(self.targets, kind='stable')
+        offsets = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.targets, minlength=self.num_nodes),
+                  out=offsets[1:])
+        return CSRGraph(node_ids=self.node_ids,
+                        positions=self.positions,
+                        offsets=offsets,
+                        targets=sources[order].astype(self.targets.dtype),
+                        weights=self.weights[order],
+                        undirected=False,
+                        index=self.index)
+
+    def nbytes(self) -> int:
+        """Bytes used by the array data (excluding the id lookup table)."""
+        return (self.positions.nbytes + self.offsets.nbytes +
+                self.targets.nbytes + self.weights.nbytes)
+
+    @classmethod
+    def from_edges(cls,
+                   node_ids: List[NodeId],
+                   positions: np.ndarray,
+                   sources: np.ndarray,
+                   targets: np.ndarray,
+                   undirected: bool = True) -> 'CSRGraph':
+        """Builds a CSR graph from parallel arrays of edge endpoints (given as
+        node indices). Edge weights are the distance between the endpoints."""
+        num_nodes = len(node_ids)
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        if undirected:
+            sources, targets = (np.concatenate([sources, targets]),
+                                np.concatenate([targets, sources]))
+
+        # `Graph` stores neighbors in a set, so repeated edges collapse into
+        # one. Sorting by (source, target) also groups edges by source node.
+        keys = np.unique(sources * num_nodes + targets)
+        sources = keys // max(num_nodes, 1)
+        targets = keys % max(num_nodes, 1)
+
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+
+        delta = (positions[sources] - positions[targets]).astype(np.float64)
+        weights = np.sqrt(np.einsum('ij,ij->i', delta, delta))
+
+        index_type = np.int32 if num_nodes < 2**31 else np.int64
+        return cls(node_ids=list(node_ids),
+                   positions=positions,
+                   offsets=offsets,
+                   targets=targets.astype(index_type),
+                   weights=weights,
+                   undirected=undirected)
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> 'CSRGraph':
+        """Converts an already loaded `Graph` into CSR layout."""
+        node_ids = list(graph.nodes.keys())
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        positions = np.array([node.position for node in graph.nodes.values()],
+                             dtype=np.int64).reshape(-1, 2)
+        sources: List[int] = []
+        targets: List[int] = []
+        for node_id, node in graph.nodes.items():
+            for neighbor in node.neighbors:
+                sources.append(index[node_id])
+                targets.append(index[neighbor.node_id])
+        # The neighbor sets already contain both directions of undirected
+        # edges, so we build a directed CSR graph and only keep the flag.
+        csr = cls.from_edges(node_ids, positions, np.array(sources),
+                             np.array(targets), undirected=False)
+        return cls(node_ids=csr.node_ids,
+                   positions=csr.positions,
+                   offsets=csr.offsets,
+                   targets=csr.targets,
+                   weights=csr.weights,
+                   undirected=graph.undirected,
+                   index=index)
+
+    @classmethod
+    def from_file(cls, graph_file: str, undirected: bool = True) -> 'CSRGraph':
+        """Reads a graph file (same format as `Graph`) into CSR layout.
+
+        The file is streamed, see `graph_io.read_graph_arrays`. Use
+        `graph_snapshot.load_csr_graph` to cache the result on disk.
+        """
+        arrays = read_graph_arrays(graph_file)
+        return cls.from_edges(arrays.node_ids,
+                              np.frombuffer(arrays.positions, dtype=np.int64),
+                              np.frombuffer(arrays.sources, dtype=np.int64),
+                              np.frombuffer(arrays.targets, dtype=np.int64),
+                              undirected=undirected)
+
+
+class CSRNode:
+    """A lightweight stand-in for `LocationNode` backed by a `CSRGraph`.
+
+    Views are created once per node by `CSRGraphAdapter`, so they can be
+    compared by identity, hashed and used as dictionary keys by the search
+    algorithms.
+    """
+    __slots__ = ('_graph', 'index')
+
+    def __init__(self, graph: 'CSRGraphAdapter', index: int):
+        self._graph = graph
+        self.index = index
+
+    @property
+    def node_id(self) -> NodeId:
+        return self._graph.csr.node_ids[self.index]
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        x, y = self._graph.csr.positions[self.index]
+        return int(x), int(y)
+
+    @property
+    def neighbors(self) -> List['CSRNode']:
+        views = self._graph.views
+        targets = self._graph.csr.neighbors(self.index)
+        return [views[i] for i in targets.tolist()]
+
+    @property
+    def weighted_neighbors(self) -> List[Tuple['CSRNode', float]]:
+        return self.get_weighted_neighbors()
+
+    def get_weighted_neighbors(self) -> List[Tuple['CSRNode', float]]:
+        views = self._graph.views
+        targets, weights = self._graph.csr.weighted_neighbors(self.index)
+        return [(views[i], w) for i, w in zip(targets.tolist(),
+                                              weights.tolist())]
+
+    def __lt__(self, other: 'CSRNode') -> bool:
+        return self.node_id < other.node_id
+
+    def __repr__(self) -> str:
+        return f'CSRNode(node_id={self.node_id!r})'
+
+
+class CSRGraphAdapter:
+    """Exposes a `CSRGraph` through the same interface as `Graph`, so code
+    written against `graph.nodes[...]` and `Node` objects keeps working."""
+
+    nodes: Dict[NodeId, CSRNode]
+
+    def __init__(self, csr: CSRGraph):
+        self.csr = csr
+        self.undirected = csr.undirected
+        self.views = [CSRNode(self, i) for i in range(csr.num_nodes)]
+        self.nodes = dict(zip(csr.node_ids, self.views))
+
+    def calc_distance(self, n1: CSRNode, n2: CSRNode) -> float:
+        delta = self.csr.positions[n1.index] - self.csr.positions[n2.index]
+        return float(np.sqrt(delta @ delta))
+
+
+def _deep_sizeof(obj, seen: Optional[set] = None) -> int:
+    """Approximates the memory used by `obj` and everything it references."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) + (0 if obj.base is None else obj.nbytes)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen)
+                    for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += _deep_sizeof(vars(obj), seen)
+    return size
+
+
+def memory_report(graph: Graph, csr: CSRGraph) -> Dict[str, int]:
+    """Compares the approximate memory footprint (in bytes) of the object
+    layout of `graph` with the array layout of `csr`."""
+    object_bytes = _deep_sizeof(graph.nodes)
+    array_bytes = csr.nbytes()
+    index_bytes = _deep_sizeof(csr.node_ids) + _deep_sizeof(csr.index)
+    return {
+        'nodes': csr.num_nodes,
+        'edges': csr.num_edges,
+        'object_layout_bytes': object_bytes,
+        'csr_array_bytes': array_bytes,
+        'csr_index_bytes': index_bytes,
+        'csr_total_bytes': array_bytes + index_bytes,
+    }
+
+
+def format_memory_report(report: Dict[str, int]) -> str:
+    ratio = report['object_layout_bytes'] / max(report['csr_total_bytes'], 1)
+    return '\n'.join([
+        f"{report['nodes']} nodes, {report['edges']} directed edges",
+        f"object layout: {report['object_layout_bytes']:>12,} bytes",
+        f"CSR arrays:    {report['csr_array_bytes']:>12,} bytes",
+        f"CSR id index:  {report['csr_index_bytes']:>12,} bytes",
+        f"CSR total:     {report['csr_total_bytes']:>12,} bytes "
+        f"({ratio:.1f}x smaller)",
+    ])
+
+
+if __name__ == '__main__':
+    graph_file = sys.argv[1] if len(sys.argv) > 1 else 'graph2.txt'
+    csr = CSRGraph.from_file(graph_file, undirected=True)
+    graph = Graph(graph_file, undirected=True)
+    print(format_memory_report(memory_report(graph, csr)))
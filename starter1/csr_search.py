@@ -0,0 +1,140 @@
+"""Shortest path searches that work directly on the arrays of a `CSRGraph`.
+
+These use integer node indices instead of `Node` objects, which avoids the
+per-node Python objects of `CSRGraphAdapter` when running many searches.
+"""
+
+from heapq import heappop, heappush
+from itertools import count
+from math import inf, sqrt
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from a_star import SearchResult, SearchStats, reconstruct_path
+from csr_graph import CSRGraph
+
+
+def _as_memoryview(array: np.ndarray) -> memoryview:
+    return memoryview(np.ascontiguousarray(array))
+
+
+def dijkstra_distances(csr: CSRGraph,
+                       sources: Union[int, Iterable[int]]) -> np.ndarray:
+    """Returns the length of the shortest path from the closest of `sources`
+    to every node, or `inf` for nodes that can't be reached."""
+    if isinstance(sources, (int, np.integer)):
+        sources = [sources]
+
+    # Plain lists are considerably faster than NumPy arrays for the element by
+    # element access of the main loop
+    offsets = csr.offsets.tolist()
+    targets = csr.targets.tolist()
+    weights = csr.weights.tolist()
+
+    dist = [inf] * csr.num_nodes
+    open_set = []
+    for source in sources:
+        dist[source] = 0.0
+        open_set.append((0.0, int(source)))
+
+    while open_set:
+        d, current = heappop(open_set)
+        if d > dist[current]:
+            # A stale entry, we already found a shorter path to `current`
+            continue
+        for k in range(offsets[current], offsets[current + 1]):
+            neighbor = targets[k]
+            tentative = d + weights[k]
+            if tentative < dist[neighbor]:
+                dist[neighbor] = tentative
+                heappush(open_set, (tentative, neighbor))
+
+    return np.array(dist)
+
+
+def goal_distances(csr: CSRGraph, goal: int) -> np.ndarray:
+    """The straight line distance from every node to `goal`, computed in one
+    NumPy pass. Can be passed to `a_star_indices` as `heuristic`."""
+    delta = csr.positions - csr.positions[goal]
+    return np.sqrt((delta.astype(np.float64)**2).sum(axis=1))
+
+
+def a_star_indices(csr: CSRGraph, start: int, goal: int,
+                   use_heuristic: bool = True,
+                   heuristic: Optional[Sequence[float]] = None
+                   ) -> SearchResult[int]:
+    """A* from node index `start` to node index `goal`, with the straight line
+    distance between node positions as heuristic (or Dijkstra, if
+    `use_heuristic` is false). The path in the result is a list of node
+    indices.
+
+    `heuristic[n]` can instead give a precomputed estimate from every node n
+    to `goal`, e.g. `goal_distances(csr, goal)` or exact distances from
+    `dijkstra_distances` on the reversed graph. A lookup is cheaper than
+    computing the straight line distance, but `goal_distances` costs O(N),
+    so it only pays off for long searches or when the vector is reused, like
+    `Graph.goal_distances` does (see `benchmarks/heuristics.py`).
+
+    This is the same algorithm as `a_star.a_star_search`: a binary heap with
+    a tie breaking counter, a closed set and lazily skipped stale entries.
+    """
+    stats = SearchStats()
+    # Indexing a memoryview returns plain Python numbers, which is much
+    # faster than indexing the NumPy arrays directly and doesn't copy them
+    offsets = _as_memoryview(csr.offsets)
+    targets = _as_memoryview(csr.targets)
+    weights = _as_memoryview(csr.weights)
+
+    if isinstance(heuristic, np.ndarray):
+        h = _as_memoryview(heuristic.astype(np.float64, copy=False)
+                           ).__getitem__
+    elif heuristic is not None:
+        h = heuristic.__getitem__
+    elif use_heuristic:
+        positions = _as_memoryview(csr.positions.reshape(-1))
+        goal_x, goal_y = positions[2 * goal], positions[2 * goal + 1]
+
+        def h(node: int) -> float:
+            return sqrt((positions[2 * node] - goal_x)**2 +
+                        (positions[2 * node + 1] - goal_y)**2)
+    else:
+        def h(node: int) -> float:
+            return 0.0
+
+    tie_breaker = count()
+    open_set: List[Tuple[float, int, float, int]] = [
+        (h(start), next(tie_breaker), 0.0, start)]
+    stats.pushes += 1
+    came_from: Dict[int, int] = {}
+    g_score: Dict[int, float] = {start: 0.0}
+    closed: Set[int] = set()
+
+    while open_set:
+        _, _, g, current = heappop(open_set)
+        if current in closed:
+            stats.stale_pops += 1
+            continue
+        if current == goal:
+            return SearchResult(reconstruct_path(came_from, current), g, stats)
+        closed.add(current)
+        stats.expanded += 1
+
+        start_edge, end_edge = offsets[current], offsets[current + 1]
+        for neighbor, weight in zip(targets[start_edge:end_edge],
+                                    weights[start_edge:end_edge]):
+            if neighbor in closed:
+                continue
+            tentative_g_score = g + weight
+            if tentative_g_score < g_score.get(neighbor, inf):
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g_score
+                heappush(open_set,
+                         (tentative_g_score + h(neighbor), next(tie_breaker),
+                          tentative_g_score, neighbor))
+                stats.pushes += 1
+
+    return SearchResult(None, inf, stats)
@@ -16,90 +16,107 @@ Challenge problems:
    found, and `False` if not.
 """
 
-from typing import List
+from typing import List, Optional, Set
 
 import sys
 sys.path.append('.')
 
+from dfs_engine import POSTORDER, PREORDER, iter_dfs
 from graph_utils import Node, Graph
+from instrumentation import Instrumentation
+
+
+def _dfs_path(source: Node,
+              path: List[Node],
+              instrument: Optional[Instrumentation],
+              visited: Set[Node]) -> List[Node]:
+    """Appends the nodes a DFS from `source` visits, and hasn't visited
+    before, to `path`."""
+    if source in visited:
+        return path
+    if instrument is None:
+        path.extend(node for _, node in iter_dfs(source, visited=visited))
+        return path
+
+    instrument.searches += 1
+    with instrument.phase('search'):
+        # `iter_dfs` keeps one stack entry per node on the current path: a
+        # node is pushed when it is visited and popped when we backtrack
+        for event, node in iter_dfs(source, events=(PREORDER, POSTORDER),
+                                    visited=visited):
+            if event is PREORDER:
+                path.append(node)
+                instrument.pushes += 1
+                instrument.expand(node, len(node.neighbors))
+            else:
+                instrument.pops += 1
+    return path
 
 
-def dfs_non_recursive(source: Node) -> List[Node]:
-    """Returns a string representation of the path a DFS would take on `graph`
-    starting from `source`."""
+def dfs_non_recursive(source: Node,
+                      instrument: Optional[Instrumentation] = None
+                      ) -> List[Node]:
+    """Returns a list of the nodes in the path a DFS would take on `graph`
+    starting from `source`.
+
+    The search itself is `dfs_engine.iter_dfs`, which uses a list as a stack
+    to remember which nodes to visit:
 
-    # Stores the traversal path we take through the graph
-    path: List[Node] = []
-    """
-    We will treat this list like a stack, and use it to store the nodes we need
-    to visit.
-    
     A stack is a First-in Last-out (FILO) data structure. You can add items to
     it and remove items from it. The first item to get added is the last item to
     be removed. You can think of it like a stack of plates, if you stack 3
     plates on top of each other, the first one to be removed from that stack
     will be the last plate you added.
-    
+
     The stack data structure is useful for DFS because we want to traverse down
     an entire path of nodes, and only after we can go no further do we want to
     come back up.
-    """
-    stack = [source]
-    # We loop until there are no more nodes to visit
-    while len(stack) != 0:
-        # We remove the node which was most recently added
-        s = stack.pop()
-        # We explore its siblings only if we have not already seen it before
-        if s not in path:
-            path.append(s)
-
-            # This could be a leaf node, meaning it has no siblings and is not a
-            # key in our graph dictionary
-            if len(s.neighbors) == 0:
-                #leaf node
-                continue
-
-            # We remember each of the siblings of this node, and add them to the
-            # stack so that, on future iterations, they are explored before
-            # anything else
-            for neighbor in s.neighbors:
-                stack.append(neighbor)
 
-    return path
-
-graph = Graph('week-1/dfs-graph.txt', undirected=False)
-nodes = graph.nodes
-
-DFS_path = dfs_non_recursive(nodes['A'])
+    `instrument` optionally counts the work done, see `instrumentation.py`.
+    """
+    return _dfs_path(source, [], instrument, set())
 
 
-def dfs_recursive(source: Node, path=[]) -> List[Node]:
+def dfs_recursive(source: Node,
+                  path: Optional[List[Node]] = None,
+                  instrument: Optional[Instrumentation] = None,
+                  visited: Optional[Set[Node]] = None) -> List[Node]:
     """Returns a list of the nodes in the path a DFS would take on `graph`
-    starting from `source`.
-
-    This implementation is recursive and is almost exactly the same as the
-    previous implementation, except instead of manually creating a stack to
-    remember which nodes to visit and in what order, we make use of the function
-    call stack.
+    starting from `source`, in the order a recursive DFS visits them:
+
+    ```
+    def visit(node):
+        if node not in visited:
+            visited.add(node)
+            path.append(node)
+            for neighbor in node.neighbors:
+                visit(neighbor)
+    ```
+
+    Written like that, the function call stack remembers which nodes to
+    visit. Python limits how deep the call stack can get though, so that
+    fails on graphs with very long paths. This returns the same path with
+    `dfs_engine.iter_dfs`, which keeps its own stack, and is the same as
+    `dfs_non_recursive`.
+
+    Nodes already in `path` or `visited` are skipped, so a search can carry
+    on where another one left off. `instrument` optionally counts the work
+    done.
     """
-    # One base case occurs when we have reached a node that we have already
-    # visited
-    if source not in path:
-        path.append(source)
-
-        # Another base case occurs if this node does not have any siblings
-        if len(source.neighbors) == 0:
-            # leaf node, backtrack
-            return path
+    if path is None:
+        path = []
+    if visited is None:
+        visited = set(path)
+    return _dfs_path(source, path, instrument, visited)
 
-        # For each of the siblings of this node, we repeat the entire process
-        for neighbor in source.neighbors:
-            path = dfs_recursive(neighbor, path)
 
-    return path
+if __name__ == '__main__':
+    graph = Graph('week-1/dfs-graph.txt', undirected=False)
+    nodes = graph.nodes
 
+    DFS_path = dfs_non_recursive(nodes['A'])
 
-DFS_path = dfs_recursive(nodes['A'])
+    DFS_path = dfs_recursive(nodes['A'])
 
-graph.draw_graph()
-graph.draw_path(DFS_path, draw_lines=False)
+    graph.draw_graph()
+    graph.draw_path(DFS_path, draw_lines=False)
@@ -3,6 +3,10 @@ An example of detecting cycles in a graph using depth first search.
 
 Note: stepping through a debug session in VSCode may be helpful here.
 
+`detect_cycle` is recursive and only looks at the nodes reachable from
+`source`. For large graphs, `scc.analyze_cycles` checks the whole graph without
+recursion and also returns a cycle or a topological order.
+
 Sources:
  - https://algotree.org/algorithms/tree_graph_traversal/dfs_detecting_cycles_in_graphs/cycle_detection_in_directed_graphs/
  
@@ -13,17 +17,19 @@ Challenges:
 
 # Default dict import are only necessary for the challenge solution
 from collections import defaultdict
-import turtle
+from typing import Optional
 
 import sys
 sys.path.append('.')
 
 from graph_utils import Node, Graph
+from instrumentation import Instrumentation
 
 
 def detect_cycle(source: Node,
                  visited = None,
-                 in_path = None) -> bool:
+                 in_path = None,
+                 instrument: Optional[Instrumentation] = None) -> bool:
     """Returns whether there is a cycle in the given graph.
 
     A cycle is present in a graph when there exists path from a node which leads
@@ -36,10 +42,17 @@ def detect_cycle(source: Node,
     visited in the current traversal path in addition to the list of all the
     visited nodes. During the traversal if we visit a node that was already in
     the current path of the traversal a cycle is found.
+
+    `instrument` optionally counts the work done, see `instrumentation.py`.
     """
     # When the function is first called, we initialize our memory
     if visited is None:
         visited = defaultdict(bool)
+        if instrument is not None:
+            # Time the whole search once, rather than every recursive call
+            with instrument.phase('search'):
+                instrument.searches += 1
+                return detect_cycle(source, visited, in_path, instrument)
     if in_path is None:
         in_path = defaultdict(bool)
 
@@ -48,6 +61,8 @@ def detect_cycle(source: Node,
 
     # Remember that this node is in the current traversal path
     in_path[source] = True
+    if instrument is not None:
+        instrument.expand(source, len(source.neighbors))
 
     # Go through all of the siblings of the current node in a DFS manner
     for adj_node in source.neighbors:
@@ -58,7 +73,7 @@ def detect_cycle(source: Node,
         # Otherwise if this not a node that we have already visited, we try to
         # detect a cycle starting from it
         elif not visited[adj_node]:
-            if detect_cycle(adj_node, visited, in_path):
+            if detect_cycle(adj_node, visited, in_path, instrument):
                 return True
 
     # We are now backtracking (i.e. going back up where we came from), so we
@@ -70,14 +85,17 @@ def detect_cycle(source: Node,
     return False
 
 
-# graph1 = Graph('week-1/dfs-cycle1.txt', undirected=False)
-# nodes1 = graph1.nodes
-# graph1.draw_graph()
-# print(detect_cycle(nodes1['0']))
+if __name__ == '__main__':
+    import turtle
+
+    # graph1 = Graph('week-1/dfs-cycle1.txt', undirected=False)
+    # nodes1 = graph1.nodes
+    # graph1.draw_graph()
+    # print(detect_cycle(nodes1['0']))
 
-graph2 = Graph('week-1/dfs-cycle2.txt', undirected=False)
-nodes2 = graph2.nodes
-graph2.draw_graph()
-print(detect_cycle(nodes2['0']))
+    graph2 = Graph('week-1/dfs-cycle2.txt', undirected=False)
+    nodes2 = graph2.nodes
+    graph2.draw_graph()
+    print(detect_cycle(nodes2['0']))
 
-turtle.done()
\ No newline at end of file
+    turtle.done()
@@ -0,0 +1,121 @@
+"""An iterative depth first search engine.
+
+A recursive depth first search uses the function call stack, so it fails
+with a `RecursionError` once a path in the graph is longer than Python's
+recursion limit (1000 by default). `iter_dfs` keeps its own stack instead: one
+entry per node on the current path, holding an iterator over that node's
+neighbors. It visits the nodes in the same order as the recursive search. The
+functions in `dfs.py` and `dfs_work.py` are built on it.
+
+Nodes are yielded as they are visited rather than collected into a list, so a
+traversal can be stopped at any point and uses no memory beyond the stack and
+the set of visited nodes.
+
+Two kinds of events can be yielded:
+
+- `PREORDER`: a node is visited for the first time, before its neighbors
+- `POSTORDER`: all of a node's neighbors have been explored and we backtrack
+"""
+
+from enum import Enum
+from typing import (Iterable, Iterator, List, Optional, Set, Tuple, TypeVar)
+
+import sys
+sys.path.append('.')
+
+from graph_utils import Node
+
+GeneralNode = TypeVar('GeneralNode', bound=Node)
+
+
+class DFSEvent(Enum):
+    PREORDER = 'preorder'
+    POSTORDER = 'postorder'
+
+
+PREORDER = DFSEvent.PREORDER
+POSTORDER = DFSEvent.POSTORDER
+
+
+def iter_dfs(source: GeneralNode,
+             goal: Optional[GeneralNode] = None,
+             events: Iterable[DFSEvent] = (PREORDER,),
+             visited: Optional[Set[GeneralNode]] = None
+             ) -> Iterator[Tuple[DFSEvent, GeneralNode]]:
+    """Yields `(event, node)` pairs of a depth first search from `source`.
+
+    Only the kinds of event listed in `events` are yielded. If `goal` is
+    given, the search stops right after visiting it (its `PREORDER` event is
+    the last one).
+
+    `visited` can be passed in to share visited nodes between several
+    searches, e.g. to traverse every component of a graph.
+    """
+    events = set(events)
+    report_pre = PREORDER in events
+    report_post = POSTORDER in events
+    if visited is None:
+        visited = set()
+
+    visited.add(source)
+    if report_pre:
+        yield PREORDER, source
+    if source == goal:
+        return
+
+    stack: List[Tuple[GeneralNode, Iterator[GeneralNode]]] = [
+        (source, iter(source.neighbors))]
+    while stack:
+        node, neighbors = stack[-1]
+        for neighbor in neighbors:
+            if neighbor not in visited:
+                visited.add(neighbor)
+                if report_pre:
+                    yield PREORDER, neighbor
+                if neighbor == goal:
+                    return
+                # Go one level deeper. We come back to the rest of `node`'s
+                # neighbors once everything below `neighbor` is explored.
+                stack.append((neighbor, iter(neighbor.neighbors)))
+                break
+        else:
+            # Every neighbor has been explored, so we backtrack
+            stack.pop()
+            if report_post:
+                yield POSTORDER, node
+
+
+def dfs_preorder(source: GeneralNode,
+                 goal: Optional[GeneralNode] = None) -> Iterator[GeneralNode]:
+    """Yields the nodes in the order a depth first search visits them."""
+    for _, node in iter_dfs(source, goal):
+        yield node
+
+
+def dfs_postorder(source: GeneralNode) -> Iterator[GeneralNode]:
+    """Yields the nodes in the order a depth first search finishes them."""
+    for _, node in iter_dfs(source, events=(POSTORDER,)):
+        yield node
+
+
+def dfs_find(source: GeneralNode, goal: GeneralNode) -> bool:
+    """Returns whether `goal` can be reached from `source`."""
+    for node in dfs_preorder(source, goal):
+        if node == goal:
+            return True
+    return False
+
+
+if __name__ == '__main__':
+    from dfs import dfs_recursive
+    from graph_utils import Graph
+
+    graph = Graph('dfs-graph.txt', undirected=False)
+    nodes = graph.nodes
+
+    print([node.node_id for node in dfs_preorder(nodes['A'])])
+    print([node.node_id for node in dfs_recursive(nodes['A'])])
+    print([(event.value, node.node_id)
+           for event, node in iter_dfs(nodes['A'],
+                                       events=(PREORDER, POSTORDER))])
+    print(dfs_find(nodes['F'], nodes['A']))
@@ -1,44 +1,37 @@
-import turtle
 from typing import List, Tuple
+from dfs_engine import iter_dfs
 from graph_utils import Graph, Node
 
 def dfs_non_recursive(source: Node, goal) -> Tuple[List[Node], bool]:
-    # Performs depth-first search on a graph
-    path = []
-    to_visit = [source]
-    while len(to_visit) != 0: 
-        current = to_visit.pop()
-
-        if current in path:
-            continue
-        
-        path.append(current)
-
-        if current == goal:
-            return path, True
-        for neighbor in current.neighbors:
-            to_visit.append(neighbor)
-
-    return path, False
+    # Performs depth-first search on a graph, stopping at `goal`. The stack
+    # is kept by `iter_dfs`, which yields `goal` last if it finds it
+    path = [node for _, node in iter_dfs(source, goal)]
+    return path, path[-1] == goal
+
+def dfs_recursive(source: Node, path = None, visited = None):
+    # New lists for every search, a default `path = []` would be shared
+    if path is None:
+        path = []
+    if visited is None:
+        visited = set()
+    if source in visited:
+        return path
+    # Same order as calling dfs_recursive on every neighbor, without running
+    # into Python's recursion limit on long paths
+    path.extend(node for _, node in iter_dfs(source, visited=visited))
+    return path
 
-graph = Graph("dfs-graph.txt", undirected=False)
-nodes = graph.nodes
+if __name__ == "__main__":
+    import turtle
 
-dfs_path, found = dfs_non_recursive(nodes['F'], nodes['A'])
-print(found)
+    graph = Graph("dfs-graph.txt", undirected=False)
+    nodes = graph.nodes
 
-def dfs_recursive(source: Node, path = []):
-    if source in path:
-        return path
-    path.append(source)
-    # if current == goal:
-        # return path, True
-    for neighbor in source.neighbors:
-        path = dfs_recursive(neighbor, path)
-    return path
+    dfs_path, found = dfs_non_recursive(nodes['F'], nodes['A'])
+    print(found)
 
-dfs_path = dfs_recursive(nodes['A'])
+    dfs_path = dfs_recursive(nodes['A'])
 
-graph.draw_graph()
-graph.draw_path(dfs_path, draw_lines = False)
-turtle.done()
\ No newline at end of file
+    graph.draw_graph()
+    graph.draw_path(dfs_path, draw_lines = False)
+    turtle.done()
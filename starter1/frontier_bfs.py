@@ -0,0 +1,150 @@
+"""Level-synchronous breadth first search over a `CSRGraph`.
+
+`bfs.py` visits one node at a time: it takes a node off the queue, looks at its
+neighbors and puts the unvisited ones on the queue. Here we instead process a
+whole frontier (every node at the same distance from the sources) at once with
+NumPy operations:
+
+1. gather the neighbors of every node in the frontier
+2. drop the ones that have already been visited
+3. the remaining ones, without duplicates, are the next frontier
+
+The search can start from many sources at once, in which case the distance of
+a node is its distance to the closest source. Large frontiers can be split
+across threads, since NumPy releases the GIL for most of the work.
+
+References:
+- https://en.wikipedia.org/wiki/Parallel_breadth-first_search
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from csr_graph import CSRGraph
+
+# Frontiers smaller than this are always expanded on the calling thread
+PARALLEL_THRESHOLD = 1 << 16
+
+UNVISITED = -1
+
+
+@dataclass
+class BFSResult:
+    """`distance[n]` is the number of edges from the closest source to node n
+    and `parent[n]` the node before n on that path. Both are -1 for nodes that
+    weren't reached, and `parent` is -1 for the sources themselves."""
+    distance: np.ndarray
+    parent: np.ndarray
+    # Number of frontiers that were expanded
+    levels: int
+
+    def reached(self, node: int) -> bool:
+        return self.distance[node] != UNVISITED
+
+    def path_to(self, node: int) -> Optional[List[int]]:
+        """The path from the closest source to `node`, or `None` if it wasn't
+        reached."""
+        if not self.reached(node):
+            return None
+        path = [node]
+        while self.parent[path[-1]] != UNVISITED:
+            path.append(int(self.parent[path[-1]]))
+        path.reverse()
+        return path
+
+
+def _expand(csr: CSRGraph, frontier: np.ndarray,
+            distance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the unvisited neighbors of the nodes in `frontier`, and for
+    each of them the frontier node it was reached from. May contain
+    duplicates."""
+    starts = csr.offsets[frontier]
+    counts = csr.offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # The edge indices of all frontier nodes, one contiguous run per node:
+    # each run starts at `starts[i]`, and `arange` counts up through all runs
+    run_starts = np.cumsum(counts) - counts
+    edges = np.repeat(starts - run_starts, counts) + np.arange(total)
+
+    neighbors = csr.targets[edges]
+    unvisited = distance[neighbors] == UNVISITED
+    return (neighbors[unvisited].astype(np.int64),
+            np.repeat(frontier, counts)[unvisited])
+
+
+def multi_source_bfs(csr: CSRGraph,
+                     sources: Union[int, Iterable[int]],
+                     target: Optional[int] = None,
+                     workers: int = 1,
+                     parallel_threshold: int = PARALLEL_THRESHOLD
+                     ) -> BFSResult:
+    """Breadth first search from all of `sources` (node indices) at once.
+
+    If `target` is given the search stops after the level in which it is
+    reached; nodes beyond that level are left unvisited.
+
+    With `workers > 1`, frontiers of at least `parallel_threshold` nodes are
+    split into chunks that are expanded on a thread pool. The result doesn't
+    depend on the number of workers: when several frontier nodes reach the
+    same new node, the parent is always the one that comes first in the
+    frontier.
+    """
+    distance = np.full(csr.num_nodes, UNVISITED, dtype=np.int64)
+    parent = np.full(csr.num_nodes, UNVISITED, dtype=np.int64)
+
+    frontier = np.unique(np.atleast_1d(np.asarray(sources, dtype=np.int64)))
+    distance[frontier] = 0
+    levels = 0
+
+    executor = ThreadPoolExecutor(workers) if workers > 1 else None
+    try:
+        while len(frontier) and not (target is not None and
+                                     distance[target] != UNVISITED):
+            if executor is not None and len(frontier) >= parallel_threshold:
+                chunks = np.array_split(frontier, workers)
+                parts = list(
+                    executor.map(lambda c: _expand(csr, c, distance), chunks))
+                neighbors = np.concatenate([n for n, _ in parts])
+                parents = np.concatenate([p for _, p in parts])
+            else:
+                neighbors, parents = _expand(csr, frontier, distance)
+
+            # Keep the first occurrence of every newly reached node
+            order = np.argsort(neighbors, kind='stable')
+            neighbors, parents = neighbors[order], parents[order]
+            first = np.ones(len(neighbors), dtype=bool)
+            first[1:] = neighbors[1:] != neighbors[:-1]
+            frontier = neighbors[first]
+
+            levels += 1
+            distance[frontier] = levels
+            parent[frontier] = parents[first]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return BFSResult(distance, parent, levels)
+
+
+def bfs_target(csr: CSRGraph, source: int, target: int) -> bool:
+    """Returns whether `target` can be reached from `source`, stopping as soon
+    as it is found."""
+    return multi_source_bfs(csr, source, target=target).reached(target)
+
+
+if __name__ == '__main__':
+    csr = CSRGraph.from_file('graph2.txt', undirected=False)
+    result = multi_source_bfs(csr, [csr.index['1'], csr.index['5']])
+    for node_id, i in csr.index.items():
+        path = result.path_to(i)
+        print(node_id, result.distance[i],
+              path and [csr.node_ids[n] for n in path])
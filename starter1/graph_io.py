@@ -0,0 +1,142 @@
+"""Streaming reader for graph files.
+
+Each line in a graph file represents a node and has the syntax:
+
+```
+node_id:node_x,node_y neighbor_id1 neighbor_id2 ...
+```
+
+The reader processes the file a chunk of lines at a time, so even graph files
+with millions of lines are never held in memory all at once. Malformed lines
+are reported with their line number.
+"""
+
+from array import array
+from dataclasses import dataclass
+import sys
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+NodeId = str
+
+# Roughly how many bytes of the file we read at a time
+CHUNK_SIZE = 1 << 20
+
+
+class GraphFileError(ValueError):
+    """Raised when a graph file contains a line we can't understand."""
+
+    def __init__(self, graph_file: str, line_number: int, message: str):
+        super().__init__(f'{graph_file}:{line_number}: {message}')
+        self.graph_file = graph_file
+        self.line_number = line_number
+
+
+class NodeRecord(NamedTuple):
+    line_number: int
+    node_id: NodeId
+    position: Tuple[int, int]
+    neighbor_ids: List[NodeId]
+
+
+def iter_graph_file(graph_file: str,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[NodeRecord]:
+    """Yields one `NodeRecord` per node line of `graph_file`.
+
+    Blank lines are skipped. Node ids are interned, since every id appears
+    once as a definition and usually several times as a neighbor.
+    """
+    intern = sys.intern
+    line_number = 0
+    with open(graph_file) as f:
+        while True:
+            lines = f.readlines(chunk_size)
+            if not lines:
+                break
+            for line in lines:
+                line_number += 1
+                parts = line.split()
+                if not parts:
+                    continue
+
+                node_def = parts[0]
+                node_id, sep, node_pos = node_def.partition(':')
+                x, comma, y = node_pos.partition(',')
+                if not (sep and comma and node_id):
+                    raise GraphFileError(
+                        graph_file, line_number,
+                        f"expected 'node_id:x,y', got {node_def!r}")
+                try:
+                    position = (int(x), int(y))
+                except ValueError:
+                    raise GraphFileError(
+                        graph_file, line_number,
+                        f'invalid position {node_pos!r}') from None
+
+                yield NodeRecord(line_number, intern(node_id), position,
+                                 [intern(n) for n in parts[1:]])
+
+
+@dataclass
+class GraphArrays:
+    """The contents of a graph file with node ids replaced by integer indices.
+
+    `positions` holds `x0, y0, x1, y1, ...` and edge `k` goes from
+    `sources[k]` to `targets[k]`.
+    """
+    node_ids: List[NodeId]
+    positions: array
+    sources: array
+    targets: array
+
+
+def read_graph_arrays(graph_file: str,
+                      chunk_size: int = CHUNK_SIZE) -> GraphArrays:
+    """Reads `graph_file` in a single streaming pass into compact arrays.
+
+    Node ids get an index the first time they are seen, whether as a node
+    definition or as a neighbor, so neighbors may be defined after the nodes
+    that reference them.
+    """
+    index: Dict[NodeId, int] = {}
+    node_ids: List[NodeId] = []
+    positions = array('q')
+    sources = array('q')
+    targets = array('q')
+    defined = bytearray()
+    # For nodes referenced before they are defined, the line of the first
+    # reference, so we can report it if the definition never shows up
+    first_reference: Dict[NodeId, int] = {}
+
+    def get_index(node_id: NodeId) -> int:
+        i = index.get(node_id)
+        if i is None:
+            i = index[node_id] = len(node_ids)
+            node_ids.append(node_id)
+            positions.extend((0, 0))
+            defined.append(0)
+        return i
+
+    for record in iter_graph_file(graph_file, chunk_size):
+        i = get_index(record.node_id)
+        if defined[i]:
+            raise GraphFileError(graph_file, record.line_number,
+                                 f'node {record.node_id!r} is defined twice')
+        defined[i] = 1
+        first_reference.pop(record.node_id, None)
+        positions[2 * i], positions[2 * i + 1] = record.position
+
+        for neighbor_id in record.neighbor_ids:
+            j = index.get(neighbor_id)
+            if j is None:
+                j = get_index(neighbor_id)
+                first_reference[neighbor_id] = record.line_number
+            targets.append(j)
+        sources.extend([i] * len(record.neighbor_ids))
+
+    if first_reference:
+        neighbor_id, line_number = min(first_reference.items(),
+                                       key=lambda item: item[1])
+        raise GraphFileError(graph_file, line_number,
+                             f'neighbor {neighbor_id!r} is never defined')
+
+    return GraphArrays(node_ids, positions, sources, targets)
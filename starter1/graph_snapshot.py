@@ -0,0 +1,236 @@
+"""A binary snapshot format for `CSRGraph`, so big graph files only have to be
+parsed once.
+
+A snapshot is a single file with a fixed size header followed by the CSR arrays
+and an interned node id table. Loading a snapshot memory-maps the file instead
+of reading it, so it takes about the same time for ten nodes as for ten
+million: pages are only read from disk when an algorithm touches them.
+
+The header records the size and modification time of the graph file the
+snapshot was built from. `load_csr_graph` rebuilds the snapshot whenever those
+no longer match.
+
+Layout (all sections start on a 64 byte boundary):
+
+```
+header
+positions   int64[num_nodes, 2]
+offsets     int64[num_nodes + 1]
+targets     int32 or int64[num_edges]
+weights     float64[num_edges]
+id_offsets  int64[num_nodes + 1]   node i is id_blob[id_offsets[i]:id_offsets[i + 1]]
+id_order    int64[num_nodes]       node indices sorted by id, for lookups
+id_blob     utf-8 bytes
+```
+"""
+
+from bisect import bisect_left
+import os
+import struct
+import sys
+from typing import Iterator, Mapping, Optional, Sequence
+import warnings
+
+import numpy as np
+
+sys.path.append('.')
+
+from csr_graph import CSRGraph
+from graph_utils import NodeId
+
+SNAPSHOT_SUFFIX = '.snapshot'
+
+MAGIC = b'CSRG'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIQqQQQ')
+ALIGNMENT = 64
+
+FLAG_UNDIRECTED = 1
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class SnapshotNodeIds(Sequence[NodeId]):
+    """The node ids of a snapshot, decoded on demand from the id blob."""
+
+    def __init__(self, id_offsets: np.ndarray, id_blob: np.ndarray):
+        self._offsets = id_offsets
+        self._blob = id_blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return self._blob[start:end].tobytes().decode()
+
+    def __iter__(self) -> Iterator[NodeId]:
+        offsets = self._offsets.tolist()
+        blob = self._blob.tobytes()
+        for start, end in zip(offsets, offsets[1:]):
+            yield blob[start:end].decode()
+
+
+class SnapshotNodeIndex(Mapping[NodeId, int]):
+    """Maps node ids to node indices with a binary search over the sorted id
+    table, so no dictionary has to be built when a snapshot is loaded."""
+
+    def __init__(self, node_ids: SnapshotNodeIds, id_order: np.ndarray):
+        self._node_ids = node_ids
+        self._order = id_order
+        self._sorted_ids = _SortedIds(node_ids, id_order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self) -> Iterator[NodeId]:
+        return iter(self._node_ids)
+
+    def __getitem__(self, node_id: NodeId) -> int:
+        sorted_ids = self._sorted_ids
+        position = bisect_left(sorted_ids, node_id)
+        if position < len(self._order) and sorted_ids[position] == node_id:
+            return int(self._order[position])
+        raise KeyError(node_id)
+
+
+class _SortedIds(Sequence[NodeId]):
+    """A view of the node ids in sorted order, for `bisect`."""
+
+    def __init__(self, node_ids: SnapshotNodeIds, id_order: np.ndarray):
+        self._node_ids = node_ids
+        self._order = id_order
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, i: int) -> NodeId:
+        return self._node_ids[self._order[i]]
+
+
+def write_snapshot(csr: CSRGraph, snapshot_path: str,
+                   source: os.stat_result) -> None:
+    """Writes `csr` to `snapshot_path`, tagged with the size and modification
+    time of the graph file it was read from.
+
+    The snapshot is written to a temporary file first and then moved into
+    place, so readers never see a partially written snapshot.
+    """
+    encoded = [node_id.encode() for node_id in csr.node_ids]
+    id_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=id_offsets[1:])
+    id_order = np.argsort(np.array(csr.node_ids, dtype=str),
+                          kind='stable').astype(np.int64)
+    id_blob = b''.join(encoded)
+
+    targets_size = csr.targets.dtype.itemsize
+    flags = FLAG_UNDIRECTED if csr.undirected else 0
+    header = HEADER.pack(MAGIC, VERSION, flags, targets_size, source.st_size,
+                         source.st_mtime_ns, csr.num_nodes, csr.num_edges,
+                         len(id_blob))
+
+    sections = [
+        np.ascontiguousarray(csr.positions, dtype=np.int64).tobytes(),
+        np.ascontiguousarray(csr.offsets, dtype=np.int64).tobytes(),
+        np.ascontiguousarray(csr.targets).tobytes(),
+        np.ascontiguousarray(csr.weights, dtype=np.float64).tobytes(),
+        id_offsets.tobytes(),
+        id_order.tobytes(),
+        id_blob,
+    ]
+
+    tmp_path = f'{snapshot_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            for section in sections:
+                f.write(b'\0' * (_aligned(f.tell()) - f.tell()))
+                f.write(section)
+        os.replace(tmp_path, snapshot_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_snapshot(snapshot_path: str,
+                  source: Optional[os.stat_result] = None,
+                  undirected: Optional[bool] = None) -> Optional[CSRGraph]:
+    """Memory-maps the snapshot at `snapshot_path`.
+
+    Returns `None` if there is no usable snapshot: the file is missing, was
+    written by another version, or doesn't match `source` (the stat of the
+    graph file) or `undirected`.
+    """
+    try:
+        with open(snapshot_path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+
+    (magic, version, flags, targets_size, source_size, source_mtime_ns,
+     num_nodes, num_edges, id_blob_size) = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if source is not None and (source.st_size != source_size or
+                               source.st_mtime_ns != source_mtime_ns):
+        return None
+    if undirected is not None and bool(flags & FLAG_UNDIRECTED) != undirected:
+        return None
+
+    data = np.memmap(snapshot_path, dtype=np.uint8, mode='r')
+    offset = HEADER.size
+
+    def section(dtype, count: int) -> np.ndarray:
+        nonlocal offset
+        start = _aligned(offset)
+        offset = start + count * np.dtype(dtype).itemsize
+        if offset > len(data):
+            raise ValueError(f'{snapshot_path}: snapshot is truncated')
+        return data[start:offset].view(dtype)
+
+    positions = section(np.int64, 2 * num_nodes).reshape(-1, 2)
+    offsets = section(np.int64, num_nodes + 1)
+    targets = section(np.int32 if targets_size == 4 else np.int64, num_edges)
+    weights = section(np.float64, num_edges)
+    id_offsets = section(np.int64, num_nodes + 1)
+    id_order = section(np.int64, num_nodes)
+    id_blob = section(np.uint8, id_blob_size)
+
+    node_ids = SnapshotNodeIds(id_offsets, id_blob)
+    return CSRGraph(node_ids=node_ids,
+                    positions=positions,
+                    offsets=offsets,
+                    targets=targets,
+                    weights=weights,
+                    undirected=bool(flags & FLAG_UNDIRECTED),
+                    index=SnapshotNodeIndex(node_ids, id_order))
+
+
+def load_csr_graph(graph_file: str,
+                   undirected: bool = True,
+                   snapshot_path: Optional[str] = None) -> CSRGraph:
+    """Loads `graph_file` as a `CSRGraph`, using the snapshot next to it when
+    it is up to date and (re)building the snapshot otherwise."""
+    if snapshot_path is None:
+        snapshot_path = graph_file + SNAPSHOT_SUFFIX
+    source = os.stat(graph_file)
+
+    try:
+        csr = read_snapshot(snapshot_path, source, undirected)
+    except ValueError:
+        csr = None
+    if csr is not None:
+        return csr
+
+    csr = CSRGraph.from_file(graph_file, undirected=undirected)
+    try:
+        write_snapshot(csr, snapshot_path, source)
+    except OSError as e:
+        warnings.warn(f'could not write graph snapshot {snapshot_path}: {e}')
+    return csr
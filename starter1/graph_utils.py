@@ -1,9 +1,13 @@
-import turtle
+from collections import OrderedDict
 import time
 from typing import Dict, Generic, List, Set, Tuple, TypeVar
 from dataclasses import dataclass, field
 from math import sqrt
 
+import numpy as np
+
+from graph_io import GraphFileError, iter_graph_file
+
 NodeId = str
 
 T = TypeVar('T')
@@ -11,6 +15,19 @@ T = TypeVar('T')
 WeightedNeighbors = Set[Tuple[T, float]]
 
 
+class GraphVersion:
+    """A number shared by the nodes of one graph, incremented every time an
+    edge is added to one of them, so that anything caching search results
+    can tell when those results may be out of date."""
+
+    def __init__(self):
+        self.value = 0
+
+
+# The version of nodes that aren't part of a `Graph`
+_LOOSE_NODES = GraphVersion()
+
+
 @dataclass(frozen=True, order=True)
 class Node(Generic[T]):
     weighted_neighbors: WeightedNeighbors[T] = field(default_factory=set,
@@ -23,10 +40,16 @@ class Node(Generic[T]):
                               hash=False,
                               repr=False,
                               compare=False)
+    version: GraphVersion = field(default_factory=lambda: _LOOSE_NODES,
+                                  init=False,
+                                  hash=False,
+                                  repr=False,
+                                  compare=False)
 
     def add_neighbor(self, neighbor: T, weight: float = 0):
         self.weighted_neighbors.add((neighbor, weight))
         self.neighbors.add(neighbor)
+        self.version.value += 1
 
     def get_weighted_neighbors(self) -> WeightedNeighbors[T]:
         return self.weighted_neighbors
@@ -42,6 +65,9 @@ WIDTH = 600
 HEIGHT = 600
 NODE_RADIUS = 20
 
+# Bytes of goal distance vectors `Graph.goal_distances` keeps around
+GOAL_CACHE_BYTES = 64 * 2**20
+
 class Graph:
 
     nodes: Dict[NodeId, LocationNode]
@@ -56,46 +82,98 @@ class Graph:
         ```
         
         The order of the lines isn't important. The exact whitespace in each line is
-        important.
+        important. Every node must be defined exactly once.
         """
-        self.screen = turtle.Screen()
-        self.screen.setup(WIDTH, HEIGHT)
-        self.screen.setworldcoordinates(0, HEIGHT, WIDTH, 0)
-        turtle.hideturtle()
-        # turtle.speed(1)
-        self.original_tracer = self.screen.tracer()
-        self.screen.tracer(0)
-        turtle.colormode(255)
-
+        # The turtle screen is only created the first time we draw something,
+        # so that loading and searching a graph works without a display.
+        self._screen = None
+        self.original_tracer = None
 
         self.nodes = {}
         self.undirected = undirected
-
-        with open(graph_file) as f:
-            neighbors_defs: List[Tuple[NodeId, List[str]]] = []
-            for line in f.readlines():
-                parts = line.split()
-                node_def = parts[0]
-                [node_id, node_pos] = node_def.split(':')
-                position = tuple(map(int, node_pos.split(',')))
-                node = LocationNode(position=position, node_id=node_id)
-                self.nodes[node.node_id] = node
-
-                if len(parts) > 1:
-                    neighbors_defs.append((node.node_id, parts[1:]))
-
-            for node_id, neighbors in neighbors_defs:
-                for neighbor_def in neighbors:
-                    neighbor = self.nodes[neighbor_def]
-                    current_node = self.nodes[node_id]
-                    current_node.add_neighbor(
-                        neighbor, self.calc_distance(current_node, neighbor))
-                    if self.undirected:
-                        neighbor.add_neighbor(
-                            current_node,
-                            self.calc_distance(neighbor, current_node))
+        # Shared by all nodes of this graph, see `GraphVersion`
+        self.version = GraphVersion()
+
+        neighbors_defs: List[Tuple[int, NodeId, List[NodeId]]] = []
+        for record in iter_graph_file(graph_file):
+            # Same check as `graph_io.read_graph_arrays`, so both loaders
+            # accept the same files
+            if record.node_id in self.nodes:
+                raise GraphFileError(
+                    graph_file, record.line_number,
+                    f'node {record.node_id!r} is defined twice')
+            node = LocationNode(position=record.position,
+                                node_id=record.node_id)
+            # Nodes are frozen, so the field is set the way dataclasses set
+            # fields of frozen instances
+            object.__setattr__(node, 'version', self.version)
+            self.nodes[node.node_id] = node
+
+            if record.neighbor_ids:
+                neighbors_defs.append(
+                    (record.line_number, node.node_id, record.neighbor_ids))
+
+        # Every node gets an index into `positions`, an (N, 2) array holding
+        # the position of each node
+        self.node_index: Dict[NodeId, int] = {
+            node_id: i for i, node_id in enumerate(self.nodes)}
+        self.positions = np.array(
+            [node.position for node in self.nodes.values()],
+            dtype=np.float64).reshape(-1, 2)
+
+        sources: List[LocationNode] = []
+        targets: List[LocationNode] = []
+        for line_number, node_id, neighbors in neighbors_defs:
+            current_node = self.nodes[node_id]
+            for neighbor_def in neighbors:
+                neighbor = self.nodes.get(neighbor_def)
+                if neighbor is None:
+                    raise GraphFileError(
+                        graph_file, line_number,
+                        f'neighbor {neighbor_def!r} is never defined')
+                sources.append(current_node)
+                targets.append(neighbor)
+
+        # The weight of each edge is the distance between its two nodes. We
+        # compute all of them at once with NumPy instead of calling
+        # `calc_distance` per edge (and twice per undirected edge).
+        index = self.node_index
+        delta = (self.positions[[index[n.node_id] for n in sources]] -
+                 self.positions[[index[n.node_id] for n in targets]])
+        weights = np.sqrt((delta**2).sum(axis=1)).tolist()
+
+        for current_node, neighbor, weight in zip(sources, targets, weights):
+            current_node.add_neighbor(neighbor, weight)
+            if self.undirected:
+                neighbor.add_neighbor(current_node, weight)
+
+        self._goal_distances: 'OrderedDict[LocationNode, np.ndarray]' = \
+            OrderedDict()
+        self._goal_cache_bytes = 0
+
+    @property
+    def screen(self):
+        """The turtle screen used for drawing, created on first use."""
+        if self._screen is None:
+            import turtle
+            self._screen = turtle.Screen()
+            self._screen.setup(WIDTH, HEIGHT)
+            self._screen.setworldcoordinates(0, HEIGHT, WIDTH, 0)
+            turtle.hideturtle()
+            # turtle.speed(1)
+            self.original_tracer = self._screen.tracer()
+            self._screen.tracer(0)
+            turtle.colormode(255)
+        return self._screen
+
+    def _get_turtle(self):
+        """Imports `turtle` and makes sure our screen has been set up."""
+        import turtle
+        self.screen
+        return turtle
 
     def draw_graph(self):
+        turtle = self._get_turtle()
         for node in self.nodes.values():
             node_x, node_y = node.position
             node_top = self.get_node_circle_position(node)
@@ -134,8 +212,16 @@ class Graph:
 
         turtle.update()
 
-    def draw_path(self, path: List[LocationNode], draw_lines: bool = True):
-        self.screen.tracer(self.original_tracer)
+    def draw_path(self,
+                  path: List[LocationNode],
+                  draw_lines: bool = True,
+                  animate: bool = True):
+        """Draws `path` in green. With `animate=False` the whole path is drawn
+        at once instead of one node at a time. To render a path without a
+        display, use `render.OffscreenRenderer`."""
+        turtle = self._get_turtle()
+        if animate:
+            self.screen.tracer(self.original_tracer)
 
         if len(path) == 0:
             return
@@ -163,16 +249,48 @@ class Graph:
             turtle.goto(node_top)
             turtle.pendown()
             turtle.circle(NODE_RADIUS)
-            time.sleep(0.3)
+            if animate:
+                time.sleep(0.3)
             current_node = next_node
 
         self.screen.tracer(0)
+        if not animate:
+            self.screen.update()
 
     def calc_distance(self, n1: LocationNode, n2: LocationNode) -> float:
         n1p = n1.position
         n2p = n2.position
         return sqrt((n1p[0] - n2p[0])**2 + (n1p[1] - n2p[1])**2)
 
+    def goal_distances(self, goal: LocationNode) -> np.ndarray:
+        """Returns the distance from every node to `goal`, in the order of
+        `node_index`, computed in one NumPy pass.
+
+        The most recently used vectors are kept, up to `GOAL_CACHE_BYTES`, so
+        repeated queries to the same goal don't compute them again. The order
+        is the same as in `CSRGraph.from_graph(graph)`, so the vector can be
+        passed to `csr_search.a_star_indices` as `heuristic`, which makes
+        long searches to the same goal about a quarter faster. Short
+        searches should compute the distance per node instead, since a new
+        vector costs O(N) (see `benchmarks/heuristics.py`).
+        """
+        distances = self._goal_distances.get(goal)
+        if distances is not None:
+            self._goal_distances.move_to_end(goal)
+            return distances
+
+        goal_position = self.positions[self.node_index[goal.node_id]]
+        delta = self.positions - goal_position
+        distances = np.sqrt((delta**2).sum(axis=1))
+        if distances.nbytes <= GOAL_CACHE_BYTES:
+            self._goal_distances[goal] = distances
+            self._goal_cache_bytes += distances.nbytes
+            while self._goal_cache_bytes > GOAL_CACHE_BYTES:
+                _, evicted = self._goal_distances.popitem(last=False)
+                self._goal_cache_bytes -= evicted.nbytes
+        return distances
+
     def get_node_circle_position(self, node: LocationNode) -> Tuple[int, int]:
         node_x, node_y = node.position
         return node_x, node_y - NODE_RADIUS
+
@@ -0,0 +1,126 @@
+"""Opt-in instrumentation for the search algorithms.
+
+`a_star`, `a_star_search`, `breadth_first_search`, `dfs_non_recursive`,
+`dfs_recursive` and `detect_cycle` all take an optional `instrument`. Without
+one they do no extra work beyond an `is None` check here and there. With one
+they report:
+
+- `searches`: how many times an algorithm was run
+- `expanded`: nodes whose neighbors were looked at
+- `pushes` and `pops`: entries added to and taken off the open set (the heap,
+  queue or stack)
+- `stale_pops`: entries taken off the open set that were already done, and
+  skipped
+- `relaxations`: edges looked at while expanding nodes
+- `heuristic_calls`: calls to the heuristic of A*
+- the wall time spent in each phase of the algorithms, e.g. `search` and
+  `reconstruct` for A*
+
+An `Instrumentation` keeps adding up over many searches until `reset` is
+called. `on_expand`, if given, is called with every expanded node, which is
+handy for tracing a single slow query.
+
+```
+instrument = Instrumentation(labels={'graph': 'graph2'})
+path = a_star(nodes['1'], nodes['10'], graph.calc_distance, instrument)
+print(instrument.as_dict())
+print(instrument.to_prometheus())
+```
+
+`to_prometheus` produces the Prometheus text exposition format, so the
+counters can be served from a metrics endpoint as they are.
+
+References:
+- https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+COUNTERS = ('searches', 'expanded', 'pushes', 'pops', 'stale_pops',
+            'relaxations', 'heuristic_calls')
+
+ExpansionCallback = Callable[[Any], None]
+
+
+class Instrumentation:
+    """Counters and phase timings collected by the search algorithms."""
+
+    def __init__(self,
+                 on_expand: Optional[ExpansionCallback] = None,
+                 labels: Optional[Dict[str, str]] = None):
+        self.on_expand = on_expand
+        # Added to every metric exported by `to_prometheus`
+        self.labels = dict(labels or {})
+        self.reset()
+
+    def reset(self):
+        self.searches = 0
+        self.expanded = 0
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+        self.relaxations = 0
+        self.heuristic_calls = 0
+        self.phase_seconds: Dict[str, float] = defaultdict(float)
+
+    def expand(self, node: Any, num_edges: int):
+        """Records the expansion of `node`, which has `num_edges` edges to look
+        at."""
+        self.expanded += 1
+        self.relaxations += num_edges
+        if self.on_expand is not None:
+            self.on_expand(node)
+
+    def counting(self, h: Callable[..., float]) -> Callable[..., float]:
+        """Wraps the heuristic `h` so that its calls are counted."""
+
+        def counted(n, goal) -> float:
+            self.heuristic_calls += 1
+            return h(n, goal)
+
+        return counted
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Adds the time spent in the `with` block to phase `name`."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] += time.perf_counter() - start_time
+
+    def as_dict(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {name: getattr(self, name)
+                                 for name in COUNTERS}
+        stats['phase_seconds'] = dict(self.phase_seconds)
+        return stats
+
+    def to_prometheus(self, prefix: str = 'search') -> str:
+        """The counters and phase timings in the Prometheus text format, one
+        `<prefix>_<counter>_total` metric per counter and a
+        `<prefix>_phase_seconds_total` metric with a `phase` label."""
+        lines = []
+        for name in COUNTERS:
+            metric = f'{prefix}_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(
+                f'{metric}{_labels(self.labels)} {getattr(self, name)}')
+
+        metric = f'{prefix}_phase_seconds_total'
+        lines.append(f'# TYPE {metric} counter')
+        for phase, seconds in sorted(self.phase_seconds.items()):
+            labels = _labels({**self.labels, 'phase': phase})
+            lines.append(f'{metric}{labels} {seconds!r}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n') + '"' for key, value in sorted(labels.items()))
+    return '{' + ','.join(escaped) + '}'
@@ -0,0 +1,266 @@
+"""Landmark (ALT) heuristics for A*.
+
+The straight line distance is a weak heuristic once edge weights stop matching
+the geometry of the graph. ALT ("A*, Landmarks and the Triangle inequality")
+instead picks a few landmark nodes L and precomputes the shortest path distance
+from every landmark to every node and back. By the triangle inequality, for any
+nodes n and goal:
+
+```
+d(n, goal) >= d(L, goal) - d(L, n)
+d(n, goal) >= d(n, L) - d(goal, L)
+```
+
+The largest of these bounds over all landmarks is an admissible and consistent
+heuristic, so it plugs straight into `a_star`. Precomputing costs 2K Dijkstra
+searches (K for undirected graphs), which is why the tables are saved next to
+the graph file and reused.
+
+References:
+- Goldberg & Harrelson, "Computing the Shortest Path: A* Search Meets Graph
+  Theory" (2005)
+"""
+
+from dataclasses import dataclass
+import os
+from typing import List, Mapping, Optional, Tuple
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from csr_graph import CSRGraph
+from csr_search import dijkstra_distances
+from graph_utils import Node, NodeId
+
+LANDMARKS_SUFFIX = '.landmarks.npz'
+
+# The bounds are differences of large, rounded distances, so they can come
+# out a few units in the last place above the true distance. We subtract this
+# many spacings of the largest distance in the tables from every bound so the
+# heuristic stays admissible.
+ROUNDING_ULPS = 4
+
+
+@dataclass(frozen=True)
+class LandmarkTables:
+    """`from_landmark[n, k]` is the distance from landmark k to node n and
+    `to_landmark[n, k]` the distance from node n to landmark k. Rows are per
+    node so the K distances of one node are next to each other in memory.
+
+    The tables only fit the graph they were computed on: the same file loaded
+    as directed or undirected has different distances, so `undirected` and
+    the `seed` used to pick the landmarks are kept with them."""
+    landmarks: np.ndarray
+    from_landmark: np.ndarray
+    to_landmark: np.ndarray
+    undirected: bool = True
+    seed: int = 0
+
+    @property
+    def num_landmarks(self) -> int:
+        return len(self.landmarks)
+
+    @property
+    def rounding_margin(self) -> float:
+        """An upper bound on the rounding error of a bound."""
+        finite = [table[np.isfinite(table)].max(initial=0)
+                  for table in (self.from_landmark, self.to_landmark)]
+        return ROUNDING_ULPS * float(np.spacing(max(finite)))
+
+
+def select_landmarks(csr: CSRGraph, num_landmarks: int,
+                     seed: int = 0) -> LandmarkTables:
+    """Picks landmarks with the "farthest" strategy and computes their
+    distance tables.
+
+    Each new landmark is the reachable node furthest away from all landmarks
+    picked so far. Only once every reachable node is a landmark do we jump to a
+    node none of them can reach.
+    """
+    num_landmarks = min(num_landmarks, csr.num_nodes)
+    reverse = csr.reversed()
+    rng = np.random.default_rng(seed)
+
+    landmarks = np.zeros(num_landmarks, dtype=np.int64)
+    from_landmark = np.zeros((csr.num_nodes, num_landmarks), dtype=np.float64)
+    to_landmark = np.zeros((csr.num_nodes, num_landmarks), dtype=np.float64)
+    closest = np.full(csr.num_nodes, np.inf)
+
+    landmark = int(rng.integers(csr.num_nodes)) if csr.num_nodes else 0
+    for k in range(num_landmarks):
+        landmarks[k] = landmark
+        forward = dijkstra_distances(csr, landmark)
+        backward = (forward if reverse is csr else
+                    dijkstra_distances(reverse, landmark))
+        from_landmark[:, k] = forward
+        to_landmark[:, k] = backward
+
+        # How far away each node is from its closest landmark. In directed
+        # graphs a node may only be reachable in one of the two directions.
+        np.minimum(closest, np.fmin(forward, backward), out=closest)
+        score = np.where(np.isfinite(closest), closest, -0.5)
+        score[landmarks[:k + 1]] = -1
+        landmark = int(np.argmax(score))
+
+    return LandmarkTables(landmarks, from_landmark, to_landmark,
+                          csr.undirected, seed)
+
+
+def save_landmarks(tables: LandmarkTables, path: str,
+                   source: Optional[os.stat_result] = None) -> None:
+    meta = np.array([source.st_size, source.st_mtime_ns] if source else
+                    [-1, -1], dtype=np.int64)
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(tmp_path, landmarks=tables.landmarks,
+             from_landmark=tables.from_landmark,
+             to_landmark=tables.to_landmark, source=meta,
+             undirected=tables.undirected, seed=tables.seed)
+    os.replace(tmp_path, path)
+
+
+def load_landmarks(path: str,
+                   source: Optional[os.stat_result] = None
+                   ) -> Optional[LandmarkTables]:
+    """Loads tables saved with `save_landmarks`, or returns `None` if there
+    are none or they were computed for another version of the graph file."""
+    try:
+        with np.load(path) as data:
+            meta = data['source'].tolist()
+            if source is not None and \
+                    meta != [source.st_size, source.st_mtime_ns]:
+                return None
+            # Tables saved as float32 by older versions can't give an
+            # admissible heuristic
+            if data['from_landmark'].dtype != np.float64:
+                return None
+            # Files of older versions have no `undirected` and `seed`, and
+            # raise a KeyError
+            return LandmarkTables(data['landmarks'], data['from_landmark'],
+                                  data['to_landmark'],
+                                  bool(data['undirected']),
+                                  int(data['seed']))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def load_or_select_landmarks(graph_file: str,
+                             csr: CSRGraph,
+                             num_landmarks: int = 8,
+                             seed: int = 0) -> LandmarkTables:
+    """Returns the landmark tables saved next to `graph_file`, computing and
+    saving them first if they are missing, out of date, or were computed
+    with a different number of landmarks, seed or directedness."""
+    path = graph_file + LANDMARKS_SUFFIX
+    source = os.stat(graph_file)
+    tables = load_landmarks(path, source)
+    if tables is not None and \
+            tables.num_landmarks == min(num_landmarks, csr.num_nodes) and \
+            len(tables.from_landmark) == csr.num_nodes and \
+            tables.undirected == csr.undirected and tables.seed == seed:
+        return tables
+
+    tables = select_landmarks(csr, num_landmarks, seed)
+    save_landmarks(tables, path, source)
+    return tables
+
+
+class LandmarkHeuristic:
+    """The ALT heuristic, callable as `h(n, goal)` like `Graph.calc_distance`.
+
+    `index` maps node ids to rows of the tables, e.g. `CSRGraph.index`.
+
+    A* calls the heuristic for many nodes with the same goal, so the row of
+    the goal is converted to Python floats once per goal, and the rows of the
+    other nodes are read through memoryviews, without NumPy calls.
+    """
+
+    def __init__(self, tables: LandmarkTables, index: Mapping[NodeId, int]):
+        self.tables = tables
+        self.index = index
+        self.margin = tables.rounding_margin
+        self._num_landmarks = tables.num_landmarks
+        # Indexing a memoryview returns a plain float
+        self._from_landmark = memoryview(
+            np.ascontiguousarray(tables.from_landmark).reshape(-1))
+        self._to_landmark = memoryview(
+            np.ascontiguousarray(tables.to_landmark).reshape(-1))
+        self._goal: Optional[int] = None
+        self._goal_rows: List[Tuple[float, float]] = []
+
+    def __call__(self, n: Node, goal: Node) -> float:
+        return self.lower_bound(self.index[n.node_id],
+                                self.index[goal.node_id])
+
+    def lower_bound(self, n: int, goal: int) -> float:
+        """The heuristic between two node indices."""
+        if goal != self._goal:
+            self._goal = goal
+            self._goal_rows = list(zip(
+                self.tables.from_landmark[goal].tolist(),
+                self.tables.to_landmark[goal].tolist()))
+
+        from_landmark = self._from_landmark
+        to_landmark = self._to_landmark
+        k = n * self._num_landmarks
+        best = 0.0
+        # inf - inf is nan when neither node is reachable from (or can reach)
+        # a landmark, which tells us nothing. nan > best is false, so those
+        # bounds are skipped.
+        for goal_from, goal_to in self._goal_rows:
+            bound = goal_from - from_landmark[k]
+            if bound > best:
+                best = bound
+            bound = to_landmark[k] - goal_to
+            if bound > best:
+                best = bound
+            k += 1
+        return max(best - self.margin, 0.0)
+
+
+def _check_against_dijkstra(num_nodes: int = 2000, scale: int = 10**5,
+                            num_queries: int = 200, seed: int = 0):
+    """A* with the ALT heuristic must find paths exactly as short as plain
+    Dijkstra, also with edge weights large enough for rounding to matter."""
+    from math import isclose
+
+    from a_star import a_star_search
+    from benchmarks.generators import random_geometric
+    from csr_graph import CSRGraphAdapter
+
+    synthetic = random_geometric(num_nodes, seed)
+    csr = CSRGraph.from_edges([str(i) for i in range(num_nodes)],
+                              synthetic.positions * scale, synthetic.sources,
+                              synthetic.targets)
+    alt = LandmarkHeuristic(select_landmarks(csr, 8, seed), csr.index)
+    adapter = CSRGraphAdapter(csr)
+    rng = np.random.default_rng(seed)
+    for start, goal in rng.integers(num_nodes, size=(num_queries, 2)):
+        expected = dijkstra_distances(csr, int(start))[goal]
+        result = a_star_search(adapter.views[start], adapter.views[goal], alt)
+        if np.isinf(expected):
+            assert result.path is None, (start, goal)
+        else:
+            assert isclose(result.cost, expected, rel_tol=1e-12), \
+                (start, goal, result.cost, expected)
+    print(f'ALT matches Dijkstra on {num_queries} queries with edge weights '
+          f'up to {csr.weights.max():.3g}')
+
+
+if __name__ == '__main__':
+    from a_star import a_star_search
+    from graph_utils import Graph
+
+    _check_against_dijkstra()
+
+    graph_file = sys.argv[1] if len(sys.argv) > 1 else 'graph2.txt'
+    graph = Graph(graph_file, undirected=True)
+    csr = CSRGraph.from_graph(graph)
+    tables = load_or_select_landmarks(graph_file, csr, num_landmarks=4)
+    alt = LandmarkHeuristic(tables, csr.index)
+
+    nodes = graph.nodes
+    for name, h in [('straight line', graph.calc_distance), ('ALT', alt)]:
+        result = a_star_search(nodes['1'], nodes['10'], h)
+        print(f'{name}: cost {result.cost:.1f}, {result.stats}')
@@ -0,0 +1,435 @@
+"""Offscreen rendering of graphs and paths to PNG and SVG files.
+
+`Graph.draw_graph` needs a Tk display and makes several turtle calls per edge,
+so drawing a graph with thousands of nodes takes minutes. `OffscreenRenderer`
+draws the same picture (nodes as circles, edges as lines, arrow heads for
+directed graphs, a path highlighted in green) without turtle:
+
+- every node, edge and arrow head is computed with a handful of NumPy
+  operations over all of them at once
+- PNG images are rasterized into a NumPy array and written with `zlib`, SVG
+  images are written as a few large `<path>` elements
+- only the edges and nodes that overlap the viewport are drawn, and big graphs
+  can be split into tiles
+
+No imaging library is needed. Node labels are only drawn in SVG images.
+"""
+
+from dataclasses import dataclass
+import os
+import struct
+from typing import List, Optional, Sequence, Tuple, Union
+import zlib
+
+import numpy as np
+
+import sys
+sys.path.append('.')
+
+from csr_graph import CSRGraph
+from graph_utils import Graph, NODE_RADIUS
+
+Color = Tuple[int, int, int]
+
+BACKGROUND: Color = (255, 255, 255)
+FOREGROUND: Color = (0, 0, 0)
+PATH_COLOR: Color = (0, 255, 0)
+PATH_WIDTH = 5
+ARROW_LENGTH = 10
+ARROW_ANGLE = np.radians(30)
+
+# zlib level for PNG images. Rendered graphs are mostly background, which even
+# the fastest level compresses well
+PNG_COMPRESSION = 1
+
+# Maximum number of pixels rasterized in one NumPy batch, to bound memory use
+PIXEL_BATCH = 1 << 22
+
+
+@dataclass(frozen=True)
+class Viewport:
+    """A rectangle in graph coordinates (y grows downwards, like the turtle
+    screen of `Graph`)."""
+    x_min: float
+    y_min: float
+    x_max: float
+    y_max: float
+
+    @property
+    def width(self) -> float:
+        return self.x_max - self.x_min
+
+    @property
+    def height(self) -> float:
+        return self.y_max - self.y_min
+
+    def grow(self, margin: float) -> 'Viewport':
+        return Viewport(self.x_min - margin, self.y_min - margin,
+                        self.x_max + margin, self.y_max + margin)
+
+    def overlaps(self, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+        """For each box with corners `lo[i]` and `hi[i]`, whether it overlaps
+        the viewport."""
+        return ((hi[:, 0] >= self.x_min) & (lo[:, 0] <= self.x_max) &
+                (hi[:, 1] >= self.y_min) & (lo[:, 1] <= self.y_max))
+
+
+PathNodes = Sequence[Union[int, object]]
+
+
+class OffscreenRenderer:
+    """Renders a `Graph` or `CSRGraph` to image files."""
+
+    def __init__(self, graph: Union[Graph, CSRGraph],
+                 node_radius: float = NODE_RADIUS):
+        self.csr = graph if isinstance(graph, CSRGraph) else \
+            CSRGraph.from_graph(graph)
+        self.node_radius = node_radius
+        self.positions = self.csr.positions.astype(np.float64)
+
+        sources = np.repeat(np.arange(self.csr.num_nodes),
+                            self.csr.out_degree())
+        targets = self.csr.targets.astype(np.int64)
+        if self.csr.undirected:
+            # Both directions of an undirected edge are the same line
+            keep = sources <= targets
+            sources, targets = sources[keep], targets[keep]
+        self.edge_sources = sources
+        self.edge_targets = targets
+
+    def bounds(self) -> Viewport:
+        """The smallest viewport that shows the whole graph."""
+        if self.csr.num_nodes == 0:
+            return Viewport(0, 0, 1, 1)
+        lo = self.positions.min(axis=0).tolist()
+        hi = self.positions.max(axis=0).tolist()
+        return Viewport(lo[0], lo[1], hi[0], hi[1]).grow(2 * self.node_radius)
+
+    def _path_indices(self, path: Optional[PathNodes]) -> np.ndarray:
+        if not path:
+            return np.empty(0, dtype=np.int64)
+        return np.array([
+            node if isinstance(node, (int, np.integer)) else
+            self.csr.index[node.node_id] for node in path
+        ], dtype=np.int64)
+
+    def _visible(
+        self, viewport: Viewport
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Culls everything outside `viewport`. Returns the visible nodes and
+        the start points, end points and arrow head flags of the visible
+        line segments."""
+        positions = self.positions
+        margin = self.node_radius + ARROW_LENGTH
+        nodes = np.flatnonzero(viewport.grow(margin).overlaps(positions,
+                                                              positions))
+
+        starts = positions[self.edge_sources]
+        ends = positions[self.edge_targets]
+        visible = viewport.grow(margin).overlaps(np.minimum(starts, ends),
+                                                 np.maximum(starts, ends))
+        return nodes, starts[visible], ends[visible], visible
+
+    def _arrow_heads(self, starts: np.ndarray,
+                     ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """The two short strokes of an arrow head at the end of each segment,
+        as (start, end) point arrays."""
+        direction = ends - starts
+        length = np.hypot(direction[:, 0], direction[:, 1])
+        nonzero = length > 0
+        direction = direction[nonzero] / length[nonzero, None]
+        tips = ends[nonzero]
+        wings = []
+        for angle in (ARROW_ANGLE, -ARROW_ANGLE):
+            cos, sin = np.cos(angle), np.sin(angle)
+            rotated = np.stack([
+                direction[:, 0] * cos - direction[:, 1] * sin,
+                direction[:, 0] * sin + direction[:, 1] * cos
+            ], axis=1)
+            wings.append(tips - ARROW_LENGTH * rotated)
+        return np.concatenate([tips, tips]), np.concatenate(wings)
+
+    def _circles(self, centers: np.ndarray,
+                 scale: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximates each circle by a polygon, as line segments."""
+        sides = max(8, int(np.ceil(2 * np.pi * self.node_radius * scale / 4)))
+        angles = np.linspace(0, 2 * np.pi, sides + 1)
+        ring = self.node_radius * np.stack([np.cos(angles), np.sin(angles)],
+                                           axis=1)
+        points = centers[:, None, :] + ring[None, :, :]
+        return (points[:, :-1].reshape(-1, 2), points[:, 1:].reshape(-1, 2))
+
+    def _segments(self, viewport: Viewport, path: Optional[PathNodes],
+                  scale: float
+                  ) -> Tuple[List[Tuple[np.ndarray, np.ndarray, Color, int]],
+                             np.ndarray]:
+        """Everything to draw, as batches of line segments with a color and
+        a width, plus the indices of the visible nodes."""
+        nodes, starts, ends, _ = self._visible(viewport)
+        batches = [(starts, ends, FOREGROUND, 1)]
+        if not self.csr.undirected:
+            batches.append((*self._arrow_heads(starts, ends), FOREGROUND, 1))
+        batches.append((*self._circles(self.positions[nodes], scale),
+                        FOREGROUND, 1))
+
+        path_nodes = self._path_indices(path)
+        if len(path_nodes):
+            path_points = self.positions[path_nodes]
+            batches.append((path_points[:-1], path_points[1:], PATH_COLOR,
+                            PATH_WIDTH))
+            batches.append((*self._circles(path_points, scale), PATH_COLOR,
+                            PATH_WIDTH))
+        return batches, nodes
+
+    def render_image(self,
+                     viewport: Optional[Viewport] = None,
+                     scale: float = 1.0,
+                     path: Optional[PathNodes] = None) -> np.ndarray:
+        """Rasterizes the graph (and `path`, if given) into an RGB array.
+        `scale` is the number of pixels per unit of graph coordinates."""
+        if viewport is None:
+            viewport = self.bounds()
+        width = max(1, int(np.ceil(viewport.width * scale)))
+        height = max(1, int(np.ceil(viewport.height * scale)))
+        image = np.empty((height, width, 3), dtype=np.uint8)
+        image[...] = BACKGROUND
+
+        origin = np.array([viewport.x_min, viewport.y_min])
+        batches, _ = self._segments(viewport, path, scale)
+        for starts, ends, color, line_width in batches:
+            _draw_lines(image, (starts - origin) * scale,
+                        (ends - origin) * scale, color,
+                        max(1, int(round(line_width * min(scale, 1)))))
+        return image
+
+    def render_png(self,
+                   filename: str,
+                   viewport: Optional[Viewport] = None,
+                   scale: float = 1.0,
+                   path: Optional[PathNodes] = None):
+        write_png(filename, self.render_image(viewport, scale, path))
+
+    def render_svg(self,
+                   filename: Optional[str] = None,
+                   viewport: Optional[Viewport] = None,
+                   path: Optional[PathNodes] = None,
+                   labels: bool = True) -> str:
+        """Returns the graph as an SVG document, and writes it to `filename`
+        if given."""
+        if viewport is None:
+            viewport = self.bounds()
+        nodes, starts, ends, _ = self._visible(viewport)
+
+        elements = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" '
+            f'viewBox="{viewport.x_min:g} {viewport.y_min:g} '
+            f'{viewport.width:g} {viewport.height:g}" '
+            f'width="{viewport.width:g}" height="{viewport.height:g}">',
+            f'<rect x="{viewport.x_min:g}" y="{viewport.y_min:g}" '
+            f'width="{viewport.width:g}" height="{viewport.height:g}" '
+            f'fill="{_svg_color(BACKGROUND)}"/>',
+        ]
+        stroke = f'stroke="{_svg_color(FOREGROUND)}" fill="none"'
+        elements.append(f'<path {stroke} d="{_svg_lines(starts, ends)}"/>')
+        if not self.csr.undirected:
+            wing_starts, wing_ends = self._arrow_heads(starts, ends)
+            elements.append(f'<path {stroke} stroke-width="3" '
+                            f'd="{_svg_lines(wing_starts, wing_ends)}"/>')
+        elements.append(
+            f'<path {stroke} '
+            f'd="{_svg_circles(self.positions[nodes], self.node_radius)}"/>')
+
+        if labels and len(nodes):
+            label_positions = self.positions[nodes] + [
+                self.node_radius, 2 * self.node_radius + 5]
+            elements.extend(
+                f'<text x="{x:g}" y="{y:g}" font-family="Arial" '
+                f'font-size="15" font-weight="bold">{_svg_escape(label)}'
+                f'</text>' for (x, y), label in zip(
+                    label_positions.tolist(),
+                    (self.csr.node_ids[i] for i in nodes.tolist())))
+
+        path_nodes = self._path_indices(path)
+        if len(path_nodes):
+            points = self.positions[path_nodes]
+            path_stroke = (f'stroke="{_svg_color(PATH_COLOR)}" fill="none" '
+                           f'stroke-width="{PATH_WIDTH}"')
+            elements.append(f'<path {path_stroke} '
+                            f'd="{_svg_lines(points[:-1], points[1:])}"/>')
+            elements.append(f'<path {path_stroke} '
+                            f'd="{_svg_circles(points, self.node_radius)}"/>')
+
+        elements.append('</svg>')
+        svg = '\n'.join(elements)
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write(svg)
+        return svg
+
+    def render_tiles(self,
+                     directory: str,
+                     tile_size: int = 1024,
+                     scale: float = 1.0,
+                     path: Optional[PathNodes] = None) -> List[str]:
+        """Renders the whole graph as a grid of `tile_size` x `tile_size`
+        pixel PNG images named `tile_<row>_<column>.png`, and returns their
+        file names. Each tile only draws what overlaps it."""
+        os.makedirs(directory, exist_ok=True)
+        bounds = self.bounds()
+        tile_span = tile_size / scale
+        columns = max(1, int(np.ceil(bounds.width / tile_span)))
+        rows = max(1, int(np.ceil(bounds.height / tile_span)))
+
+        filenames = []
+        for row in range(rows):
+            for column in range(columns):
+                x = bounds.x_min + column * tile_span
+                y = bounds.y_min + row * tile_span
+                filename = os.path.join(directory,
+                                        f'tile_{row}_{column}.png')
+                self.render_png(filename,
+                                Viewport(x, y, x + tile_span, y + tile_span),
+                                scale, path)
+                filenames.append(filename)
+        return filenames
+
+
+def _clip_segments(starts: np.ndarray, ends: np.ndarray, lo: np.ndarray,
+                   hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """The parts of the segments inside the rectangle from `lo` to `hi`,
+    with the Liang-Barsky algorithm. Segments that miss the rectangle are
+    dropped."""
+    delta = ends - starts
+    # The segment is starts + t * delta for t in [enter, leave]
+    enter = np.zeros(len(starts))
+    leave = np.ones(len(starts))
+    keep = np.ones(len(starts), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for axis in range(2):
+            d = delta[:, axis]
+            to_lo = (lo[axis] - starts[:, axis]) / d
+            to_hi = (hi[axis] - starts[:, axis]) / d
+            enter = np.maximum(enter, np.where(d > 0, to_lo,
+                                               np.where(d < 0, to_hi, 0)))
+            leave = np.minimum(leave, np.where(d > 0, to_hi,
+                                               np.where(d < 0, to_lo, 1)))
+            # Segments parallel to this axis are either inside or missed
+            keep &= (d != 0) | ((starts[:, axis] >= lo[axis]) &
+                                (starts[:, axis] <= hi[axis]))
+    keep &= enter <= leave
+    starts, delta = starts[keep], delta[keep]
+    return (starts + enter[keep, None] * delta,
+            starts + leave[keep, None] * delta)
+
+
+def _draw_lines(image: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                color: Color, line_width: int = 1):
+    """Draws line segments (in pixel coordinates) into `image` by sampling
+    every segment about once per pixel of the part inside the image."""
+    height, width, _ = image.shape
+    if len(starts) == 0:
+        return
+
+    # Thick lines are drawn as several parallel copies of the thin line
+    radius = line_width // 2
+    offsets = [(dx, dy) for dx in range(-radius, line_width - radius)
+               for dy in range(-radius, line_width - radius)]
+
+    # Only the part of a line that can touch a pixel of the image is
+    # sampled, so a long line costs as much as one across the image
+    margin = line_width + 1
+    starts, ends = _clip_segments(
+        np.asarray(starts, dtype=np.float64),
+        np.asarray(ends, dtype=np.float64),
+        np.array([-margin, -margin]),
+        np.array([width - 1 + margin, height - 1 + margin]))
+    if len(starts) == 0:
+        return
+
+    delta = ends - starts
+    samples = np.ceil(np.abs(delta).max(axis=1)).astype(np.int64) + 1
+
+    batch_start = 0
+    cumulative = np.cumsum(samples)
+    while batch_start < len(samples):
+        done = cumulative[batch_start - 1] if batch_start else 0
+        batch_end = int(np.searchsorted(cumulative, done + PIXEL_BATCH,
+                                        side='right'))
+        batch_end = max(batch_end, batch_start + 1)
+        batch = slice(batch_start, batch_end)
+
+        counts = samples[batch]
+        segment = np.repeat(np.arange(batch_start, batch_end), counts)
+        run_starts = np.cumsum(counts) - counts
+        step = np.arange(counts.sum()) - np.repeat(run_starts, counts)
+        t = step / np.maximum(counts[segment - batch_start] - 1, 1)
+        points = starts[segment] + t[:, None] * delta[segment]
+        pixels = np.rint(points).astype(np.int64)
+
+        for dx, dy in offsets:
+            x = pixels[:, 0] + dx
+            y = pixels[:, 1] + dy
+            inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            image[y[inside], x[inside]] = color
+
+        batch_start = batch_end
+
+
+def write_png(filename: str, image: np.ndarray,
+              compression: int = PNG_COMPRESSION):
+    """Writes an RGB uint8 array as a PNG file."""
+    height, width, _ = image.shape
+    # Every row starts with a filter type byte, 0 meaning unfiltered
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    with open(filename, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0,
+                                           0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), compression)))
+        f.write(chunk(b'IEND', b''))
+
+
+def _svg_color(color: Color) -> str:
+    return '#{:02x}{:02x}{:02x}'.format(*color)
+
+
+def _svg_escape(text: str) -> str:
+    return (text.replace('&', '&amp;').replace('<', '&lt;')
+            .replace('>', '&gt;'))
+
+
+def _svg_lines(starts: np.ndarray, ends: np.ndarray) -> str:
+    """Path data drawing every segment with a move and a line command."""
+    coords = np.concatenate([starts, ends], axis=1).round(2).tolist()
+    return ' '.join(f'M{x0:g} {y0:g}L{x1:g} {y1:g}'
+                    for x0, y0, x1, y1 in coords)
+
+
+def _svg_circles(centers: np.ndarray, radius: float) -> str:
+    """Path data drawing a circle around each center with two arcs."""
+    r = f'{radius:g}'
+    return ' '.join(f'M{x - radius:g} {y:g}a{r} {r} 0 1 0 {2 * radius:g} 0'
+                    f'a{r} {r} 0 1 0 {-2 * radius:g} 0'
+                    for x, y in centers.round(2).tolist())
+
+
+if __name__ == '__main__':
+    import time
+
+    from a_star import a_star
+
+    graph_file = sys.argv[1] if len(sys.argv) > 1 else 'graph2.txt'
+    graph = Graph(graph_file, undirected=True)
+    path = a_star(graph.nodes['1'], graph.nodes['10'], graph.calc_distance)
+
+    start_time = time.perf_counter()
+    renderer = OffscreenRenderer(graph)
+    renderer.render_png('graph.render.png', path=path)
+    renderer.render_svg('graph.render.svg', path=path)
+    print(f'rendered in {time.perf_counter() - start_time:.3f}s')
@@ -0,0 +1,194 @@
+"""An opt-in cache for route queries.
+
+Real traffic asks for the same (origin, destination) pairs over and over, and
+every call to `a_star` would search from scratch. `RouteCache` remembers the
+most recently used results, up to a number of entries and an approximate
+number of bytes, and evicts the least recently used ones when it is full.
+
+Cached results are only valid as long as the graph doesn't change. Every call
+to `Node.add_neighbor` bumps the `version` its graph shares between its nodes
+(see `graph_utils.GraphVersion`). Every entry remembers the version of its
+graph, and is dropped when it is looked up after that changed, so changing
+one graph doesn't throw away the results of another.
+
+Usage:
+
+```
+cache = RouteCache(maxsize=10_000)
+path = cache.a_star(nodes['1'], nodes['10'], graph.calc_distance)
+
+# or wrap any search function taking (start, goal, h)
+cached_search = cache.cached(bidirectional_search)
+result = cached_search(nodes['1'], nodes['10'], graph.calc_distance)
+```
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import wraps
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+import sys
+sys.path.append('.')
+
+from a_star import GeneralNode, Heuristic, SearchResult, a_star_search
+from graph_utils import GraphVersion
+
+SearchFunction = Callable[..., SearchResult]
+CacheKey = Tuple[Hashable, Optional[GraphVersion], Any, Any,
+                 Optional[Hashable]]
+# A result, the version of its graph when it was stored, and its size
+CacheEntry = Tuple[SearchResult, int, int]
+
+# Default bound on the approximate bytes of the cached results
+ROUTE_CACHE_BYTES = 64 * 2**20
+# Bytes of an entry besides its result: the key tuple, the slot in the
+# OrderedDict and the stored version
+ENTRY_BYTES = 300
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    # Entries dropped because their graph changed
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class RouteCache:
+    """A least recently used cache of search results, keyed by the search
+    function, the graph, the ids of the start and goal nodes and the
+    heuristic.
+
+    Heuristics are compared by identity (bound methods by their object and
+    function), so `graph.calc_distance` always hits the same entries while a
+    fresh `lambda` on every call never does. The graph is told apart by the
+    `version` of the start node. Nodes without one, like the `CSRNode` views
+    of an immutable `CSRGraph`, are never invalidated and need one cache per
+    graph.
+
+    `maxsize` bounds the number of entries and `maxbytes` their approximate
+    size, mostly that of the cached paths.
+    """
+
+    def __init__(self, maxsize: int = 1024,
+                 maxbytes: int = ROUTE_CACHE_BYTES):
+        if maxsize <= 0 or maxbytes <= 0:
+            raise ValueError('maxsize and maxbytes must be positive')
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.stats = CacheStats()
+        self._entries: 'OrderedDict[CacheKey, CacheEntry]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def _pop(self, key: CacheKey):
+        _, _, nbytes = self._entries.pop(key)
+        self.nbytes -= nbytes
+
+    def get(self, key: CacheKey) -> Optional[SearchResult]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] != _version_value(key[1]):
+            self._pop(key)
+            self.stats.invalidations += 1
+            entry = None
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[0]
+
+    def put(self, key: CacheKey, result: SearchResult):
+        if key in self._entries:
+            self._pop(key)
+        nbytes = _result_bytes(result)
+        if nbytes > self.maxbytes:
+            return
+        self._entries[key] = (result, _version_value(key[1]), nbytes)
+        self.nbytes += nbytes
+        while len(self._entries) > self.maxsize or self.nbytes > self.maxbytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.stats.evictions += 1
+
+    def cached(self, search: SearchFunction) -> SearchFunction:
+        """Wraps `search(start, goal, h)` so that its results are cached.
+
+        Callers get their own copy of the path, so modifying it doesn't
+        change the cached result.
+        """
+
+        @wraps(search)
+        def cached_search(start: GeneralNode,
+                          goal: GeneralNode,
+                          h: Optional[Heuristic[GeneralNode]] = None
+                          ) -> SearchResult:
+            key = (search, getattr(start, 'version', None), start.node_id,
+                   goal.node_id, h)
+            result = self.get(key)
+            if result is None:
+                result = search(start, goal, h)
+                self.put(key, result)
+            return _copy_result(result)
+
+        return cached_search
+
+    def a_star_search(self, start: GeneralNode, goal: GeneralNode,
+                      h: Heuristic[GeneralNode]) -> SearchResult[GeneralNode]:
+        """A cached `a_star.a_star_search`."""
+        return self.cached(a_star_search)(start, goal, h)
+
+    def a_star(self, start: GeneralNode, goal: GeneralNode,
+               h: Heuristic[GeneralNode]) -> Optional[List[GeneralNode]]:
+        """A cached `a_star.a_star`, with the same signature."""
+        return self.a_star_search(start, goal, h).path
+
+
+def _version_value(version: Optional[GraphVersion]) -> int:
+    return 0 if version is None else version.value
+
+
+def _result_bytes(result: SearchResult) -> int:
+    """Approximate bytes of `result`, not counting the nodes of the path,
+    which belong to the graph."""
+    nbytes = (ENTRY_BYTES + sys.getsizeof(result) +
+              sys.getsizeof(result.stats))
+    if result.path is not None:
+        nbytes += sys.getsizeof(result.path)
+    return nbytes
+
+
+def _copy_result(result: SearchResult) -> SearchResult:
+    return replace(result,
+                   path=None if result.path is None else list(result.path))
+
+
+if __name__ == '__main__':
+    from graph_utils import Graph
+
+    graph = Graph('graph2.txt', undirected=True)
+    nodes = graph.nodes
+    cache = RouteCache(maxsize=2)
+
+    for start, goal in [('1', '10'), ('1', '10'), ('2', '9'), ('3', '8'),
+                        ('1', '10')]:
+        cache.a_star(nodes[start], nodes[goal], graph.calc_distance)
+    print(cache.stats)
+
+    nodes['1'].add_neighbor(nodes['10'], graph.calc_distance(nodes['1'],
+                                                             nodes['10']))
+    path = cache.a_star(nodes['1'], nodes['10'], graph.calc_distance)
+    print([node.node_id for node in path], cache.stats)
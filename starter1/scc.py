@@ -0,0 +1,198 @@
+"""Whole-graph cycle analysis with strongly connected components.
+
+`detect_cycle` in `dfs_cycle_detect.py` only looks at the nodes reachable from
+one source, only says whether there is a cycle, and recurses once per node on
+the current path, so it overflows the call stack on long chains.
+
+A strongly connected component (SCC) is a largest set of nodes that can all
+reach each other. A directed graph has a cycle exactly when one of its SCCs has
+more than one node, or a node has an edge to itself. `analyze_cycles` finds all
+SCCs of a graph with Tarjan's algorithm in O(V + E) time, using an explicit
+stack instead of recursion, and returns:
+
+- the components, in topological order (no edges from a component to one
+  before it)
+- a concrete cycle, if there is one
+- a topological order of the nodes, if there is no cycle
+
+References:
+- https://en.wikipedia.org/wiki/Tarjan%27s_strongly_connected_components_algorithm
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import sys
+sys.path.append('.')
+
+from graph_utils import Graph, Node
+
+GeneralNode = TypeVar('GeneralNode', bound=Node)
+
+
+def tarjan_scc(num_nodes: int, offsets: Sequence[int],
+               targets: Sequence[int]) -> Tuple[List[int], int]:
+    """Labels the strongly connected components of a graph given in CSR
+    layout (the neighbors of node v are `targets[offsets[v]:offsets[v + 1]]`).
+
+    Returns `(labels, num_components)`. Components are numbered in topological
+    order: an edge from a node in component a to a node in component b means
+    `a <= b`.
+    """
+    unvisited = -1
+    index = [unvisited] * num_nodes
+    low = [0] * num_nodes
+    on_stack = bytearray(num_nodes)
+    labels = [unvisited] * num_nodes
+    # The nodes of components that are still being discovered
+    stack: List[int] = []
+    counter = 0
+    num_components = 0
+
+    for root in range(num_nodes):
+        if index[root] != unvisited:
+            continue
+
+        # Each frame of the explicit call stack is a node and the position of
+        # the next of its edges to look at
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        call_stack = [(root, offsets[root])]
+
+        while call_stack:
+            v, edge = call_stack[-1]
+            end = offsets[v + 1]
+            while edge < end:
+                w = targets[edge]
+                edge += 1
+                if index[w] == unvisited:
+                    # "Recurse" into w, and resume v at the next edge later
+                    call_stack[-1] = (v, edge)
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = 1
+                    call_stack.append((w, offsets[w]))
+                    break
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+            else:
+                # All edges of v are done, "return" from v
+                call_stack.pop()
+                if low[v] == index[v]:
+                    # v is the root of a component: everything above it on
+                    # the stack belongs to that component
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        labels[w] = num_components
+                        if w == v:
+                            break
+                    num_components += 1
+                if call_stack:
+                    parent = call_stack[-1][0]
+                    if low[v] < low[parent]:
+                        low[parent] = low[v]
+
+    # Tarjan's algorithm finishes components in reverse topological order
+    last = num_components - 1
+    return [last - label for label in labels], num_components
+
+
+def _find_cycle(start: int, label: int, labels: List[int],
+                offsets: Sequence[int],
+                targets: Sequence[int]) -> Optional[List[int]]:
+    """Finds a shortest cycle through `start` that stays inside its component,
+    with a breadth first search."""
+    parent = {start: start}
+    queue = deque([start])
+    while queue:
+        v = queue.popleft()
+        for edge in range(offsets[v], offsets[v + 1]):
+            w = targets[edge]
+            if w == start:
+                cycle = [v]
+                while cycle[-1] != start:
+                    cycle.append(parent[cycle[-1]])
+                cycle.reverse()
+                return cycle
+            if labels[w] == label and w not in parent:
+                parent[w] = v
+                queue.append(w)
+    return None
+
+
+@dataclass
+class CycleAnalysis(Generic[GeneralNode]):
+    """`components[c]` holds the nodes of component c, and
+    `component_of[node]` is the component a node belongs to.
+
+    `cycle` lists the nodes of a cycle in order (the last one has an edge back
+    to the first), or is `None` if the graph is acyclic, in which case
+    `topological_order` lists every node before the nodes it has edges to.
+    """
+    components: List[List[GeneralNode]]
+    component_of: Dict[GeneralNode, int]
+    cycle: Optional[List[GeneralNode]]
+    topological_order: Optional[List[GeneralNode]]
+
+    @property
+    def has_cycle(self) -> bool:
+        return self.cycle is not None
+
+
+def analyze_cycles(graph: Graph) -> CycleAnalysis:
+    """Finds the strongly connected components of the whole of `graph`, and
+    from them a cycle or a topological order."""
+    nodes: List[Node] = list(graph.nodes.values())
+    index = {node: i for i, node in enumerate(nodes)}
+
+    # Compact CSR form of the adjacency, so the algorithm works on integers
+    offsets = [0]
+    targets: List[int] = []
+    for node in nodes:
+        targets.extend(index[neighbor] for neighbor in node.neighbors)
+        offsets.append(len(targets))
+
+    labels, num_components = tarjan_scc(len(nodes), offsets, targets)
+
+    components: List[List[Node]] = [[] for _ in range(num_components)]
+    for node, label in zip(nodes, labels):
+        components[label].append(node)
+
+    cycle = None
+    for component in components:
+        start = index[component[0]]
+        if len(component) > 1 or start in targets[offsets[start]:
+                                                  offsets[start + 1]]:
+            cycle_indices = _find_cycle(start, labels[start], labels, offsets,
+                                        targets)
+            cycle = [nodes[i] for i in cycle_indices]
+            break
+
+    # Without cycles every component is a single node, and the components are
+    # already in topological order
+    topological_order = None
+    if cycle is None:
+        topological_order = [component[0] for component in components]
+
+    return CycleAnalysis(components, dict(zip(nodes, labels)), cycle,
+                         topological_order)
+
+
+def has_cycle(graph: Graph) -> bool:
+    return analyze_cycles(graph).has_cycle
+
+
+if __name__ == '__main__':
+    for graph_file in ['dfs-cycle1.txt', 'dfs-cycle2.txt']:
+        analysis = analyze_cycles(Graph(graph_file, undirected=False))
+        if analysis.cycle:
+            print(graph_file, 'cycle:',
+                  [node.node_id for node in analysis.cycle])
+        else:
+            print(graph_file, 'topological order:',
+                  [node.node_id for node in analysis.topological_order])